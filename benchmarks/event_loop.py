@@ -0,0 +1,171 @@
+"""
+Сравнение реализаций цикла событий (asyncio и uvloop) на обработке обновлений и рассылке.
+
+Локальные замены внешних сервисов: отдельный процесс поднимает aiohttp-сервер, который
+отвечает за Bot API Telegram (getMe, sendMessage) и за апи OpenWeatherMap (текущая погода
+по городу). Для каждой реализации цикла запускается свой процесс бота (EVENT_LOOP),
+TELEGRAM_API_URL и WEATHER_API_URL указывают на замену, БД - в памяти.
+Замеряются:
+- обработка обновлений: каждый пользователь нажимает «Погода сейчас» (диспетчер, middleware,
+  запрос погоды, запись наблюдения в БД, ответ в Telegram), до --concurrency одновременно;
+- рассылка: утренний прогноз всем пользователям (send_daily_weather без паузы между сообщениями).
+Интернет и настоящие апи не используются.
+
+Запуск:
+    python -m benchmarks.event_loop --users 1000 --cities 50 --loops asyncio uvloop
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import time
+
+os.environ.setdefault("DB_URL", "sqlite+aiosqlite:///:memory:")
+
+HOST = "127.0.0.1"
+
+
+def _message(chat_id: int, text: str) -> dict:
+    return {"message_id": 1, "date": int(time.time()), "chat": {"id": chat_id, "type": "private"}, "text": text}
+
+
+def _weather(city: str) -> dict:
+    """Ответ /data/2.5/weather в формате OpenWeatherMap."""
+    now = int(time.time())
+    return {
+        "name": city, "coord": {"lat": 55.75, "lon": 37.62}, "dt": now,
+        "sys": {"country": "RU", "sunrise": now - 6 * 3600, "sunset": now + 6 * 3600},
+        "main": {"temp": 12.3, "feels_like": 10.1, "pressure": 1012, "humidity": 71},
+        "weather": [{"description": "облачно с прояснениями", "icon": "03d"}],
+        "wind": {"speed": 3.4, "deg": 250}, "clouds": {"all": 40},
+    }
+
+
+def _serve_stand_ins(port: int, latency: float) -> None:
+    """Замена Telegram и OpenWeatherMap: ответы после задержки latency, как у сетевого апи."""
+    from aiohttp import web
+
+    async def telegram(request: web.Request) -> web.Response:
+        await asyncio.sleep(latency)
+        method = request.match_info["method"]
+        if method == "getMe":
+            return web.json_response({"ok": True, "result": {"id": 42, "is_bot": True, "first_name": "Benchmark",
+                                                              "username": "benchmark_bot"}})
+        if method == "sendMessage":
+            form = await request.post()
+            return web.json_response({"ok": True, "result": _message(int(form["chat_id"]), form["text"])})
+        return web.json_response({"ok": True, "result": True})
+
+    async def weather(request: web.Request) -> web.Response:
+        await asyncio.sleep(latency)
+        return web.json_response(_weather(request.query.get("q", "Москва")))
+
+    async def main():
+        server = web.Application()
+        server.router.add_post("/bot{token}/{method}", telegram)
+        server.router.add_get("/data/2.5/weather", weather)
+        runner = web.AppRunner(server)
+        await runner.setup()
+        await web.TCPSite(runner, HOST, port).start()
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+
+def _wait_for_port(port: int) -> None:
+    """Ждёт, пока процесс замены начнёт слушать порт."""
+    for _ in range(300):
+        try:
+            socket.create_connection((HOST, port), timeout=0.1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"Замена апи не запустилась на порту {port}")
+
+
+def _update(update_id: int, user_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {"message_id": update_id, "date": int(time.time()), "chat": {"id": user_id, "type": "private"},
+                    "from": {"id": user_id, "is_bot": False, "first_name": "Тест"}, "text": text},
+    }
+
+
+async def _measure(users: int, cities: int, concurrency: int) -> dict[str, float]:
+    from aiogram.types import Update
+    from bot.bot import create_dispatcher
+    from bot.container import app
+    from bot.database.database import async_session, setup_db
+    from bot.database.models import User
+    from bot.services.stats import bot_stats
+    from bot.services.weather_api import weather_cache
+    from bot.utils.event_loop import loop_name
+    from bot.utils.scheduler import send_daily_weather
+
+    await setup_db()
+    async with async_session() as session:
+        session.add_all([User(user_id=1000 + i, city=f"Город {i % cities}") for i in range(users)])
+        await session.commit()
+
+    bot = app.create_bot()
+    dp = create_dispatcher()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def press(update_id: int) -> None:
+        async with semaphore:
+            await dp.feed_update(bot, Update.model_validate(_update(update_id, 1000 + update_id, "Погода сейчас")))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(press(i) for i in range(users)))
+    updates_elapsed = time.perf_counter() - started
+
+    # рассылка запрашивает погоду городов заново, как утром после истечения кэша
+    weather_cache.clear()
+    await send_daily_weather(bot)
+    broadcast = bot_stats.broadcasts["daily_weather"]
+
+    await bot.session.close()
+    await app.close()
+    return {"loop": loop_name(), "updates": users / updates_elapsed, "broadcast": broadcast.throughput}
+
+
+def _run(kind: str, url: str, users: int, cities: int, concurrency: int) -> dict[str, float]:
+    """Процесс бота с реализацией цикла kind: настройки читаются из окружения при импорте бота."""
+    os.environ.update(BOT_TOKEN="42:BENCHMARK", WEATHER_API_KEY="benchmark", TELEGRAM_API_URL=url,
+                      WEATHER_API_URL=url, BROADCAST_DELAY="0", ANALYTICS_EXECUTOR="inline")
+    from bot.utils.event_loop import run_loop
+    return run_loop(_measure(users, cities, concurrency), kind)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--loops", nargs="+", default=["asyncio", "uvloop"])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--cities", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.005, help="Задержка ответа заменённых апи, секунды")
+    parser.add_argument("--port", type=int, default=8090)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    stand_ins = context.Process(target=_serve_stand_ins, args=(args.port, args.latency), daemon=True)
+    stand_ins.start()
+    _wait_for_port(args.port)
+    url = f"http://{HOST}:{args.port}"
+    try:
+        print(f"{'цикл':>10} {'обновлений/с':>13} {'рассылка, сообщ./с':>19}")
+        for kind in args.loops:
+            # отдельный процесс на каждую реализацию: чистые кэши, БД и цикл событий
+            with context.Pool(1) as pool:
+                result = pool.apply(_run, (kind, url, args.users, args.cities, args.concurrency))
+            label = result["loop"] if result["loop"] == kind else f"{kind}->{result['loop']}"
+            print(f"{label:>10} {result['updates']:>13.0f} {result['broadcast']:>19.0f}")
+    finally:
+        stand_ins.terminate()
+        stand_ins.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Задержка цикла событий во время пакетного еженедельного анализа.
+
+Запускает анализ синтетических пользователей (_analyze_weekly_pooled) через AnalyticsRunner
+в каждом режиме (inline, thread, process) и одновременно замеряет задержку цикла
+событий - время, на которое во время расчёта задержался бы ответ на нажатие кнопки.
+База данных не используется.
+
+Запуск:
+    python -m benchmarks.loop_lag --users 100000 --per-day 2
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("DB_URL", "sqlite+aiosqlite:///:memory:")
+
+from benchmarks.weekly_analytics import _generate
+from bot.services import analytics
+from bot.services.analytics import WeatherAnalytics
+from bot.utils.executor import EXECUTOR_KINDS, AnalyticsRunner
+from bot.utils.loop_lag import LoopLagMonitor
+
+
+async def _measure(kind: str, workers: int, arrays, cities) -> tuple[float, float, float]:
+    runner = analytics.analytics_runner = AnalyticsRunner(kind, workers)
+    # прогрев: запуск процессов пула и импорт модулей в них не входят в замер
+    for _ in range(workers):
+        await runner.run(WeatherAnalytics._analyze_weekly_arrays, *(a[:10] for a in arrays), cities)
+
+    monitor = LoopLagMonitor(interval=0.01, history=100_000)
+    monitor.start()
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    await WeatherAnalytics._analyze_weekly_pooled(*arrays, cities)
+    elapsed = time.perf_counter() - started
+    await asyncio.sleep(0.05)
+    await monitor.stop()
+    runner.shutdown()
+    return elapsed, monitor.peak, monitor.percentile(99)
+
+
+async def _main(users: int, per_day: int, workers: int):
+    arrays = _generate(users, per_day)
+    cities = {user_id: "Москва" for user_id in range(1, users + 1)}
+
+    print(f"{'режим':>8} {'расчёт, с':>10} {'макс. задержка, мс':>19} {'p99, мс':>8}")
+    for kind in EXECUTOR_KINDS[::-1]:
+        elapsed, peak, p99 = await _measure(kind, workers, arrays, cities)
+        print(f"{kind:>8} {elapsed:>10.2f} {peak * 1000:>19.0f} {p99 * 1000:>8.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--per-day", type=int, default=2, help="Наблюдений на пользователя в день")
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+    asyncio.run(_main(args.users, args.per_day, args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Время запуска бота до первого опроса обновлений (time-to-first-poll).
+
+Локальная замена Telegram: aiohttp-сервер отвечает на запросы Bot API (getMe, deleteWebhook,
+getUpdates), бот запускается отдельным процессом (`python main.py` в режиме polling)
+с TELEGRAM_API_URL, указывающим на этот сервер, и БД в памяти. Замеряется время
+от старта процесса до первого getMe и до первого getUpdates. Сеть и апи погоды не используются.
+
+Запуск:
+    python -m benchmarks.startup --runs 5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from aiohttp import web
+
+HOST = "127.0.0.1"
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BOT_USER = {"id": 42, "is_bot": True, "first_name": "Benchmark", "username": "benchmark_bot"}
+
+
+async def measure(timeout: float = 60.0, extra_env: dict | None = None) -> dict[str, float]:
+    """
+    Запускает бота один раз и возвращает время (секунды от старта процесса) до первых
+    запросов getMe и getUpdates. Процесс бота останавливается после первого опроса.
+    """
+    first_requests: dict[str, float] = {}
+    polled = asyncio.Event()
+    started = 0.0
+
+    async def bot_api(request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        first_requests.setdefault(method, time.perf_counter() - started)
+        if method == "getMe":
+            return web.json_response({"ok": True, "result": BOT_USER})
+        if method == "getUpdates":
+            polled.set()
+            # не даём боту крутить опрос вхолостую, пока процесс останавливается
+            await asyncio.sleep(1)
+            return web.json_response({"ok": True, "result": []})
+        return web.json_response({"ok": True, "result": True})
+
+    server = web.Application()
+    server.router.add_post("/bot{token}/{method}", bot_api)
+    runner = web.AppRunner(server)
+    await runner.setup()
+    site = web.TCPSite(runner, HOST, 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    env = {
+        **os.environ,
+        "BOT_TOKEN": "42:BENCHMARK",
+        "BOT_MODE": "polling",
+        "TELEGRAM_API_URL": f"http://{HOST}:{port}",
+        "DB_URL": "sqlite+aiosqlite:///:memory:",
+        "PYTHONPATH": ROOT,
+        **(extra_env or {}),
+    }
+    # логи бота пишутся во временный каталог, а не в logs/ репозитория
+    with tempfile.TemporaryDirectory() as workdir:
+        started = time.perf_counter()
+        process = subprocess.Popen([sys.executable, os.path.join(ROOT, "main.py")], cwd=workdir, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        try:
+            waiter = asyncio.create_task(polled.wait())
+            while not waiter.done():
+                await asyncio.wait([waiter], timeout=0.1)
+                if process.poll() is not None and not waiter.done():
+                    waiter.cancel()
+                    raise RuntimeError(f"Бот завершился до первого опроса:\n{process.stderr.read().decode()}")
+                if time.perf_counter() - started > timeout:
+                    waiter.cancel()
+                    raise TimeoutError(f"Бот не начал опрос за {timeout:.0f} с")
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+            process.stderr.close()
+            await runner.cleanup()
+
+    return first_requests
+
+
+def _import_time() -> float:
+    """Время импорта модуля запуска бота в чистом процессе, секунды."""
+    code = "import time; started = time.perf_counter(); import bot.bot; print(time.perf_counter() - started)"
+    env = {**os.environ, "DB_URL": "sqlite+aiosqlite:///:memory:", "PYTHONPATH": ROOT}
+    output = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return float(output.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    imports, get_me, first_poll = [], [], []
+    for _ in range(args.runs):
+        imports.append(_import_time())
+        timings = asyncio.run(measure())
+        get_me.append(timings["getMe"])
+        first_poll.append(timings["getUpdates"])
+
+    print(f"{'этап':>18} {'медиана, с':>11} {'мин, с':>8}")
+    for name, values in (("import bot.bot", imports), ("первый getMe", get_me), ("первый getUpdates", first_poll)):
+        print(f"{name:>18} {statistics.median(values):>11.2f} {min(values):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Пропускная способность вебхука в зависимости от количества процессов.
+
+Локальная замена Telegram: процессы поднимают то же aiohttp-приложение, что и бот
+(bot.webhook.create_app), на одном порту с SO_REUSEPORT, а клиент отправляет им
+поддельные обновления. Хэндлер вместо обращений к апи выполняет немного работы
+процессора (как разбор и форматирование ответа), ответ возвращается после обработки.
+Сеть, БД и апи Telegram не используются.
+
+Запуск:
+    python -m benchmarks.webhook_throughput --workers 1 2 4 --updates 4000
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+
+os.environ.setdefault("DB_URL", "sqlite+aiosqlite:///:memory:")
+
+import aiohttp
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from bot.webhook import create_app
+
+HOST = "127.0.0.1"
+SECRET = "benchmark"
+
+
+def _cpu_work(text: str, rounds: int) -> int:
+    total = 0
+    for i in range(rounds):
+        total += hash(f"{text}:{i}") & 0xFF
+    return total
+
+
+def _serve(port: int, rounds: int, reuse_port: bool) -> None:
+    dp = Dispatcher()
+
+    @dp.message()
+    async def handler(message):
+        _cpu_work(message.text, rounds)
+
+    async def main():
+        runner = web.AppRunner(create_app(Bot(token="42:BENCHMARK"), dp, SECRET, "/webhook",
+                                          handle_in_background=False))
+        await runner.setup()
+        await web.TCPSite(runner, HOST, port, reuse_port=reuse_port).start()
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+
+def _update(update_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {"message_id": update_id, "date": 1700000000, "chat": {"id": update_id, "type": "private"},
+                    "from": {"id": update_id, "is_bot": False, "first_name": "Тест"}, "text": "Погода сейчас"},
+    }
+
+
+async def _load(port: int, updates: int, concurrency: int) -> float:
+    url = f"http://{HOST}:{port}/webhook"
+    headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+    queue = iter(range(updates))
+
+    # отдельное соединение на каждого клиента, чтобы ядро распределяло их по процессам
+    async def client():
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(force_close=True)) as session:
+            for update_id in queue:
+                async with session.post(url, json=_update(update_id), headers=headers) as response:
+                    response.raise_for_status()
+
+    # ждём, пока процессы начнут слушать порт (запуск spawn-процессов занимает несколько секунд)
+    for _ in range(300):
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.post(url, json=_update(0), headers=headers):
+                    break
+        except aiohttp.ClientConnectionError:
+            await asyncio.sleep(0.1)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--updates", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=2000, help="Работа хэндлера на одно обновление")
+    parser.add_argument("--port", type=int, default=8089)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    print(f"{'процессов':>10} {'обновлений/с':>13}")
+    for workers in args.workers:
+        processes = [context.Process(target=_serve, args=(args.port, args.rounds, workers > 1), daemon=True)
+                     for _ in range(workers)]
+        for process in processes:
+            process.start()
+        try:
+            elapsed = asyncio.run(_load(args.port, args.updates, args.concurrency))
+            print(f"{workers:>10} {args.updates / elapsed:>13.0f}")
+        finally:
+            for process in processes:
+                process.terminate()
+                process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Сравнение построчного и векторизованного еженедельного анализа.
+
+Генерирует синтетические наблюдения за неделю и измеряет время анализа
+для всех пользователей: циклом по _analyze_weekly_data и одним проходом
+_analyze_weekly_arrays. База данных не используется - сравнивается только
+расчёт.
+
+Запуск:
+    python -m benchmarks.weekly_analytics --users 10000 100000 --per-day 2
+"""
+
+import argparse
+import os
+import time
+from datetime import date, datetime, timedelta
+
+os.environ.setdefault("DB_URL", "sqlite+aiosqlite:///:memory:")
+
+import numpy as np
+from bot.services.analytics import WeatherAnalytics
+
+
+class _Observation:
+    """Лёгкая замена ORM-объекта WeatherData для построчного анализа."""
+    __slots__ = ("date", "temperature", "humidity", "wind_speed")
+
+    def __init__(self, observed_at, temperature, humidity, wind_speed):
+        self.date = observed_at
+        self.temperature = temperature
+        self.humidity = humidity
+        self.wind_speed = wind_speed
+
+
+def _generate(users: int, per_day: int, seed: int = 42):
+    rng = np.random.default_rng(seed)
+    size = users * 7 * per_day
+    owners = np.repeat(np.arange(1, users + 1), 7 * per_day)
+    # наблюдения каждые 3 часа начиная с 6 утра, время в сутках
+    slots = np.arange(7)[:, None] + (6 + 3 * np.arange(per_day))[None, :] / 24
+    start = date.today() - timedelta(days=7)
+    times = start.toordinal() + np.tile(slots.ravel(), users)
+    temperature = rng.normal(10, 6, size)
+    humidity = rng.integers(30, 95, size).astype(np.float64)
+    wind = rng.uniform(0, 12, size)
+    return owners, times, temperature, humidity, wind
+
+
+def _per_user_loop(owners, times, temperature, humidity, wind, cities):
+    # объекты создаются вне замера, как если бы они уже были загружены из БД
+    grouped: dict[int, list] = {}
+    base = int(times.min())
+    start = datetime.combine(date.fromordinal(base), datetime.min.time())
+    for i in range(owners.size):
+        grouped.setdefault(int(owners[i]), []).append(
+            _Observation(start + timedelta(days=float(times[i]) - base), float(temperature[i]),
+                         float(humidity[i]), float(wind[i]))
+        )
+
+    started = time.perf_counter()
+    for user_id, items in grouped.items():
+        WeatherAnalytics._analyze_weekly_data(items, cities[user_id])
+    return time.perf_counter() - started
+
+
+def _vectorized(owners, times, temperature, humidity, wind, cities):
+    started = time.perf_counter()
+    WeatherAnalytics._analyze_weekly_arrays(owners, times, temperature, humidity, wind, cities)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--per-day", type=int, default=2, help="Наблюдений на пользователя в день")
+    args = parser.parse_args()
+
+    print(f"{'пользователей':>14} {'наблюдений':>11} {'построчно, с':>13} {'векторно, с':>12} {'ускорение':>10}")
+    for users in args.users:
+        owners, times, temperature, humidity, wind = _generate(users, args.per_day)
+        cities = {user_id: "Москва" for user_id in range(1, users + 1)}
+        loop_time = _per_user_loop(owners, times, temperature, humidity, wind, cities)
+        vector_time = _vectorized(owners, times, temperature, humidity, wind, cities)
+        print(f"{users:>14} {owners.size:>11} {loop_time:>13.2f} {vector_time:>12.2f} "
+              f"{loop_time / vector_time:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
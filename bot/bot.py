@@ -1,39 +1,98 @@
 import logging
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
-from bot.config.config import Config
+from bot.config.config import config
+from bot.container import app
 from bot.utils.logger import setup_logger
 from bot.database.database import setup_db
+from bot.database.storage import DatabaseStorage
 from bot.handlers import register_all_handlers
+from bot.middlewares import register_all_middlewares
 from bot.utils.scheduler import schedule_jobs
+from bot.utils.executor import analytics_runner
+from bot.utils.event_loop import loop_name, run_loop
+from bot.utils.loop_lag import loop_lag
+from bot.utils.shutdown import shutdown
+
+logger = logging.getLogger(__name__)
+
+
+def create_dispatcher() -> Dispatcher:
+    """Диспетчер со всеми middleware и хэндлерами.
+    Состояния FSM хранятся в БД: они переживают перезапуск и общие для процессов вебхука
+    """
+    dp = Dispatcher(storage=DatabaseStorage())
+    register_all_middlewares(dp)
+    register_all_handlers(dp)
+    return dp
+
+
+def start_scheduler(bot: Bot) -> AsyncIOScheduler:
+    """Запуск и настройка асинхронного планировщика рассылок"""
+    scheduler = AsyncIOScheduler()
+    schedule_jobs(scheduler, bot)
+    scheduler.start()
+    return scheduler
+
+
+async def stop_bot(bot: Bot, dp: Dispatcher, scheduler: AsyncIOScheduler | None = None) -> None:
+    """Корректная остановка после того, как бот перестал принимать обновления.
+    Новые задания планировщика не запускаются; обработка принятых апдейтов и текущие задания
+    завершаются (рассылки - с контрольной точкой) не дольше SHUTDOWN_TIMEOUT; затем закрываются
+    пулы аналитики, хранилище FSM, HTTP-сессии и подключения к БД
+    """
+    logger.info("Остановка бота...")
+    # пауза, а не shutdown: остановка планировщика отменила бы выполняющиеся задания
+    if scheduler is not None and scheduler.running:
+        scheduler.pause()
+    await shutdown.drain(config.SHUTDOWN_TIMEOUT)
+    if scheduler is not None and scheduler.running:
+        scheduler.shutdown(wait=False)
+    await loop_lag.stop()
+    analytics_runner.shutdown()
+    await dp.storage.close()
+    await bot.session.close()
+    await app.close()
+    logger.info("Бот остановлен")
 
 
 async def main():
+    """Запуск бота в режиме опроса (polling)"""
     setup_logger()
-    logger = logging.getLogger(__name__)
-    logger.info("Запуск бота...")
-
-    config = Config()
+    logger.info("Запуск бота (цикл событий %s)...", loop_name())
 
     # Инициализация бота и диспетчера
-    bot = Bot(token=config.BOT_TOKEN)
-    storage = MemoryStorage()
-    dp = Dispatcher(storage=storage)
+    bot = app.create_bot()
+    dp = create_dispatcher()
 
     # Запуск базы данных
     await setup_db()
 
-    # Регистрация хэндлеров
-    register_all_handlers(dp)
+    scheduler = start_scheduler(bot)
 
-    # Запуск и настройка асинхронного планировщика
-    scheduler = AsyncIOScheduler()
-    schedule_jobs(scheduler, bot)
+    # замеры задержки цикла событий (видны в /stats и в итогах рассылок)
+    loop_lag.start()
 
-    scheduler.start()
+    # вебхук, оставшийся от запуска в режиме webhook, не даёт получать обновления опросом
+    await bot.delete_webhook()
 
     # Запуск бота
     logger.info("Бот запущен!")
-    await dp.start_polling(bot)
+    try:
+        # SIGTERM и SIGINT останавливают опрос; сессию бота закрывает stop_bot,
+        # чтобы прерываемая рассылка успела дописать текущее сообщение
+        await dp.start_polling(bot, close_bot_session=False)
+    finally:
+        await stop_bot(bot, dp, scheduler)
+
+
+def run():
+    """Точка входа: режим получения обновлений выбирается в Config.BOT_MODE"""
+    if config.BOT_MODE == "webhook":
+        from bot.webhook import run_webhook
+        run_webhook()
+    elif config.BOT_MODE == "polling":
+        run_loop(main())
+    else:
+        raise ValueError(f"Неизвестный режим работы бота: {config.BOT_MODE}")
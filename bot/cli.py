@@ -0,0 +1,90 @@
+"""
+Консольные команды для обслуживания бота.
+
+Примеры:
+    python -m bot.cli export --format ndjson --city Москва --from 2025-01-01 --to 2025-01-31 --output exports
+    python -m bot.cli import --city Москва history_moscow.json
+    python -m bot.cli climate
+"""
+
+import argparse
+import asyncio
+from pathlib import Path
+from bot.utils.logger import setup_logger
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m bot.cli", description="Обслуживание бота SkyVellum")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Выгрузка истории наблюдений в CSV/NDJSON (gzip)")
+    export_parser.add_argument("--format", choices=("csv", "ndjson"), default="csv", help="Формат выгрузки")
+    export_parser.add_argument("--city", help="Фильтр по городу пользователя")
+    export_parser.add_argument("--from", dest="date_from", help="Первый день (ГГГГ-ММ-ДД)")
+    export_parser.add_argument("--to", dest="date_to", help="Последний день (ГГГГ-ММ-ДД)")
+    export_parser.add_argument("--output", default="exports", help="Папка для файлов выгрузки")
+    export_parser.add_argument("--part-size-mb", type=int, default=0,
+                               help="Максимальный размер одного файла в МБ, 0 - без разбиения")
+
+    import_parser = subparsers.add_parser("import", help="Загрузка истории города из архива OWM (JSON/CSV)")
+    import_parser.add_argument("path", help="Путь к архиву истории OWM (.json или .csv)")
+    import_parser.add_argument("--city", required=True,
+                               help="Название города в БД - так, как его вводят пользователи")
+    import_parser.add_argument("--chunk-rows", type=int, help="Строк в одном INSERT")
+
+    subparsers.add_parser("climate", help="Пересчёт климатических норм городов по накопленной истории")
+    return parser
+
+
+async def _export(args: argparse.Namespace) -> None:
+    from bot.services.export import export_weather_data, parse_date
+
+    result = await export_weather_data(
+        Path(args.output),
+        fmt=args.format,
+        city=args.city,
+        date_from=parse_date(args.date_from),
+        date_to=parse_date(args.date_to),
+        part_size=args.part_size_mb * 1024 * 1024
+    )
+    rate = result.rows / result.elapsed if result.elapsed else 0.0
+    print(f"Выгружено строк: {result.rows} за {result.elapsed:.1f} с ({rate:.0f} строк/с)")
+    for path in result.files:
+        print(f"  {path}")
+
+
+async def _import(args: argparse.Namespace) -> None:
+    from bot.database.database import setup_db
+    from bot.services.importer import import_owm_history
+
+    await setup_db()
+    stats = await import_owm_history(Path(args.path), args.city, chunk_rows=args.chunk_rows)
+    print(f"Прочитано: {stats.read}, добавлено: {stats.inserted}, пропущено дубликатов: {stats.skipped}")
+    print(f"Время: {stats.elapsed:.1f} с ({stats.rows_per_second:.0f} строк/с)")
+
+
+async def _climate(args: argparse.Namespace) -> None:
+    from bot.database.database import setup_db
+    from bot.services.climate import rebuild_climate_baselines
+
+    await setup_db()
+    stats = await rebuild_climate_baselines()
+    print(f"Обновлено городов: {stats.cities}, добавлено дней истории: {stats.days_added}")
+    print(f"Время: {stats.elapsed:.1f} с")
+
+
+COMMANDS = {
+    "export": _export,
+    "import": _import,
+    "climate": _climate,
+}
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = _build_parser().parse_args(argv)
+    setup_logger()
+    asyncio.run(COMMANDS[args.command](args))
+
+
+if __name__ == "__main__":
+    main()
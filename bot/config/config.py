@@ -13,15 +13,120 @@ class Config:
         BOT_TOKEN (str): Токен Telegram-бота. Обязательно.
         WEATHER_API_KEY (str): API-ключ для сервиса погоды.
         DB_URL (str): URL подключения к БД. По умолчанию SQLite в папке database.
+        DB_ECHO (bool): Выводить в лог все SQL-запросы (для отладки).
         ADMIN_IDS (list[int]): Список ID администраторов бота - необязательно.
+        RETENTION_DAYS (int): Сколько дней хранить сырые наблюдения до свёртки в дневные агрегаты.
+        RETENTION_BATCH_SIZE (int): Размер пачки удаляемых строк за одну транзакцию.
+        RETENTION_VACUUM_PAGES (int): Сколько страниц SQLite освобождать за один запуск очистки.
+        USER_CACHE_SIZE (int): Максимальное количество пользователей в кэше middleware.
+        USER_CACHE_TTL (int): Время жизни записи о пользователе в кэше, секунды.
+        STATS_CACHE_ENABLED (bool): Держать счётчики /stats в памяти (при нескольких процессах вебхука отключается).
+        EXPORT_CHUNK_ROWS (int): Сколько строк читать из курсора за раз при выгрузке истории.
+        EXPORT_PART_SIZE_MB (int): Максимальный размер одного файла выгрузки, отправляемого в Telegram.
+        IMPORT_CHUNK_ROWS (int): Сколько строк архива вставлять одним INSERT при импорте истории.
+        ANALYSIS_CACHE_SIZE (int): Сколько готовых недельных отчётов держать в памяти.
+        CLIMATE_WINDOW_DAYS (int): Полуширина окна сглаживания климатической нормы, дни.
+        CLIMATE_MIN_SAMPLES (int): Минимум дней истории в окне, чтобы норма считалась надёжной.
+        ANALYTICS_EXECUTOR (str): Где выполнять тяжёлую аналитику: process, thread или inline.
+        ANALYTICS_WORKERS (int): Количество процессов или потоков для аналитики.
+        ANALYTICS_CHUNK_USERS (int): Сколько пользователей анализировать одной задачей пула.
+        ALERT_CHECK_MINUTES (int): Как часто проверять прогнозы на погодные предупреждения, минуты.
+        ALERT_REPEAT_HOURS (int): Через сколько часов без превышения порога явление считается новым.
+        ALERT_MAX_PER_USER (int): Максимальное количество подписок на предупреждения у пользователя.
+        WEATHER_API_URL (str): Адрес апи OpenWeatherMap (можно заменить на прокси или локальную заглушку).
+        WEATHER_CACHE_SIZE (int): Сколько ответов апи погоды (мест) держать в общем кэше.
+        WEATHER_CACHE_TTL (int): Время жизни ответа апи погоды в кэше, секунды.
+        FORECAST_CACHE_TTL (int): Время жизни прогноза в общем кэше, секунды (переключение дней
+            прогноза кнопками в пределах этого времени не обращается к апи).
+        HTTP_TIMEOUT (float): Таймаут запроса к внешним апи, секунды.
+        GEOHASH_PRECISION (int): Длина геохеша ячейки, на которую округляются координаты запросов
+            (5 - около 4.9 x 4.9 км): пользователи одной ячейки делят ответы апи.
+        GEOCODE_CACHE_SIZE (int): Сколько ячеек хранить в кэше обратного геокодирования.
+        GEOCODE_CACHE_TTL (int): Время жизни названия места ячейки в кэше, секунды.
+        MAX_LOCATIONS (int): Сколько дополнительных мест может сохранить пользователь.
+        BOT_MODE (str): Способ получения обновлений: polling или webhook.
+        EVENT_LOOP (str): Реализация цикла событий: asyncio или uvloop (если uvloop не установлен - asyncio).
+        BROADCAST_DELAY (float): Пауза между сообщениями утренней и еженедельной рассылок, секунды
+            (чтобы не упереться в лимиты Telegram).
+        TELEGRAM_API_URL (str): Адрес сервера Bot API (пусто - api.telegram.org), например локального telegram-bot-api.
+        WEBHOOK_URL (str): Публичный адрес HTTPS, на который Telegram отправляет обновления (без пути).
+        WEBHOOK_PATH (str): Путь обработчика вебхука.
+        WEBHOOK_HOST (str): Адрес, на котором слушает aiohttp-сервер вебхука.
+        WEBHOOK_PORT (int): Порт aiohttp-сервера вебхука.
+        WEBHOOK_SECRET (str): Секрет для заголовка X-Telegram-Bot-Api-Secret-Token (пусто - случайный при запуске).
+        WEBHOOK_WORKERS (int): Количество процессов, обрабатывающих обновления вебхука.
+        THROTTLE_RATE (int): Сколько раз подряд пользователь может вызвать хэндлер за THROTTLE_PERIOD
+            (для хэндлеров без своего лимита).
+        THROTTLE_PERIOD (float): Окно ограничения частоты, секунды.
+        FSM_STATE_TTL (int): Через сколько секунд без изменений состояние FSM считается брошенным.
+        FSM_CACHE_TTL (float): Сколько секунд состояние FSM читается из памяти процесса без обращения к БД
+            (ограничивает, насколько процесс может отстать от изменений в другом процессе).
+        LOG_LEVEL (str): Уровень логирования (DEBUG, INFO, WARNING...).
+        LOG_FORMAT (str): Формат логов: text или json (одна JSON-запись на строку).
+        LOG_SAMPLE_BURST (int): Сколько однотипных записей о пользователях массового задания (рассылки)
+            писать за LOG_SAMPLE_PERIOD, остальные пропускаются (0 - писать все).
+        LOG_SAMPLE_PERIOD (float): Окно прореживания однотипных записей, секунды.
+        SHUTDOWN_TIMEOUT (float): Сколько секунд при остановке ждать завершения обработки апдейтов
+            и заданий планировщика (должно быть меньше времени ожидания SIGKILL, в Docker - stop_grace_period).
     """
     BOT_TOKEN: str = os.environ.get("BOT_TOKEN")
     WEATHER_API_KEY: str = os.environ.get("WEATHER_API_KEY")
     DB_URL: str = os.environ.get("DB_URL", "sqlite:///database/weather_bot.db")
+    DB_ECHO: bool = os.environ.get("DB_ECHO", "false").lower() in ("1", "true", "yes")
     ADMIN_IDS: list = None
+    RETENTION_DAYS: int = int(os.environ.get("RETENTION_DAYS", 90))
+    RETENTION_BATCH_SIZE: int = int(os.environ.get("RETENTION_BATCH_SIZE", 500))
+    RETENTION_VACUUM_PAGES: int = int(os.environ.get("RETENTION_VACUUM_PAGES", 1000))
+    USER_CACHE_SIZE: int = int(os.environ.get("USER_CACHE_SIZE", 10000))
+    USER_CACHE_TTL: int = int(os.environ.get("USER_CACHE_TTL", 600))
+    STATS_CACHE_ENABLED: bool = os.environ.get("STATS_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    EXPORT_CHUNK_ROWS: int = int(os.environ.get("EXPORT_CHUNK_ROWS", 5000))
+    EXPORT_PART_SIZE_MB: int = int(os.environ.get("EXPORT_PART_SIZE_MB", 45))
+    IMPORT_CHUNK_ROWS: int = int(os.environ.get("IMPORT_CHUNK_ROWS", 500))
+    ANALYSIS_CACHE_SIZE: int = int(os.environ.get("ANALYSIS_CACHE_SIZE", 10000))
+    CLIMATE_WINDOW_DAYS: int = int(os.environ.get("CLIMATE_WINDOW_DAYS", 15))
+    CLIMATE_MIN_SAMPLES: int = int(os.environ.get("CLIMATE_MIN_SAMPLES", 20))
+    ANALYTICS_EXECUTOR: str = os.environ.get("ANALYTICS_EXECUTOR", "thread")
+    ANALYTICS_WORKERS: int = int(os.environ.get("ANALYTICS_WORKERS", 2))
+    ANALYTICS_CHUNK_USERS: int = int(os.environ.get("ANALYTICS_CHUNK_USERS", 5000))
+    ALERT_CHECK_MINUTES: int = int(os.environ.get("ALERT_CHECK_MINUTES", 60))
+    ALERT_REPEAT_HOURS: int = int(os.environ.get("ALERT_REPEAT_HOURS", 12))
+    ALERT_MAX_PER_USER: int = int(os.environ.get("ALERT_MAX_PER_USER", 10))
+    WEATHER_API_URL: str = os.environ.get("WEATHER_API_URL", "https://api.openweathermap.org")
+    WEATHER_CACHE_SIZE: int = int(os.environ.get("WEATHER_CACHE_SIZE", 5000))
+    WEATHER_CACHE_TTL: int = int(os.environ.get("WEATHER_CACHE_TTL", 600))
+    FORECAST_CACHE_TTL: int = int(os.environ.get("FORECAST_CACHE_TTL", 1800))
+    HTTP_TIMEOUT: float = float(os.environ.get("HTTP_TIMEOUT", 10))
+    GEOHASH_PRECISION: int = int(os.environ.get("GEOHASH_PRECISION", 5))
+    GEOCODE_CACHE_SIZE: int = int(os.environ.get("GEOCODE_CACHE_SIZE", 10000))
+    GEOCODE_CACHE_TTL: int = int(os.environ.get("GEOCODE_CACHE_TTL", 30 * 24 * 3600))
+    MAX_LOCATIONS: int = int(os.environ.get("MAX_LOCATIONS", 5))
+    BOT_MODE: str = os.environ.get("BOT_MODE", "polling")
+    EVENT_LOOP: str = os.environ.get("EVENT_LOOP", "asyncio")
+    BROADCAST_DELAY: float = float(os.environ.get("BROADCAST_DELAY", 0.5))
+    TELEGRAM_API_URL: str = os.environ.get("TELEGRAM_API_URL", "")
+    WEBHOOK_URL: str = os.environ.get("WEBHOOK_URL", "")
+    WEBHOOK_PATH: str = os.environ.get("WEBHOOK_PATH", "/webhook")
+    WEBHOOK_HOST: str = os.environ.get("WEBHOOK_HOST", "0.0.0.0")
+    WEBHOOK_PORT: int = int(os.environ.get("WEBHOOK_PORT", 8080))
+    WEBHOOK_SECRET: str = os.environ.get("WEBHOOK_SECRET", "")
+    WEBHOOK_WORKERS: int = int(os.environ.get("WEBHOOK_WORKERS", 1))
+    THROTTLE_RATE: int = int(os.environ.get("THROTTLE_RATE", 5))
+    THROTTLE_PERIOD: float = float(os.environ.get("THROTTLE_PERIOD", 10))
+    FSM_STATE_TTL: int = int(os.environ.get("FSM_STATE_TTL", 86400))
+    FSM_CACHE_TTL: float = float(os.environ.get("FSM_CACHE_TTL", 2))
+    LOG_LEVEL: str = os.environ.get("LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT: str = os.environ.get("LOG_FORMAT", "text")
+    LOG_SAMPLE_BURST: int = int(os.environ.get("LOG_SAMPLE_BURST", 20))
+    LOG_SAMPLE_PERIOD: float = float(os.environ.get("LOG_SAMPLE_PERIOD", 60))
+    SHUTDOWN_TIMEOUT: float = float(os.environ.get("SHUTDOWN_TIMEOUT", 20))
 
     def __post_init__(self):
         """Пост-инициализация: парсит ADMIN_IDS из строки в список целых чисел."""
         admin_ids = os.environ.get("ADMIN_IDS", "")
         # Преобразует каждый элемент в число если элемент не пустой
         self.ADMIN_IDS = [int(admin_id) for admin_id in admin_ids.split(",") if admin_id] if admin_ids else []
+
+
+# единственный экземпляр настроек на процесс: модули импортируют его, а не создают свой
+config = Config()
@@ -0,0 +1,77 @@
+"""
+Контейнер приложения: общие объекты процесса для внешних сервисов (HTTP-сессия, клиент апи
+погоды, справочник городов, бот) создаются один раз и только при первом обращении.
+
+Модули получают их отсюда, а не создают свои экземпляры, поэтому запуск не платит
+за объекты, которые не понадобятся, а HTTP-соединения с апи переиспользуются между запросами.
+Настройки (bot.config.config) и подключение к БД (bot.database.database) остаются модульными
+объектами и импортируются напрямую; контейнер только закрывает подключения к БД при остановке.
+"""
+
+import asyncio
+import logging
+from functools import cached_property
+from typing import TYPE_CHECKING
+from bot.config.config import config
+
+if TYPE_CHECKING:
+    import aiohttp
+    from aiogram import Bot
+    from bot.services.cities import CityIndex
+    from bot.services.weather_api import WeatherAPI
+
+logger = logging.getLogger(__name__)
+
+
+class Container:
+    """Общие объекты процесса с ленивым созданием."""
+
+    def __init__(self):
+        self._http: "aiohttp.ClientSession | None" = None
+        self._http_loop: asyncio.AbstractEventLoop | None = None
+
+    @cached_property
+    def weather_api(self) -> "WeatherAPI":
+        """Клиент апи погоды, общий для хэндлеров и рассылок."""
+        from bot.services.weather_api import WeatherAPI
+        return WeatherAPI()
+
+    @property
+    def city_index(self) -> "CityIndex":
+        """Справочник городов (загружается при первом вводе города)."""
+        from bot.services.cities import get_city_index
+        return get_city_index()
+
+    async def http(self) -> "aiohttp.ClientSession":
+        """
+        HTTP-сессия для внешних апи с пулом соединений. Создаётся заново, если закрыта
+        или принадлежит другому циклу событий (например, в тестах).
+        """
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._http.closed or self._http_loop is not loop:
+            import aiohttp
+            self._http = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=config.HTTP_TIMEOUT))
+            self._http_loop = loop
+        return self._http
+
+    def create_bot(self) -> "Bot":
+        """Бот с сервером Bot API из TELEGRAM_API_URL (если задан)."""
+        from aiogram import Bot
+        if not config.TELEGRAM_API_URL:
+            return Bot(token=config.BOT_TOKEN)
+
+        from aiogram.client.session.aiohttp import AiohttpSession
+        from aiogram.client.telegram import TelegramAPIServer
+        session = AiohttpSession(api=TelegramAPIServer.from_base(config.TELEGRAM_API_URL))
+        return Bot(token=config.BOT_TOKEN, session=session)
+
+    async def close(self) -> None:
+        """Закрывает HTTP-сессию и подключения к БД при остановке бота."""
+        if self._http is not None and not self._http.closed:
+            await self._http.close()
+        self._http = None
+        from bot.database.database import engine
+        await engine.dispose()
+
+
+app = Container()
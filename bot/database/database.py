@@ -8,20 +8,21 @@
 """
 
 import logging
+from sqlalchemy import inspect
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from bot.config.config import Config
+from bot.config.config import config
 
 
 logger = logging.getLogger(__name__)
-config = Config()
 
 
 Base = declarative_base()  # базовый класс для моделей данных
 
 # Создаем асинхронный движок и сессию для работы с базой данных
-engine = create_async_engine(config.DB_URL, echo=True)
+# вывод SQL (DB_ECHO) пишется синхронно в консоль на каждый запрос, поэтому по умолчанию выключен
+engine = create_async_engine(config.DB_URL, echo=config.DB_ECHO)
 async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
@@ -30,16 +31,54 @@ async def setup_db():
 
     Выполняет:
     - Создание всех таблиц, определенных в моделях
+    - Включение инкрементальной очистки страниц для SQLite (действует для новой БД)
+    - Добавление в существующие таблицы новых колонок и индексов
+    - Заполнение сумм тенденций по уже накопленным наблюдениям, если их таблица только что создана
     - Проверку подключения к БД
     - Логирование процесса инициализации
     """
-    from bot.database.models import User, WeatherData
+    from bot.database.models import (User, WeatherData, WeatherDailyAggregate, ClimateBaseline,
+                                     ClimateBaselineProgress, AlertSubscription, UserLocation, FSMRecord,
+                                     BroadcastCheckpoint, WeatherTrendDay)
     async with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            # режим нужно выставить до создания таблиц, иначе он применится только после VACUUM
+            await conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        has_trend_days = await conn.run_sync(
+            lambda sync_conn: inspect(sync_conn).has_table(WeatherTrendDay.__tablename__))
         logger.info("Создание таблиц в базе данных")
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_upgrade_schema)
+
+    if not has_trend_days:
+        # БД до появления сумм тенденций: суммы недельного окна собираются из сохранённых наблюдений
+        from bot.services.trends import rebuild_trend_days
+        await rebuild_trend_days()
 
     logger.info("Подключение к базе данных завершено")
 
+def _upgrade_schema(sync_conn) -> None:
+    """Дополняет существующие таблицы колонками и индексами, добавленными в модели позже.
+    create_all не изменяет уже созданные таблицы, поэтому без этого шага старая БД
+    не получит новые поля. Поддерживаются только nullable-колонки без значения по умолчанию.
+    """
+    inspector = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            column_type = column.type.compile(dialect=sync_conn.dialect)
+            sync_conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+            logger.info("В таблицу %s добавлена колонка %s", table.name, column.name)
+
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
 async def get_session() -> AsyncSession:
     """
     Генератор асинхронных сессий для работы с БД.
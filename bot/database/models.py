@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey
+from sqlalchemy import (Column, Integer, String, Float, Date, DateTime, Boolean, ForeignKey, Index, Text,
+                        UniqueConstraint, text)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from bot.database.database import Base
@@ -39,12 +40,46 @@ class User(Base):
         return f"<User(id={self.id}, user_id={self.user_id}, city={self.city})>"
 
 
+class UserLocation(Base):
+    """
+    Модель для хранения дополнительных мест пользователя (основной город хранится в User.city).
+    Атрибуты:
+        id (int): Уникальный идентификатор записи
+        user_id (int): Идентификатор пользователя
+        name (str): Название места, которое дал пользователь (например, «Дача»)
+        city (str): Город для запросов погоды
+        latitude (float): Географическая широта
+        longitude (float): Географическая долгота
+        created_at (datetime): Дата и время добавления (автоматически)
+    """
+    __tablename__ = "user_locations"
+    __table_args__ = (UniqueConstraint("user_id", "city", name="uq_user_location_city"),)
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    name = Column(String, nullable=False)
+    city = Column(String, nullable=False)
+    latitude = Column(Float)
+    longitude = Column(Float)
+    created_at = Column(DateTime, server_default=func.now())
+
+    @property
+    def label(self) -> str:
+        """Подпись места в сообщениях: «Дача (Истра)» или просто город."""
+        return self.city if self.name == self.city else f"{self.name} ({self.city})"
+
+    def __repr__(self):
+        return f"<UserLocation(user_id={self.user_id}, name={self.name}, city={self.city})>"
+
+
 class WeatherData(Base):
     """
     Модель для хранения данных о погоде.
     Атрибуты:
         id (int): Уникальный идентификатор записи
         user_id (int): Идентификатор пользователя, которому принадлежит данная запись
+            (пусто для исторических данных города, загруженных импортом)
+        city (str): Город, для которого получены данные
         temperature (float): Температура в градусах Цельсия
         feels_like (float): Ощущаемая температура в градусах Цельсия
         pressure (int): Атмосферное давление в миллиметрах ртутного столба
@@ -57,9 +92,17 @@ class WeatherData(Base):
         user (User): Связанный пользователь, выполнивший запрос
     """
     __tablename__ = "weather_data"
+    __table_args__ = (
+        # импортированные данные города не должны дублироваться при повторной загрузке архива
+        Index("uq_weather_data_city_date", "city", "date", unique=True,
+              sqlite_where=text("user_id IS NULL"), postgresql_where=text("user_id IS NULL")),
+        # выборка истории города за период (долгосрочные отчёты)
+        Index("ix_weather_data_city_date", "city", "date"),
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
+    city = Column(String)
     temperature = Column(Float)
     feels_like = Column(Float)
     pressure = Column(Integer)
@@ -73,3 +116,220 @@ class WeatherData(Base):
 
     def __repr__(self):
         return f"<WeatherData(id={self.id}, user_id={self.user_id}, temperature={self.temperature}, date={self.date})>"
+
+
+class WeatherDailyAggregate(Base):
+    """
+    Модель для хранения дневных агрегатов погоды, в которые сворачиваются старые наблюдения.
+    Атрибуты:
+        id (int): Уникальный идентификатор записи
+        user_id (int): Идентификатор пользователя, которому принадлежали наблюдения
+            (пусто для импортированной истории города)
+        city (str): Город наблюдений
+        date (date): День, за который собраны наблюдения
+        samples (int): Количество исходных наблюдений за день
+        temperature_avg (float): Средняя температура за день
+        temperature_min (float): Минимальная температура за день
+        temperature_max (float): Максимальная температура за день
+        feels_like_avg (float): Средняя ощущаемая температура
+        pressure_avg (float): Среднее давление
+        humidity_avg (float): Средняя влажность
+        wind_speed_avg (float): Средняя скорость ветра
+        rainy_samples (int): Количество наблюдений с осадками
+    """
+    __tablename__ = "weather_daily"
+    __table_args__ = (
+        UniqueConstraint("user_id", "city", "date", name="uq_weather_daily_user_city_date"),
+        Index("ix_weather_daily_city_date", "city", "date"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
+    city = Column(String)
+    date = Column(Date, nullable=False, index=True)
+    samples = Column(Integer, nullable=False, default=0)
+    temperature_avg = Column(Float)
+    temperature_min = Column(Float)
+    temperature_max = Column(Float)
+    feels_like_avg = Column(Float)
+    pressure_avg = Column(Float)
+    humidity_avg = Column(Float)
+    wind_speed_avg = Column(Float)
+    rainy_samples = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<WeatherDailyAggregate(user_id={self.user_id}, date={self.date}, samples={self.samples})>"
+
+
+class WeatherTrendDay(Base):
+    """
+    Модель для хранения сумм регрессии тенденций погоды за сутки UTC.
+    Суммы пополняются при каждом сохранении наблюдения, поэтому тенденция за неделю
+    считается по нескольким строкам таблицы, а не по всем наблюдениям недели.
+    x - доля суток момента наблюдения, y - значение величины.
+    Атрибуты:
+        id (int): Уникальный идентификатор записи
+        owner_id (int): Внутренний ID пользователя, 0 - импортированная история города
+        city (str): Город импортированной истории (пустая строка для наблюдений пользователя)
+        day (date): Сутки UTC, за которые собраны суммы
+        samples (int): Количество наблюдений
+        x_sum (float): Сумма x
+        x_sq_sum (float): Сумма квадратов x
+        x_min (float): Наименьший x (первое наблюдение суток)
+        x_max (float): Наибольший x (последнее наблюдение суток)
+        temperature_sum (float): Сумма температур
+        temperature_x_sum (float): Сумма произведений температуры на x
+        temperature_sq_sum (float): Сумма квадратов температур
+        humidity_sum (float): Сумма значений влажности
+        humidity_x_sum (float): Сумма произведений влажности на x
+        humidity_sq_sum (float): Сумма квадратов влажности
+        wind_sum (float): Сумма скоростей ветра
+        wind_x_sum (float): Сумма произведений скорости ветра на x
+        wind_sq_sum (float): Сумма квадратов скоростей ветра
+    """
+    __tablename__ = "weather_trend_days"
+    __table_args__ = (UniqueConstraint("owner_id", "city", "day", name="uq_weather_trend_days_owner_city_day"),)
+
+    id = Column(Integer, primary_key=True)
+    owner_id = Column(Integer, nullable=False)
+    city = Column(String, nullable=False)
+    day = Column(Date, nullable=False, index=True)
+    samples = Column(Integer, nullable=False, default=0)
+    x_sum = Column(Float, nullable=False, default=0.0)
+    x_sq_sum = Column(Float, nullable=False, default=0.0)
+    x_min = Column(Float, nullable=False)
+    x_max = Column(Float, nullable=False)
+    temperature_sum = Column(Float, nullable=False, default=0.0)
+    temperature_x_sum = Column(Float, nullable=False, default=0.0)
+    temperature_sq_sum = Column(Float, nullable=False, default=0.0)
+    humidity_sum = Column(Float, nullable=False, default=0.0)
+    humidity_x_sum = Column(Float, nullable=False, default=0.0)
+    humidity_sq_sum = Column(Float, nullable=False, default=0.0)
+    wind_sum = Column(Float, nullable=False, default=0.0)
+    wind_x_sum = Column(Float, nullable=False, default=0.0)
+    wind_sq_sum = Column(Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f"<WeatherTrendDay(owner_id={self.owner_id}, city={self.city}, day={self.day}, samples={self.samples})>"
+
+
+class ClimateBaseline(Base):
+    """
+    Модель для хранения климатической нормы города на день года.
+    Атрибуты:
+        id (int): Уникальный идентификатор записи
+        city (str): Город
+        day_of_year (int): День года от 1 до 365 (29 февраля учитывается как 28 февраля)
+        samples (int): Количество дней истории, попавших на этот день года
+        temperature_sum (float): Сумма среднесуточных температур этих дней
+        temperature_sq_sum (float): Сумма квадратов среднесуточных температур
+        window_samples (int): Количество дней в окне сглаживания вокруг дня года
+        temperature_mean (float): Норма температуры, сглаженная по окну
+        temperature_std (float): Разброс температуры (стандартное отклонение) по окну
+    """
+    __tablename__ = "climate_baseline"
+    __table_args__ = (UniqueConstraint("city", "day_of_year", name="uq_climate_baseline_city_day"),)
+
+    id = Column(Integer, primary_key=True)
+    city = Column(String, nullable=False)
+    day_of_year = Column(Integer, nullable=False)
+    samples = Column(Integer, nullable=False, default=0)
+    temperature_sum = Column(Float, nullable=False, default=0.0)
+    temperature_sq_sum = Column(Float, nullable=False, default=0.0)
+    window_samples = Column(Integer, nullable=False, default=0)
+    temperature_mean = Column(Float)
+    temperature_std = Column(Float)
+
+    def __repr__(self):
+        return f"<ClimateBaseline(city={self.city}, day_of_year={self.day_of_year}, mean={self.temperature_mean})>"
+
+
+class ClimateBaselineProgress(Base):
+    """
+    Модель для хранения прогресса пересчёта климатической нормы города.
+    Атрибуты:
+        city (str): Город
+        last_day (date): Последний день истории, учтённый в норме
+        updated_at (datetime): Время последнего пересчёта
+    """
+    __tablename__ = "climate_baseline_progress"
+
+    city = Column(String, primary_key=True)
+    last_day = Column(Date, nullable=False)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<ClimateBaselineProgress(city={self.city}, last_day={self.last_day})>"
+
+
+class AlertSubscription(Base):
+    """
+    Модель для хранения подписок пользователей на погодные предупреждения.
+    Атрибуты:
+        id (int): Уникальный идентификатор записи
+        user_id (int): Идентификатор пользователя (город берётся из его профиля)
+        metric (str): Вид предупреждения - мороз, жара или ветер
+        threshold (float): Порог в единицах величины (°C или м/с)
+        window_hours (int): На сколько часов вперёд проверять прогноз
+        last_event_at (datetime): Время последнего замеченного в прогнозе превышения порога
+            (повторно о том же явлении не предупреждаем)
+        created_at (datetime): Дата и время подписки (автоматически)
+    """
+    __tablename__ = "alert_subscriptions"
+    __table_args__ = (
+        UniqueConstraint("user_id", "metric", "threshold", "window_hours", name="uq_alert_subscription"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    metric = Column(String, nullable=False)
+    threshold = Column(Float, nullable=False)
+    window_hours = Column(Integer, nullable=False, default=24)
+    last_event_at = Column(DateTime)
+    created_at = Column(DateTime, server_default=func.now())
+
+    def __repr__(self):
+        return (f"<AlertSubscription(user_id={self.user_id}, metric={self.metric}, "
+                f"threshold={self.threshold}, window_hours={self.window_hours})>")
+
+
+class FSMRecord(Base):
+    """
+    Модель для хранения состояний FSM (например, ввода города при регистрации),
+    чтобы они переживали перезапуск и были общими для нескольких процессов бота.
+    Атрибуты:
+        key (str): Ключ хранилища aiogram (бот, чат, пользователь, ветка, назначение)
+        state (str): Текущее состояние или пусто
+        data (str): Данные состояния в JSON
+        updated_at (datetime): Время последнего изменения (UTC), по нему истекают брошенные состояния
+    """
+    __tablename__ = "fsm_states"
+
+    key = Column(String, primary_key=True)
+    state = Column(String)
+    data = Column(Text, nullable=False, default="{}")
+    updated_at = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<FSMRecord(key={self.key}, state={self.state})>"
+
+
+class BroadcastCheckpoint(Base):
+    """
+    Модель контрольной точки рассылки, прерванной остановкой бота:
+    после перезапуска рассылка продолжается с оставшимися получателями.
+    Атрибуты:
+        job (str): Название рассылки (daily_weather, weekly_analysis)
+        run_date (date): День, в который рассылка была запущена
+        delivered (str): JSON-список ключей уже обработанных получателей
+        updated_at (datetime): Время сохранения
+    """
+    __tablename__ = "broadcast_checkpoints"
+
+    job = Column(String, primary_key=True)
+    run_date = Column(Date, nullable=False)
+    delivered = Column(Text, nullable=False, default="[]")
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<BroadcastCheckpoint(job={self.job}, run_date={self.run_date})>"
@@ -0,0 +1,152 @@
+"""
+Хранилище состояний FSM aiogram в базе данных бота.
+
+Состояние и данные каждого ключа хранятся строкой таблицы fsm_states, поэтому пользователь
+посреди регистрации не теряет её при перезапуске, а несколько процессов бота видят одно состояние.
+Чтения идут через кэш в памяти процесса с коротким временем жизни (FSM_CACHE_TTL): состояние
+проверяется на каждом апдейте, а меняется редко. Записи выполняются сразу в БД (upsert одной
+колонки, у брошенной записи другая колонка сбрасывается) и обновляют кэш. Состояния без изменений дольше FSM_STATE_TTL считаются брошенными:
+они не возвращаются и удаляются ночной очисткой.
+"""
+
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from sqlalchemy import case, delete, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.future import select
+from bot.config.config import config
+from bot.database.database import async_session, engine
+from bot.database.models import FSMRecord
+from bot.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def storage_key(key: StorageKey) -> str:
+    """Строковый ключ записи: все поля ключа aiogram, пустые - пустой строкой."""
+    return ":".join(
+        "" if part is None else str(part)
+        for part in (key.bot_id, key.chat_id, key.user_id, key.thread_id, key.business_connection_id, key.destiny)
+    )
+
+
+class DatabaseStorage(BaseStorage):
+    """
+    FSM-хранилище в таблице fsm_states с кэшем чтений в памяти.
+    Атрибуты:
+        state_ttl (int): Время жизни состояния без изменений, секунды
+    """
+
+    def __init__(self, state_ttl: int | None = None, cache_ttl: float | None = None, cache_size: int | None = None):
+        self.state_ttl = config.FSM_STATE_TTL if state_ttl is None else state_ttl
+        cache_ttl = config.FSM_CACHE_TTL if cache_ttl is None else cache_ttl
+        # ключ -> (состояние, данные, время изменения); при cache_ttl=0 каждое чтение идёт в БД
+        self._cache = LRUCache(maxsize=cache_size or config.USER_CACHE_SIZE, ttl=cache_ttl) if cache_ttl > 0 else None
+
+    def _expired(self, updated_at: datetime) -> bool:
+        return bool(self.state_ttl) and updated_at < _utc_now() - timedelta(seconds=self.state_ttl)
+
+    async def _load(self, key: str) -> tuple[str | None, dict[str, Any]]:
+        """Состояние и данные ключа (из кэша или БД); брошенное состояние считается пустым."""
+        entry = self._cache.get(key, _MISSING) if self._cache is not None else _MISSING
+        if entry is _MISSING:
+            async with async_session() as session:
+                row = (await session.execute(
+                    select(FSMRecord.state, FSMRecord.data, FSMRecord.updated_at).where(FSMRecord.key == key)
+                )).first()
+            entry = (row.state, json.loads(row.data), row.updated_at) if row else (None, {}, None)
+            if self._cache is not None:
+                self._cache.set(key, entry)
+
+        state, data, updated_at = entry
+        if updated_at is not None and self._expired(updated_at):
+            return None, {}
+        return state, data
+
+    async def _save(self, key: str, **values: Any) -> None:
+        """Записывает колонку state или data ключа одним upsert и обновляет кэш.
+        Другая колонка брошенной записи (старше state_ttl) в том же upsert сбрасывается в пустое значение:
+        иначе запись одной колонки вернула бы вместе с ней брошенные состояние или данные.
+        """
+        now = _utc_now()
+        empty = {"state": None, "data": "{}"}
+        update = dict(values, updated_at=now)
+        if self.state_ttl:
+            expired = FSMRecord.updated_at < now - timedelta(seconds=self.state_ttl)
+            for column in empty.keys() - values.keys():
+                update[column] = case((expired, empty[column]), else_=getattr(FSMRecord, column))
+
+        if engine.dialect.name == "sqlite":
+            stmt = sqlite.insert(FSMRecord)
+        elif engine.dialect.name == "postgresql":
+            stmt = postgresql.insert(FSMRecord)
+        else:
+            stmt = None
+
+        async with async_session() as session:
+            if stmt is not None:
+                stmt = (stmt.values(key=key, **{**empty, **values}, updated_at=now)
+                        .on_conflict_do_update(index_elements=[FSMRecord.key], set_=update)
+                        .returning(FSMRecord.state, FSMRecord.data))
+                state, data = (await session.execute(stmt)).one()
+            else:
+                record = await session.get(FSMRecord, key) or FSMRecord(key=key, **empty)
+                if record.updated_at is not None and self._expired(record.updated_at):
+                    for column, value in empty.items():
+                        setattr(record, column, value)
+                for column, value in values.items():
+                    setattr(record, column, value)
+                record.updated_at = now
+                session.add(record)
+                state, data = record.state, record.data
+            await session.commit()
+
+        # upsert вернул обе колонки, поэтому кэш получает запись целиком, а не только изменённую колонку
+        if self._cache is not None:
+            self._cache.set(key, (state, json.loads(data), now))
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._save(storage_key(key), state=state.state if isinstance(state, State) else state)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        state, _ = await self._load(storage_key(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        await self._save(storage_key(key), data=json.dumps(data, ensure_ascii=False))
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        _, data = await self._load(storage_key(key))
+        # копия, чтобы изменения вызывающего кода не попадали в кэш
+        return dict(data)
+
+    async def close(self) -> None:
+        if self._cache is not None:
+            self._cache.clear()
+
+
+async def delete_expired_states(state_ttl: int | None = None) -> int:
+    """
+    Удаляет брошенные состояния (без изменений дольше state_ttl) и пустые записи,
+    оставшиеся после завершения диалогов.
+    :return: количество удалённых записей
+    """
+    state_ttl = config.FSM_STATE_TTL if state_ttl is None else state_ttl
+    conditions = [(FSMRecord.state.is_(None)) & (FSMRecord.data == "{}")]
+    if state_ttl:
+        conditions.append(FSMRecord.updated_at < _utc_now() - timedelta(seconds=state_ttl))
+    async with async_session() as session:
+        result = await session.execute(delete(FSMRecord).where(or_(*conditions)))
+        await session.commit()
+    logger.info("Очистка состояний FSM: удалено %s", result.rowcount)
+    return result.rowcount
@@ -3,6 +3,8 @@ from bot.handlers.start import register_start_handlers
 from bot.handlers.registration import register_registration_handlers
 from bot.handlers.weather import register_weather_handlers
 from bot.handlers.admin import register_admin_handlers
+from bot.handlers.alerts import register_alert_handlers
+from bot.handlers.locations import register_location_handlers
 
 
 def register_all_handlers(dp: Dispatcher):
@@ -10,4 +12,6 @@ def register_all_handlers(dp: Dispatcher):
     register_start_handlers(dp)
     register_registration_handlers(dp)
     register_weather_handlers(dp)
-    register_admin_handlers(dp)
\ No newline at end of file
+    register_admin_handlers(dp)
+    register_alert_handlers(dp)
+    register_location_handlers(dp)
\ No newline at end of file
@@ -1,15 +1,18 @@
 import logging
+import shlex
+import shutil
+import tempfile
+from pathlib import Path
 from aiogram import Dispatcher, types
-from aiogram.filters import Command
-from sqlalchemy import func
-from sqlalchemy.future import select
-from bot.config.config import Config
-from bot.database.models import User
-from bot.database.database import async_session
+from aiogram.filters import Command, CommandObject
+from bot.config.config import config
+from bot.services.stats import bot_stats
+from bot.services.export import EXPORT_FORMATS, export_weather_data, parse_date
+from bot.utils.loop_lag import loop_lag
+from bot.middlewares.throttling import throttling
 
 
 logger = logging.getLogger(__name__)
-config = Config()
 
 
 async def cmd_stats(message: types.Message):
@@ -18,6 +21,8 @@ async def cmd_stats(message: types.Message):
     - Общее количество пользователей
     - Количество активных пользователей
     - Топ городов по количеству пользователей
+    - Размер истории наблюдений и БД
+    - Скорость последних рассылок
 
     Аргументы:
         message: types.Message - Объект сообщения от пользователя
@@ -27,7 +32,7 @@ async def cmd_stats(message: types.Message):
 
     Действия:
         1. Проверяет права администратора
-        2. Формирует статистические данные из БД
+        2. Берёт счётчики пользователей из памяти (при первом обращении - одним запросом к БД)
         3. Отправляет сводку администратору
     """
     user_id = message.from_user.id
@@ -37,23 +42,9 @@ async def cmd_stats(message: types.Message):
         await message.answer("У вас нет прав для выполнения этой команды.")
         return
 
-    # получение статистики пользователей
-    async with async_session() as session:
-        # общее количество пользователей
-        total_users_result = await session.execute(select(func.count(User.id)))
-        total_users = total_users_result.scalar_one()
-
-        # количество активных пользователей
-        active_users_result = await session.execute(select(func.count(User.id)).where(User.is_active.is_(True)))
-        active_users = active_users_result.scalar_one()
-
-        # города пользователей
-        cities_result = await session.execute(
-            select(User.city, func.count(User.id))
-            .group_by(User.city)
-            .order_by(func.count(User.id).desc())
-        )
-        cities = cities_result.all()
+    # получение статистики пользователей и хранилища
+    total_users, active_users, cities = await bot_stats.get_user_stats(limit=10)
+    storage = await bot_stats.get_storage_stats()
 
     # формируем сообщение со статистикой
     stats_message = (
@@ -63,12 +54,97 @@ async def cmd_stats(message: types.Message):
         f"🏙️ Топ городов:\n"
     )
 
-    for city, count in cities[:10]:
+    for city, count in cities:
         stats_message += f"- {city}: {count} пользователей\n"
 
+    stats_message += (
+        f"\n📦 Наблюдений в истории: {storage['observations']} "
+        f"(дневных агрегатов: {storage['aggregates']})\n"
+    )
+    if storage["size_bytes"] is not None:
+        stats_message += f"💾 Размер БД: {storage['size_bytes'] / 1024 / 1024:.1f} МБ\n"
+
+    for broadcast in bot_stats.broadcasts.values():
+        stats_message += (
+            f"📨 Рассылка {broadcast.job} ({broadcast.finished_at.strftime('%d.%m %H:%M')}): "
+            f"{broadcast.sent} отправлено, {broadcast.failed} ошибок, "
+            f"{broadcast.elapsed:.1f} с ({broadcast.throughput:.2f} сообщ./с)\n"
+        )
+
+    throttled, replayed = throttling.total()
+    if throttled:
+        stats_message += f"🚦 Ограничено частых запросов: {throttled} (ответ из сохранённого: {replayed})\n"
+
+    if loop_lag.samples:
+        stats_message += (
+            f"⏱️ Задержка цикла событий: p50 {loop_lag.percentile(50) * 1000:.0f} мс, "
+            f"p99 {loop_lag.percentile(99) * 1000:.0f} мс\n"
+        )
+
     await message.answer(stats_message)
 
 
+async def cmd_export(message: types.Message, command: CommandObject):
+    """Команда /export для выгрузки истории наблюдений администратору
+    Формат: /export [city="Нижний Новгород"] [from=2025-01-01] [to=2025-01-31] [format=csv|ndjson]
+
+    Аргументы:
+        message: types.Message - Объект сообщения от пользователя
+        command: CommandObject - Разобранная команда с аргументами
+
+    Доступ:
+        Только для пользователей, указанных в config.ADMIN_IDS
+
+    Действия:
+        1. Разбирает фильтры выгрузки
+        2. Потоково выгружает историю в сжатые файлы во временной папке
+        3. Отправляет файлы документами частями, не превышающими лимит Telegram
+    """
+    if message.from_user.id not in config.ADMIN_IDS:
+        await message.answer("У вас нет прав для выполнения этой команды.")
+        return
+
+    try:
+        options = dict(arg.split("=", 1) for arg in shlex.split(command.args or ""))
+        fmt = options.get("format", "csv").lower()
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Неизвестный формат: {fmt}")
+        date_from = parse_date(options.get("from"))
+        date_to = parse_date(options.get("to"))
+    except ValueError as e:
+        await message.answer(
+            f"Ошибка в параметрах: {e}\n"
+            f"Формат: /export [city=Москва] [from=2025-01-01] [to=2025-01-31] [format=csv|ndjson]"
+        )
+        return
+
+    await message.answer("⏳ Готовлю выгрузку истории наблюдений...")
+    output_dir = Path(tempfile.mkdtemp(prefix="export_"))
+    try:
+        result = await export_weather_data(
+            output_dir,
+            fmt=fmt,
+            city=options.get("city"),
+            date_from=date_from,
+            date_to=date_to,
+            part_size=config.EXPORT_PART_SIZE_MB * 1024 * 1024
+        )
+        if not result.rows:
+            await message.answer("Нет данных для выгрузки по заданным фильтрам.")
+            return
+
+        for path in result.files:
+            await message.answer_document(types.FSInputFile(path, filename=path.name))
+        await message.answer(f"✅ Выгружено строк: {result.rows}, файлов: {len(result.files)} "
+                             f"за {result.elapsed:.1f} с")
+    except Exception as e:
+        logger.error("Ошибка при выгрузке истории погоды: %s", e)
+        await message.answer("Произошла ошибка при выгрузке данных.")
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
 def register_admin_handlers(dp: Dispatcher):
     """Регистрация обработчиков команд администратора"""
     dp.message.register(cmd_stats, Command("stats"))
+    dp.message.register(cmd_export, Command("export"))
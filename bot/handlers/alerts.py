@@ -0,0 +1,91 @@
+import logging
+from aiogram import Dispatcher, types
+from aiogram.filters import Command, CommandObject
+from bot.config.config import config
+from bot.database.models import User
+from bot.keyboards.reply import get_start_keyboard
+from bot.services.alerts import ALERT_METRICS, add_alert, list_alerts, parse_alert, remove_alerts
+
+
+logger = logging.getLogger(__name__)
+
+ALERT_USAGE = (
+    "Формат: /alert <вид> <порог> [часов вперёд]\n"
+    f"Виды: {', '.join(ALERT_METRICS)}\n"
+    "Например: /alert мороз -10 24 или /alert ветер 15"
+)
+
+
+async def _require_user(message: types.Message, user: User | None) -> bool:
+    """Отвечает незарегистрированному пользователю и возвращает False"""
+    if user:
+        return True
+    await message.answer("Вы еще не зарегистрированы. Пожалуйста, зарегистрируйтесь, чтобы получать предупреждения",
+                         reply_markup=get_start_keyboard(is_registered=False))
+    return False
+
+
+async def cmd_alerts(message: types.Message, user: User | None = None) -> None:
+    """Команда /alerts - список подписок на погодные предупреждения"""
+    if not await _require_user(message, user):
+        return
+
+    alerts = await list_alerts(user.id)
+    if not alerts:
+        await message.answer(f"У вас нет подписок на погодные предупреждения.\n\n{ALERT_USAGE}")
+        return
+
+    text = f"⚠️ Погодные предупреждения для города {user.city}:\n\n"
+    for alert in alerts:
+        metric = ALERT_METRICS[alert.metric]
+        text += (f"#{alert.id} {metric.label}: порог {alert.threshold:.1f}{metric.unit}, "
+                 f"на {alert.window_hours} ч. вперёд\n")
+    text += "\nОтписаться: /alert_off <номер> или /alert_off all"
+    await message.answer(text)
+
+
+async def cmd_alert(message: types.Message, command: CommandObject, user: User | None = None) -> None:
+    """Команда /alert - подписка на предупреждение, например /alert мороз -10 24"""
+    if not await _require_user(message, user):
+        return
+
+    try:
+        metric, threshold, window_hours = parse_alert(command.args)
+    except ValueError as e:
+        await message.answer(f"Ошибка в параметрах: {e}\n{ALERT_USAGE}")
+        return
+
+    if not await add_alert(user.id, metric, threshold, window_hours):
+        await message.answer(f"Такая подписка уже есть или достигнут лимит ({config.ALERT_MAX_PER_USER} подписок).")
+        return
+
+    unit = ALERT_METRICS[metric].unit
+    direction = "не ниже" if ALERT_METRICS[metric].sign > 0 else "не выше"
+    logger.info("Пользователь %s подписался на предупреждение %s %s", user.user_id, metric, threshold)
+    await message.answer(f"✅ Предупрежу, если в ближайшие {window_hours} ч. в городе {user.city} "
+                         f"ожидается {metric} ({direction} {threshold:.1f}{unit}).")
+
+
+async def cmd_alert_off(message: types.Message, command: CommandObject, user: User | None = None) -> None:
+    """Команда /alert_off - отписка от предупреждения по номеру или от всех сразу"""
+    if not await _require_user(message, user):
+        return
+
+    args = (command.args or "").strip().lstrip("#")
+    if args.lower() == "all":
+        alert_id = None
+    elif args.isdigit():
+        alert_id = int(args)
+    else:
+        await message.answer("Формат: /alert_off <номер> или /alert_off all (номера - в /alerts)")
+        return
+
+    removed = await remove_alerts(user.id, alert_id)
+    await message.answer(f"Удалено подписок: {removed}" if removed else "Подписка не найдена.")
+
+
+def register_alert_handlers(dp: Dispatcher):
+    """Регистрация обработчиков подписок на погодные предупреждения"""
+    dp.message.register(cmd_alerts, Command("alerts"))
+    dp.message.register(cmd_alert, Command("alert"))
+    dp.message.register(cmd_alert_off, Command("alert_off"))
@@ -0,0 +1,88 @@
+import logging
+from aiogram import Dispatcher, types
+from aiogram import F
+from aiogram.filters import Command, CommandObject
+from bot.config.config import config
+from bot.database.models import User
+from bot.keyboards.reply import get_start_keyboard, get_weather_keyboard
+from bot.services.locations import add_location, get_locations, remove_location
+from bot.container import app
+
+
+logger = logging.getLogger(__name__)
+weather_api = app.weather_api
+
+PLACES_USAGE = (
+    "Добавить место: /place_add <город>; <название>, например /place_add Истра; Дача\n"
+    "Удалить место: /place_remove <номер>"
+)
+
+
+async def cmd_places(message: types.Message, user: User | None = None) -> None:
+    """Список мест пользователя: основной город и дополнительные места"""
+    if not user:
+        await message.answer("Вы еще не зарегистрированы. Пожалуйста, зарегистрируйтесь, чтобы сохранять места",
+                             reply_markup=get_start_keyboard(is_registered=False))
+        return
+
+    text = f"📍 Ваши места:\n\n🏠 {user.city} (основной город, меняется кнопкой «Изменить город»)\n"
+    for location in await get_locations(user.id):
+        text += f"#{location.id} {location.label}\n"
+    text += f"\nПогода и рассылки приходят для каждого места.\n\n{PLACES_USAGE}"
+    await message.answer(text, reply_markup=get_weather_keyboard())
+
+
+async def cmd_place_add(message: types.Message, command: CommandObject, user: User | None = None) -> None:
+    """Команда /place_add - сохраняет дополнительное место, например /place_add Истра; Дача"""
+    if not user:
+        await message.answer("Вы еще не зарегистрированы. Пожалуйста, зарегистрируйтесь, чтобы сохранять места",
+                             reply_markup=get_start_keyboard(is_registered=False))
+        return
+
+    city, _, name = (command.args or "").partition(";")
+    city, name = city.strip(), name.strip()
+    if not city:
+        await message.answer(PLACES_USAGE)
+        return
+    # город из справочника сохраняется под каноническим названием
+    known = app.city_index.resolve(city)
+    if known:
+        city = known.name
+
+    # проверка города через апи (ответ попадает в общий кэш и пригодится для первой рассылки)
+    weather_data = await weather_api.get_current_weather(city)
+    if not weather_data:
+        await message.answer("Не удалось найти такой город. Проверьте написание и попробуйте ещё раз.")
+        return
+
+    if not await add_location(user, city, name or None, weather_data["lat"], weather_data["lon"]):
+        await message.answer(f"Это место уже сохранено или достигнут лимит ({config.MAX_LOCATIONS} мест).")
+        return
+
+    logger.info("Пользователь %s добавил место %s", user.user_id, city)
+    await message.answer(f"✅ Место {name or city} добавлено. Список мест: /places")
+
+
+async def cmd_place_remove(message: types.Message, command: CommandObject, user: User | None = None) -> None:
+    """Команда /place_remove - удаляет дополнительное место по номеру из /places"""
+    if not user:
+        await message.answer("Вы еще не зарегистрированы.", reply_markup=get_start_keyboard(is_registered=False))
+        return
+
+    args = (command.args or "").strip().lstrip("#")
+    if not args.isdigit():
+        await message.answer("Формат: /place_remove <номер> (номера - в /places)")
+        return
+
+    if await remove_location(user.id, int(args)):
+        await message.answer("Место удалено.")
+    else:
+        await message.answer("Место не найдено.")
+
+
+def register_location_handlers(dp: Dispatcher):
+    """Регистрация обработчиков дополнительных мест пользователя"""
+    dp.message.register(cmd_places, F.text == "Мои места")
+    dp.message.register(cmd_places, Command("places"))
+    dp.message.register(cmd_place_add, Command("place_add"))
+    dp.message.register(cmd_place_remove, Command("place_remove"))
@@ -3,14 +3,18 @@ from aiogram import Dispatcher, types
 from aiogram import F
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from sqlalchemy.future import select
+from sqlalchemy import update
 from bot.database.models import User
 from bot.database.database import async_session
-from bot.keyboards.reply import get_start_keyboard
-from bot.services.weather_api import WeatherAPI
+from bot.keyboards.inline import get_cities_keyboard
+from bot.keyboards.reply import get_location_keyboard, get_start_keyboard
+from bot.container import app
+from bot.services.users import invalidate_user
+from bot.services.stats import bot_stats
 from typing import Dict, Any
 
 logger = logging.getLogger(__name__)
+weather_api = app.weather_api
 
 
 class RegistrationForm(StatesGroup):
@@ -19,18 +23,76 @@ class RegistrationForm(StatesGroup):
 
 async def register_command(message: types.Message, state: FSMContext) -> None:
     """Функция обработки команды регистрации пользователя."""
-    await message.answer("Для регистрации укажите свой город, чтобы я мог присылать вам информацию о погоде.",
-                         reply_markup=types.ReplyKeyboardRemove())
+    me = await message.bot.me()
+    await message.answer("Для регистрации укажите свой город или отправьте местоположение, "
+                         "чтобы я мог присылать вам информацию о погоде.\n"
+                         f"Подсказки появятся, если начать вводить название после @{me.username}",
+                         reply_markup=get_location_keyboard())
 
     await state.set_state(RegistrationForm.waiting_for_city)
 
-async def process_city(message: types.Message, state: FSMContext) -> None:
-    """Функция обработки введенного города пользователем."""
-    city = message.text.strip()
+async def process_city(message: types.Message, state: FSMContext, user: User | None = None) -> None:
+    """Функция обработки введенного города пользователем.
+    Город сначала ищется в локальном справочнике: при опечатке пользователь выбирает вариант
+    из подсказок без обращения к апи. Уже зарегистрированный пользователь передаётся из UserMiddleware.
+    """
+    text = message.text.strip()
+    city_index = app.city_index
+    city = city_index.resolve(text)
+    if city is None:
+        suggestions = [suggestion.name for suggestion in city_index.suggest(text)]
+        if suggestions:
+            # введённый текст тоже можно выбрать: небольшого города может не быть в справочнике
+            await message.answer("Не нашёл такой город в справочнике. Возможно, вы имели в виду:",
+                                 reply_markup=get_cities_keyboard(suggestions + [text]))
+            return
+    await save_city(message, state, message.from_user, city.name if city else text, user)
 
+
+async def process_location(message: types.Message, state: FSMContext, user: User | None = None) -> None:
+    """Функция обработки местоположения, отправленного вместо названия города.
+    Название места определяется обратным геокодированием, погода запрашивается по координатам.
+    """
+    latitude, longitude = message.location.latitude, message.location.longitude
+    city = await weather_api.reverse_geocode(latitude, longitude)
+    if not city:
+        await message.answer("Не удалось определить город по местоположению. Пожалуйста, введите название города.")
+        return
+    await save_city(message, state, message.from_user, city, user, latitude, longitude)
+
+
+async def process_city_choice(callback: types.CallbackQuery, state: FSMContext, user: User | None = None) -> None:
+    """Функция обработки выбора города из подсказок."""
+    city = callback.data.removeprefix("city:")
+    await callback.answer()
+    await callback.message.edit_reply_markup(reply_markup=None)
+    await save_city(callback.message, state, callback.from_user, city, user)
+
+
+async def inline_city_search(inline_query: types.InlineQuery) -> None:
+    """Подсказки городов в инлайн-режиме: выбранный город отправляется сообщением от пользователя."""
+    results = [
+        types.InlineQueryResultArticle(
+            id=str(i),
+            title=city.name,
+            description=f"{city.name_en}, {city.country}",
+            input_message_content=types.InputTextMessageContent(message_text=city.name),
+        )
+        for i, city in enumerate(app.city_index.suggest(inline_query.query, limit=10))
+    ]
+    await inline_query.answer(results, cache_time=3600, is_personal=False)
+
+
+async def save_city(message: types.Message, state: FSMContext, from_user: types.User, city: str,
+                    user: User | None = None, latitude: float | None = None, longitude: float | None = None) -> None:
+    """Проверяет окончательно выбранный город через апи погоды (он же даёт координаты)
+    и сохраняет его пользователю.
+    :param message: сообщение, в чат которого отправляется ответ
+    :param from_user: пользователь Telegram, выбравший город
+    :param latitude: широта отправленного местоположения (сохраняется центр его ячейки геохеша)
+    """
     # Проверка на наличие города через API погоды
-    weather_api = WeatherAPI()
-    weather_data: Dict[str, Any] | None = await weather_api.get_current_weather(city)
+    weather_data: Dict[str, Any] | None = await weather_api.get_current_weather(city, latitude, longitude)
 
     if not weather_data:
         await message.answer("Извините, но не удалось найти введенный вами город. "
@@ -39,24 +101,25 @@ async def process_city(message: types.Message, state: FSMContext) -> None:
         return
 
     # Получение информации о пользователе
-    user_id = message.from_user.id
-    username = message.from_user.username
-    first_name = message.from_user.first_name
-    last_name = message.from_user.last_name
+    user_id = from_user.id
+    username = from_user.username
+    first_name = from_user.first_name
+    last_name = from_user.last_name
 
     async with async_session() as session:
-        # Проверка, зарегистрирован ли пользователь
-        stmt = select(User).where(User.user_id == user_id)  # type: ignore
-        result = await session.execute(stmt)
-        existing_user = result.scalar_one_or_none()
-
-        if existing_user:
+        if user:
             # Если пользователь уже зарегистрирован, обновляем данные
-            existing_user.city = city
-            existing_user.latitude = weather_data["lat"]
-            existing_user.longitude = weather_data["lon"]
+            await session.execute(
+                update(User).where(User.id == user.id).values(
+                    city=city,
+                    latitude=weather_data["lat"],
+                    longitude=weather_data["lon"]
+                )
+            )
             await session.commit()
-            logger.info(f"Обновление данных пользователя ({user_id}), город: {city}")
+            invalidate_user(user_id)
+            bot_stats.on_city_change(user.city, city)
+            logger.info("Обновление данных пользователя (%s), город: %s", user_id, city)
             await message.answer(
                 f"Ваш город успешно обновлен. Теперь вы будете получать информацию о погоде для города {city}.",
                 reply_markup=get_start_keyboard(is_registered=True)
@@ -74,7 +137,9 @@ async def process_city(message: types.Message, state: FSMContext) -> None:
                 )
             session.add(new_user)
             await session.commit()
-            logger.info(f"Зарегистрирован новый пользователь ({user_id}), город: {city}")
+            invalidate_user(user_id)
+            bot_stats.on_register(city)
+            logger.info("Зарегистрирован новый пользователь (%s), город: %s", user_id, city)
             await message.answer(
                 f"Вы успешно зарегистрированы! Теперь вы будете получать информацию о погоде для города {city}.",
                 reply_markup=get_start_keyboard(is_registered=True)
@@ -85,4 +150,7 @@ async def process_city(message: types.Message, state: FSMContext) -> None:
 def register_registration_handlers(dp: Dispatcher):
     """Функция регистрации обработчиков для регистрации пользователя."""
     dp.message.register(register_command, F.text=="Зарегистрироваться")
-    dp.message.register(process_city, RegistrationForm.waiting_for_city)
+    dp.message.register(process_location, RegistrationForm.waiting_for_city, F.location)
+    dp.message.register(process_city, RegistrationForm.waiting_for_city, F.text)
+    dp.callback_query.register(process_city_choice, RegistrationForm.waiting_for_city, F.data.startswith("city:"))
+    dp.inline_query.register(inline_city_search)
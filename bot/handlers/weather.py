@@ -1,139 +1,195 @@
+import asyncio
 import logging
 from aiogram import Dispatcher, types
 from aiogram import F
 from aiogram.fsm.context import FSMContext
-from datetime import datetime
+from datetime import date, datetime
 from pytz import timezone, utc
-from sqlalchemy.future import select
 from typing import Any
-from bot.database.models import User, WeatherData
-from bot.database.database import async_session
-from bot.services.weather_api import WeatherAPI
+from bot.database.models import User
+from bot.container import app
 from bot.services.analytics import WeatherAnalytics
+from bot.services.climate import climate_baselines
+from bot.services.locations import Place, get_places
+from bot.keyboards.inline import ForecastCallback, get_forecast_keyboard
+from bot.middlewares.throttling import Throttle
 from bot.keyboards.reply import get_weather_keyboard, get_start_keyboard
 
 
 logger = logging.getLogger(__name__)
-weather_api = WeatherAPI()
+weather_api = app.weather_api
 
+# не больше двух запросов погоды одного вида в минуту, остальные получают последний ответ
+WEATHER_THROTTLE = Throttle(rate=2, period=60)
 
-async def get_weather_now(message: types.Message):
-    """Получение текущей информации о погоде"""
-    utc_time = message.date.astimezone(timezone('Europe/Moscow'))
-    formatted_time = utc_time.strftime('%H:%M:%S')
-
-    user_id = message.from_user.id
-
-    # получение данных о пользователе
-    async with async_session() as session:
-        stmt = select(User).where(User.user_id == user_id)
-        result = await session.execute(stmt)
-        user = result.scalar_one_or_none()
-
-    if not user:
-        await message.answer("Вы еще не зарегистрированы. Пожалуйста, зарегистрируйтесь, чтобы получать прогноз погоды",
-                             reply_markup=get_start_keyboard(is_registered=False)
-                             )
-        return
-
-    # получение данных о погоде для города, который был выбран пользователем
-    # weather_data = await weather_api.get_current_weather(user.city)
-    weather_data: dict[str, Any] | None = await weather_api.get_current_weather(user.city)
-
-    if not weather_data:
-        await message.answer("Извините, ошибка получения данных о погоде. Попробуйте позже",
-                             reply_markup=get_weather_keyboard()
-                             )
-        return
-
-    # сохранение данных о погоде в базу данных
-    async with async_session() as session:
-        new_weather_data = WeatherData(
-            user_id=user.id,
-            temperature=weather_data["temperature"],
-            feels_like=weather_data["feels_like"],
-            pressure=weather_data["pressure"],
-            humidity=weather_data["humidity"],
-            wind_speed=weather_data["wind_speed"],
-            description=weather_data["description"]
-        )
-        session.add(new_weather_data)
-        await session.commit()
 
+def format_current_weather(weather_data: dict[str, Any], place: Place, formatted_time: str) -> str:
+    """Текст текущей погоды для места пользователя"""
     # Преобразование времени заката и рассвета в читаемый формат
     moscow_tz = timezone("Europe/Moscow")
     sunrise_time = datetime.fromtimestamp(weather_data["sunrise"], utc).astimezone(moscow_tz).strftime('%H:%M:%S')
     sunset_time = datetime.fromtimestamp(weather_data["sunset"], utc).astimezone(moscow_tz).strftime('%H:%M:%S')
 
-    # ответное сообщение с текущей погодой пользователю
-    weather_message = (
-        f"Погода в городе {weather_data['city']} ({weather_data['country']}):\n\n"
+    # сравнение с климатической нормой города на сегодня
+    anomaly = climate_baselines.anomaly(place.city, date.today(), weather_data["temperature"])
+    anomaly_line = f"📈 Относительно нормы: {anomaly.describe()}\n" if anomaly else ""
+    title = "" if place.primary else f"📍 {place.label}\n"
+
+    return (
+        f"{title}Погода в городе {place.city} ({weather_data['country']}):\n\n"
         f"🌡️ Температура: {weather_data['temperature']:.1f}°C (ощущается как {weather_data['feels_like']:.1f}°C)\n"
         f"💧 Влажность: {weather_data['humidity']}%\n"
         f"🌬️ Ветер: {weather_data['wind_speed']} м/с\n"
-        f"🔍 {weather_data['description'].capitalize()}\n\n"
+        f"🔍 {weather_data['description'].capitalize()}\n"
+        f"{anomaly_line}\n"
         f"🌅 Восход солнца: {sunrise_time}\n"
         f"🌇 Закат солнца: {sunset_time}\n\n"
         f"🕒 Данные обновлены: {formatted_time}\n"  # message.date.strftime('%H:%M:%S')
         f"*** Хорошего дня! ***"
     )   # Облачность: 100% Восход солнца: 08:27:39
 
-    await message.answer(weather_message, reply_markup=get_weather_keyboard())
 
-async def get_weather_forecast(message: types.Message) -> None:
-    """Получение прогноза погоды на 5 дней"""
-    try:
-        user_id = message.from_user.id
+async def get_weather_now(message: types.Message, user: User | None = None):
+    """Получение текущей информации о погоде для каждого места пользователя"""
+    utc_time = message.date.astimezone(timezone('Europe/Moscow'))
+    formatted_time = utc_time.strftime('%H:%M:%S')
 
-        # получение данных о пользователе
-        async with async_session() as session:
-            stmt = select(User).where(User.user_id == user_id)
-            result = await session.execute(stmt)
-            user = result.scalar_one_or_none()
+    if not user:
+        await message.answer("Вы еще не зарегистрированы. Пожалуйста, зарегистрируйтесь, чтобы получать прогноз погоды",
+                             reply_markup=get_start_keyboard(is_registered=False)
+                             )
+        return
 
+    # погода всех мест запрашивается параллельно по координатам (соседние места разных пользователей - из общего кэша)
+    places = await get_places(user)
+    weather = await asyncio.gather(*(
+        weather_api.get_current_weather(place.city, place.latitude, place.longitude) for place in places
+    ))
+    await climate_baselines.ensure_loaded()
+
+    for place, weather_data in zip(places, weather):
+        if not weather_data:
+            await message.answer(f"Извините, ошибка получения данных о погоде ({place.label}). Попробуйте позже",
+                                 reply_markup=get_weather_keyboard()
+                                 )
+            continue
+
+        if place.primary:
+            # сохранение данных о погоде в базу данных
+            await WeatherAnalytics.save_weather_data_for_week_analysis(user.id, weather_data, user.city)
+
+        await message.answer(format_current_weather(weather_data, place, formatted_time),
+                             reply_markup=get_weather_keyboard())
+
+# варианты прогноза на кнопках: (первый день, последний день не включая, подпись)
+FORECAST_VIEWS = {
+    "today": (0, 1, "на сегодня"),
+    "tomorrow": (1, 2, "на завтра"),
+    "3days": (0, 3, "на 3 дня"),
+    "5days": (0, 5, "на 5 дней"),
+}
+
+
+def format_forecast(forecast_data: dict[str, Any], place: Place, view: str = "5days") -> str:
+    """Текст прогноза для места: срез дней из одного ответа апи на 5 дней.
+    Для одного дня выводится и прогноз по трёхчасовым интервалам.
+    """
+    start, end, caption = FORECAST_VIEWS[view]
+    days = forecast_data["forecasts"][start:end]
+    title = "" if place.primary else f"📍 {place.label}\n"
+    forecast_message = f"{title}Прогноз погоды {caption} для города {place.city} ({forecast_data['country']}):\n\n"
+    if not days:
+        return forecast_message + "Нет данных прогноза на этот день."
+
+    for forecast in days:
+        date_str = forecast["date"].strftime("%d.%m")
+        anomaly = climate_baselines.anomaly(place.city, forecast["date"], forecast["avg_temp"])
+        forecast_message += (
+            f"📅 {date_str}:\n"
+            f"🌡️ Температура: {forecast['avg_temp']:.1f}°C (от {forecast['min_temp']:.1f}°C до {forecast['max_temp']:.1f}°C)\n"
+            f"💧 Влажность: {forecast['avg_humidity']:.0f}%\n"
+            f"🌬️ Ветер: {forecast['avg_wind']:.1f} м/с\n"
+            f"🔍 {forecast['description'].capitalize()}\n"
+            + (f"📈 Относительно нормы: {anomaly.describe()}\n" if anomaly else "")
+        )
+        if len(days) == 1:
+            for item in forecast["details"]:
+                forecast_message += (f"🕒 {item['time'].strftime('%H:%M')}: {item['temperature']:.1f}°C, "
+                                     f"{item['description']}\n")
+        forecast_message += "\n"
+    return forecast_message
+
+
+async def get_place_forecast(place: Place) -> dict[str, Any] | None:
+    """Прогноз места на 5 дней: все варианты на кнопках - срезы этого ответа из общего кэша"""
+    return await weather_api.get_forecast(place.city, days=5, lat=place.latitude, lon=place.longitude)
+
+
+async def get_weather_forecast(message: types.Message, user: User | None = None) -> None:
+    """Получение прогноза погоды на 5 дней для каждого места пользователя"""
+    try:
         if not user:
             await message.answer("Вы еще не зарегистрированы. Пожалуйста, зарегистрируйтесь, чтобы получать прогноз погоды",
                                  reply_markup=get_start_keyboard(is_registered=False)
                                  )
             return
-        # получение прогноза погоды для города, который был выбран пользователем
-        forecast_data = await weather_api.get_forecast(user.city, days=5)
-        logger.info(f"Forecast data:{forecast_data}")
-        print(f"Forecast data - {forecast_data} -")
-
-        if not forecast_data:
-            await message.answer("Извините, ошибка получения данных о погоде. Попробуйте позже",
-                                 reply_markup=get_weather_keyboard()
-                                 )
-            return
-
-        # ответное сообщение с прогнозом погоды пользователю
-        forecast_message = f"Прогноз погоды на 5 дней для города {forecast_data['city']} ({forecast_data['country']}):\n\n"
-
-        for forecast in forecast_data["forecasts"][:5]:  # Берем только первые 5 дней
-            date_str = forecast["date"].strftime("%d.%m")
-            forecast_message += (
-                f"📅 {date_str}:\n"
-                f"🌡️ Температура: {forecast['avg_temp']:.1f}°C (от {forecast['min_temp']:.1f}°C до {forecast['max_temp']:.1f}°C)\n"
-                f"💧 Влажность: {forecast['avg_humidity']:.0f}%\n"
-                f"🌬️ Ветер: {forecast['avg_wind']:.1f} м/с\n"
-                f"🔍 {forecast['description'].capitalize()}\n\n"
-            )
-        await message.answer(forecast_message, reply_markup=get_weather_keyboard())
+        # получение прогнозов для всех мест пользователя
+        places = await get_places(user)
+        forecasts = await asyncio.gather(*(get_place_forecast(place) for place in places))
+        await climate_baselines.ensure_loaded()
+
+        for place, forecast_data in zip(places, forecasts):
+            # весь прогноз - только в отладочном логе: на уровне INFO он форматировался бы на каждое нажатие
+            logger.debug("Прогноз для %s: %s", place.city, forecast_data)
+
+            if not forecast_data:
+                await message.answer(f"Извините, ошибка получения данных о погоде ({place.label}). Попробуйте позже",
+                                     reply_markup=get_weather_keyboard()
+                                     )
+                continue
+
+            # ответное сообщение с прогнозом погоды пользователю; кнопки переключают дни в этом же сообщении
+            await message.answer(format_forecast(forecast_data, place),
+                                 reply_markup=get_forecast_keyboard(place.location_id, "5days"))
     except Exception as e:
-        logger.error(f"Ошибка: {e}")
+        logger.error("Ошибка: %s", e)
         await message.answer("Произошла внутренняя ошибка при получении прогноза.")
 
-async def get_weekly_analysis(message: types.Message) -> None:
-    """Получение недельного анализа погоды"""
-    user_id = message.from_user.id
 
-    # Получение данных о пользователе
-    async with async_session() as session:
-        stmt = select(User).where(User.user_id == user_id)
-        result = await session.execute(stmt)
-        user = result.scalar_one_or_none()
+async def switch_forecast_view(callback: types.CallbackQuery, callback_data: ForecastCallback,
+                               user: User | None = None) -> None:
+    """Переключение дней прогноза кнопками: сообщение редактируется на месте,
+    прогноз берётся из общего кэша без нового запроса к апи
+    """
+    if not isinstance(callback.message, types.Message):
+        # сообщение удалено или старше 48 часов - Telegram не даёт его прочитать и изменить
+        await callback.answer("Сообщение устарело. Запросите прогноз заново.")
+        return
+    if not user:
+        await callback.answer("Вы еще не зарегистрированы.")
+        return
+
+    view = callback_data.view
+    place = next((place for place in await get_places(user) if place.location_id == callback_data.location_id),
+                 None)
+    if place is None:
+        await callback.answer("Это место больше не сохранено.")
+        return
+
+    forecast_data = await get_place_forecast(place)
+    if not forecast_data:
+        await callback.answer("Ошибка получения прогноза. Попробуйте позже")
+        return
+
+    await climate_baselines.ensure_loaded()
+    text = format_forecast(forecast_data, place, view)
+    # повторное нажатие той же кнопки не отправляет в Telegram неизменённое сообщение
+    if text.strip() != (callback.message.text or "").strip():
+        await callback.message.edit_text(text, reply_markup=get_forecast_keyboard(place.location_id, view))
+    await callback.answer()
 
+async def get_weekly_analysis(message: types.Message, user: User | None = None) -> None:
+    """Получение недельного анализа погоды"""
     if not user:
         await message.answer("Вы еще не зарегистрированы. Пожалуйста, зарегистрируйтесь, чтобы получать прогноз погоды",
                              reply_markup=get_start_keyboard(is_registered=False)
@@ -141,7 +197,7 @@ async def get_weekly_analysis(message: types.Message) -> None:
         return
 
     # Получение еженедельного анализа погоды
-    analysis_data = await WeatherAnalytics().get_weekly_analysis(user.id)
+    analysis_data = await WeatherAnalytics.get_weekly_analysis(user)
 
     if not analysis_data:
         await message.answer(
@@ -187,7 +243,9 @@ async def change_city(message: types.Message, state: FSMContext):
 
 def register_weather_handlers(dp: Dispatcher):
     """Регистрация обработчиков команд для погоды"""
-    dp.message.register(get_weather_now, F.text == "Погода сейчас")
-    dp.message.register(get_weather_forecast, F.text == "Погода на 5 дней")
-    dp.message.register(get_weekly_analysis, F.text == "Еженедельный анализ")
+    # каждое нажатие - запрос к апи и запись в историю, поэтому лимит строже общего
+    dp.message.register(get_weather_now, F.text == "Погода сейчас", flags={"throttle": WEATHER_THROTTLE})
+    dp.message.register(get_weather_forecast, F.text == "Погода на 5 дней", flags={"throttle": WEATHER_THROTTLE})
+    dp.callback_query.register(switch_forecast_view, ForecastCallback.filter(F.view.in_(FORECAST_VIEWS)))
+    dp.message.register(get_weekly_analysis, F.text == "Еженедельный анализ", flags={"throttle": WEATHER_THROTTLE})
     dp.message.register(change_city, F.text == "Изменить город")
@@ -1,27 +1,39 @@
+from aiogram.filters.callback_data import CallbackData
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
 
-def get_forecast_keyboard() -> InlineKeyboardMarkup:
-    """Возвращает инлайн-клавиатуру для получения прогноза погоды"""
+class ForecastCallback(CallbackData, prefix="forecast"):
+    """Данные кнопки прогноза: показываемые дни и место пользователя (0 - основной город)."""
+    view: str
+    location_id: int
+
+
+def get_forecast_keyboard(location_id: int = 0, selected: str | None = None) -> InlineKeyboardMarkup:
+    """Возвращает инлайн-клавиатуру для получения прогноза погоды
+    :param location_id: место пользователя, к прогнозу которого относятся кнопки (0 - основной город)
+    :param selected: показанный сейчас вариант прогноза, отмечается точкой
+    """
+    def button(text: str, view: str) -> InlineKeyboardButton:
+        return InlineKeyboardButton(text=f"• {text}" if view == selected else text,
+                                    callback_data=ForecastCallback(view=view, location_id=location_id).pack())
+
     keyboard = [
-        [
-            InlineKeyboardButton(text="Сегодня", callback_data="forecast:today"),
-            InlineKeyboardButton(text="Завтра", callback_data="forecast:tomorrow")
-        ],
-        [
-            InlineKeyboardButton(text="3 дня", callback_data="forecast:3days"),
-            InlineKeyboardButton(text="5 дней", callback_data="forecast:5days")
-        ]
+        [button("Сегодня", "today"), button("Завтра", "tomorrow")],
+        [button("3 дня", "3days"), button("5 дней", "5days")]
     ]
 
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
 def get_cities_keyboard(cities: list) -> InlineKeyboardMarkup:
-    """Возвращает инлайн-клавиатуру для выбора города"""
+    """Возвращает инлайн-клавиатуру для выбора города.
+    Повторы и названия, не помещающиеся в callback_data (64 байта), пропускаются
+    """
     keyboard = []
 
-    for city in cities:
-        keyboard.append([InlineKeyboardButton(text=city, callback_data=f"city:{city}")])
+    for city in dict.fromkeys(cities):
+        callback_data = f"city:{city}"
+        if len(callback_data.encode()) <= 64:
+            keyboard.append([InlineKeyboardButton(text=city, callback_data=callback_data)])
 
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
@@ -9,7 +9,7 @@ def get_start_keyboard(is_registered: bool = False) -> ReplyKeyboardMarkup:
         keyboard.append([KeyboardButton(text="Погода сейчас")])
         keyboard.append([KeyboardButton(text="Погода на 5 дней")])
         keyboard.append([KeyboardButton(text="Еженедельный анализ")])
-        keyboard.append([KeyboardButton(text="Изменить город")])
+        keyboard.append([KeyboardButton(text="Мои места"), KeyboardButton(text="Изменить город")])
     else:
         keyboard.append([KeyboardButton(text="Зарегистрироваться")])
 
@@ -22,7 +22,16 @@ def get_weather_keyboard() -> ReplyKeyboardMarkup:
         [KeyboardButton(text="Погода сейчас")],
         [KeyboardButton(text="Погода на 5 дней")],
         [KeyboardButton(text="Еженедельный анализ")],
-        [KeyboardButton(text="Изменить город")]
+        [KeyboardButton(text="Мои места"), KeyboardButton(text="Изменить город")]
     ]
 
     return ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
+
+
+def get_location_keyboard() -> ReplyKeyboardMarkup:
+    """Возвращает клавиатуру с кнопкой отправки местоположения при выборе города"""
+    keyboard = [
+        [KeyboardButton(text="📍 Отправить местоположение", request_location=True)]
+    ]
+
+    return ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True, one_time_keyboard=True)
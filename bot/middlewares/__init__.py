@@ -0,0 +1,16 @@
+from aiogram import Dispatcher
+from bot.middlewares.throttling import throttling
+from bot.middlewares.user import UserMiddleware
+from bot.utils.shutdown import shutdown
+
+
+def register_all_middlewares(dp: Dispatcher):
+    """Регистрирует все middleware."""
+    # учёт обрабатываемых апдейтов: при остановке бот дожидается их завершения
+    dp.update.outer_middleware(shutdown)
+    user_middleware = UserMiddleware()
+    dp.message.outer_middleware(user_middleware)
+    dp.callback_query.outer_middleware(user_middleware)
+    # ограничение частоты - внутренний middleware: ему нужен выбранный хэндлер и его флаги
+    dp.message.middleware(throttling)
+    dp.callback_query.middleware(throttling)
@@ -0,0 +1,119 @@
+import logging
+import math
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+from aiogram import BaseMiddleware, Bot
+from aiogram.dispatcher.flags import get_flag
+from aiogram.methods import SendMessage, TelegramMethod
+from aiogram.types import CallbackQuery, Message, TelegramObject
+from bot.config.config import config
+from bot.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# ответы, которые отправляет выполняющийся сейчас хэндлер (None - запись не ведётся)
+_replies: ContextVar[list[tuple[str, Any]] | None] = ContextVar("throttling_replies", default=None)
+
+
+@dataclass(frozen=True, slots=True)
+class Throttle:
+    """Лимит хэндлера: не больше rate вызовов одного пользователя за period секунд."""
+    rate: int
+    period: float
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Внутренний middleware, ограничивающий частоту вызова хэндлеров одним пользователем
+    (скользящее окно). Лимит хэндлера задаётся флагом throttle при регистрации
+    (Throttle или False - без ограничения), по умолчанию - THROTTLE_RATE за THROTTLE_PERIOD секунд.
+    На сообщение сверх лимита бот повторяет последний ответ этого хэндлера пользователю
+    без повторного вычисления, на нажатие кнопки - показывает уведомление.
+    Атрибуты:
+        workers (int): Сколько процессов делят лимит: счётчики у каждого процесса свои,
+            поэтому процесс пропускает только свою долю вызовов (округлённую вверх)
+        throttled (Counter[str]): Количество отклонённых апдейтов по хэндлерам
+        replayed (Counter[str]): Сколько из них получили сохранённый ответ
+    """
+
+    def __init__(self, default: Throttle | None = None, cache_size: int | None = None):
+        self.default = default or Throttle(config.THROTTLE_RATE, config.THROTTLE_PERIOD)
+        self.workers = 1
+        # (пользователь, хэндлер) -> время вызовов в пределах окна
+        self._calls = LRUCache(maxsize=cache_size or config.USER_CACHE_SIZE)
+        # (пользователь, хэндлер) -> тексты и клавиатуры последнего ответа
+        self._last_replies = LRUCache(maxsize=cache_size or config.USER_CACHE_SIZE)
+        self.throttled: Counter[str] = Counter()
+        self.replayed: Counter[str] = Counter()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any]
+    ) -> Any:
+        limit: Throttle | None = get_flag(data, "throttle", default=self.default)
+        from_user = data.get("event_from_user")
+        if not limit or from_user is None or "handler" not in data:
+            return await handler(event, data)
+
+        name = data["handler"].callback.__name__
+        key = (from_user.id, name)
+        now = time.monotonic()
+        calls = self._calls.get(key)
+        if calls is None:
+            calls = deque()
+            self._calls.set(key, calls)
+        while calls and calls[0] <= now - limit.period:
+            calls.popleft()
+
+        if len(calls) >= math.ceil(limit.rate / self.workers):
+            self.throttled[name] += 1
+            logger.debug("Ограничение частоты: пользователь %s, хэндлер %s", from_user.id, name)
+            await self._reject(event, key, calls[0] + limit.period - now)
+            return None
+
+        calls.append(now)
+        self._install_recorder(data["bot"])
+        replies: list[tuple[str, Any]] = []
+        token = _replies.set(replies)
+        try:
+            return await handler(event, data)
+        finally:
+            _replies.reset(token)
+            if replies:
+                self._last_replies.set(key, replies)
+
+    async def _reject(self, event: TelegramObject, key: tuple[int, str], wait: float) -> None:
+        """Ответ на апдейт сверх лимита: сохранённый ответ хэндлера или уведомление."""
+        if isinstance(event, CallbackQuery):
+            await event.answer(f"Слишком часто. Попробуйте через {max(wait, 1):.0f} с")
+            return
+
+        replies = self._last_replies.get(key)
+        if isinstance(event, Message) and replies:
+            self.replayed[key[1]] += 1
+            for text, reply_markup in replies:
+                await event.answer(text, reply_markup=reply_markup)
+
+    def _install_recorder(self, bot: Bot) -> None:
+        """Подключает к сессии бота запись отправляемых сообщений (один раз на сессию)."""
+        if self._record not in bot.session.middleware:
+            bot.session.middleware(self._record)
+
+    async def _record(self, make_request: Callable, bot: Bot, method: TelegramMethod) -> Any:
+        """Мидлварь запросов к Telegram: запоминает сообщения, отправленные хэндлером с лимитом."""
+        replies = _replies.get()
+        if replies is not None and isinstance(method, SendMessage):
+            replies.append((method.text, method.reply_markup))
+        return await make_request(bot, method)
+
+    def total(self) -> tuple[int, int]:
+        """Всего отклонённых апдейтов и ответов из сохранённых."""
+        return sum(self.throttled.values()), sum(self.replayed.values())
+
+
+throttling = ThrottlingMiddleware()
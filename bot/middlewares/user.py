@@ -0,0 +1,23 @@
+from typing import Any, Awaitable, Callable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from bot.services.users import get_user
+
+
+class UserMiddleware(BaseMiddleware):
+    """
+    Внешний middleware, который один раз на апдейт определяет пользователя
+    и передаёт его в хэндлеры через аргумент user (User или None).
+    Пользователь берётся из LRU-кэша, к БД запрос идёт только при промахе.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any]
+    ) -> Any:
+        from_user = data.get("event_from_user")
+        if from_user is not None:
+            data["user"] = await get_user(from_user.id)
+        return await handler(event, data)
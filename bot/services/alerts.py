@@ -0,0 +1,297 @@
+"""
+Подписки на погодные предупреждения (мороз, жара, сильный ветер).
+
+Подписка - порог величины и окно в часах: «предупредить, если в ближайшие 24 часа
+будет -10°C или холоднее». Периодическая задача запрашивает прогноз каждого города
+один раз и проверяет по нему все подписки города через индекс, отсортированный по порогу.
+
+Значения приводятся к виду «больше - опаснее» (для мороза температура берётся со знаком минус),
+поэтому накопленный максимум прогноза по времени - неубывающий массив. Сработавшие подписки -
+префикс отсортированного списка порогов (bisect по максимуму за весь прогноз), а время первого
+превышения каждой из них - bisect того же порога в накопленном максимуме. Проверка города
+стоит O(слоты прогноза + log подписок + сработавшие), а не O(подписки × слоты).
+"""
+
+import asyncio
+import logging
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Any, Iterable
+from sqlalchemy import delete, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.future import select
+from bot.config.config import config
+from bot.database.models import AlertSubscription, User
+from bot.database.database import async_session
+
+logger = logging.getLogger(__name__)
+
+# прогноз OWM - слоты по 3 часа; слот, начавшийся меньше 3 часов назад, ещё идёт
+FORECAST_SLOT = timedelta(hours=3)
+MAX_WINDOW_HOURS = 120
+DEFAULT_WINDOW_HOURS = 24
+# сколько прогнозов городов запрашивать у апи одновременно
+ALERT_FORECAST_CONCURRENCY = 5
+
+
+@dataclass(frozen=True, slots=True)
+class AlertMetric:
+    """Вид предупреждения: ключ в деталях прогноза и направление порога."""
+    field: str
+    # 1 - опасно значение не ниже порога, -1 - не выше порога
+    sign: int
+    label: str
+    unit: str
+
+
+ALERT_METRICS = {
+    "мороз": AlertMetric("temperature", -1, "🥶 Мороз", "°C"),
+    "жара": AlertMetric("temperature", 1, "🔥 Жара", "°C"),
+    "ветер": AlertMetric("wind_speed", 1, "🌬️ Сильный ветер", " м/с"),
+}
+
+
+@dataclass(slots=True)
+class Subscription:
+    """Подписка, загруженная для проверки прогнозов."""
+    id: int
+    telegram_id: int
+    city: str
+    metric: str
+    threshold: float
+    window_hours: int
+    last_event_at: datetime | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class AlertEvent:
+    """Превышение порога подписки в прогнозе."""
+    subscription_id: int
+    telegram_id: int
+    city: str
+    metric: str
+    threshold: float
+    starts_at: datetime
+    # самое опасное значение в окне подписки
+    peak: float
+    # о явлении ещё не предупреждали
+    new: bool
+
+    def describe(self) -> str:
+        """Строка для сообщения, например «🥶 Мороз: до -12.0°C с 03:00 21.10 (порог -10.0°C)»."""
+        metric = ALERT_METRICS[self.metric]
+        return (f"{metric.label}: до {self.peak:.1f}{metric.unit} с {self.starts_at:%H:%M %d.%m} "
+                f"(порог {self.threshold:.1f}{metric.unit})")
+
+
+def parse_alert(args: str | None) -> tuple[str, float, int]:
+    """
+    Разбирает аргументы команды /alert: «мороз -10 [24]».
+    :return: вид предупреждения, порог и окно в часах
+    :raises ValueError: при неизвестном виде, некорректном пороге или окне
+    """
+    parts = (args or "").split()
+    if len(parts) not in (2, 3):
+        raise ValueError("нужно указать вид предупреждения и порог")
+    metric = parts[0].lower()
+    if metric not in ALERT_METRICS:
+        raise ValueError(f"неизвестный вид предупреждения: {parts[0]}")
+    threshold = float(parts[1].replace(",", "."))
+    window_hours = int(parts[2]) if len(parts) == 3 else DEFAULT_WINDOW_HOURS
+    if not 1 <= window_hours <= MAX_WINDOW_HOURS:
+        raise ValueError(f"окно должно быть от 1 до {MAX_WINDOW_HOURS} часов")
+    return metric, threshold, window_hours
+
+
+async def add_alert(user_id: int, metric: str, threshold: float, window_hours: int) -> bool:
+    """
+    Добавляет подписку пользователю.
+    :param user_id: внутренний ID пользователя
+    :return: False, если такая подписка уже есть или превышен лимит подписок
+    """
+    async with async_session() as session:
+        count = await session.scalar(
+            select(func.count()).select_from(AlertSubscription).where(AlertSubscription.user_id == user_id)
+        )
+        if count >= config.ALERT_MAX_PER_USER:
+            return False
+        session.add(AlertSubscription(user_id=user_id, metric=metric, threshold=threshold,
+                                      window_hours=window_hours))
+        try:
+            await session.commit()
+        except IntegrityError:
+            return False
+    return True
+
+
+async def list_alerts(user_id: int) -> list[AlertSubscription]:
+    """Подписки пользователя в порядке добавления."""
+    async with async_session() as session:
+        stmt = select(AlertSubscription).where(AlertSubscription.user_id == user_id).order_by(AlertSubscription.id)
+        return list((await session.execute(stmt)).scalars().all())
+
+
+async def remove_alerts(user_id: int, alert_id: int | None = None) -> int:
+    """Удаляет подписку пользователя (или все его подписки) и возвращает количество удалённых."""
+    stmt = delete(AlertSubscription).where(AlertSubscription.user_id == user_id)
+    if alert_id is not None:
+        stmt = stmt.where(AlertSubscription.id == alert_id)
+    async with async_session() as session:
+        result = await session.execute(stmt)
+        await session.commit()
+    return result.rowcount
+
+
+def forecast_slots(forecast_data: dict[str, Any]) -> list[tuple[datetime, dict[str, Any]]]:
+    """Трёхчасовые слоты прогноза WeatherAPI.get_forecast в порядке времени."""
+    slots = [
+        (datetime.combine(day["date"], item["time"]), item)
+        for day in forecast_data["forecasts"]
+        for item in day["details"]
+    ]
+    slots.sort(key=lambda slot: slot[0])
+    return slots
+
+
+class AlertIndex:
+    """
+    Подписки, сгруппированные по городу и виду предупреждения
+    и отсортированные по порогу (в виде «больше - опаснее»).
+    """
+
+    def __init__(self, subscriptions: Iterable[Subscription]):
+        grouped: dict[str, dict[str, list[Subscription]]] = defaultdict(lambda: defaultdict(list))
+        for subscription in subscriptions:
+            grouped[subscription.city][subscription.metric].append(subscription)
+
+        # город -> вид -> (пороги по возрастанию, подписки в том же порядке)
+        self._index: dict[str, dict[str, tuple[list[float], list[Subscription]]]] = {}
+        self._windows: dict[str, int] = {}
+        for city, metrics in grouped.items():
+            self._index[city] = {}
+            for metric, items in metrics.items():
+                sign = ALERT_METRICS[metric].sign
+                items.sort(key=lambda item: sign * item.threshold)
+                self._index[city][metric] = ([sign * item.threshold for item in items], items)
+            self._windows[city] = max(item.window_hours for items in metrics.values() for item in items)
+
+    @property
+    def cities(self) -> list[str]:
+        """Города, для которых есть подписки."""
+        return list(self._index)
+
+    def forecast_days(self, city: str) -> int:
+        """На сколько дней запрашивать прогноз города, чтобы покрыть самое длинное окно."""
+        return min(self._windows[city] // 24 + 1, MAX_WINDOW_HOURS // 24)
+
+    def evaluate(self, city: str, forecast_data: dict[str, Any], now: datetime) -> list[AlertEvent]:
+        """
+        Проверяет подписки города по его прогнозу.
+        :param now: текущее время в том же часовом поясе, что и слоты прогноза
+        :return: сработавшие подписки (new=False, если о явлении уже предупреждали)
+        """
+        slots = [(at, item) for at, item in forecast_slots(forecast_data) if at + FORECAST_SLOT > now]
+        if not slots:
+            return []
+        times = [at for at, _ in slots]
+        repeat = timedelta(hours=config.ALERT_REPEAT_HOURS)
+
+        events = []
+        for metric, (thresholds, items) in self._index.get(city, {}).items():
+            sign, field = ALERT_METRICS[metric].sign, ALERT_METRICS[metric].field
+            # накопленный максимум «опасности» по времени - неубывающий, его можно искать bisect
+            running = list(accumulate((sign * item[field] for _, item in slots), max))
+            # пороги не выше максимума всего прогноза - кандидаты; остальные подписки не просматриваются
+            for position in range(bisect_right(thresholds, running[-1])):
+                subscription = items[position]
+                first = bisect_left(running, thresholds[position])
+                window_end = now + timedelta(hours=subscription.window_hours)
+                if times[first] > window_end:
+                    continue
+                last = bisect_right(times, window_end) - 1
+                previous = subscription.last_event_at
+                events.append(AlertEvent(
+                    subscription_id=subscription.id,
+                    telegram_id=subscription.telegram_id,
+                    city=city,
+                    metric=metric,
+                    threshold=subscription.threshold,
+                    starts_at=times[first],
+                    peak=sign * running[last],
+                    new=previous is None or times[first] > previous + repeat,
+                ))
+        return events
+
+
+def select_notifications(events: Iterable[AlertEvent]) -> dict[int, list[AlertEvent]]:
+    """
+    Новые предупреждения по получателям: одно на вид предупреждения -
+    по самой строгой из сработавших подписок пользователя.
+    """
+    strongest: dict[tuple[int, str], AlertEvent] = {}
+    for event in events:
+        if not event.new:
+            continue
+        key = (event.telegram_id, event.metric)
+        sign = ALERT_METRICS[event.metric].sign
+        current = strongest.get(key)
+        if current is None or sign * event.threshold > sign * current.threshold:
+            strongest[key] = event
+
+    notifications: dict[int, list[AlertEvent]] = defaultdict(list)
+    for (telegram_id, _), event in strongest.items():
+        notifications[telegram_id].append(event)
+    return dict(notifications)
+
+
+async def load_subscriptions() -> list[Subscription]:
+    """Подписки активных пользователей вместе с их городами."""
+    stmt = (
+        select(AlertSubscription.id, User.user_id, User.city, AlertSubscription.metric,
+               AlertSubscription.threshold, AlertSubscription.window_hours, AlertSubscription.last_event_at)
+        .join(User, User.id == AlertSubscription.user_id)
+        .where(User.is_active.is_(True))
+    )
+    async with async_session() as session:
+        rows = (await session.execute(stmt)).all()
+    return [Subscription(*row) for row in rows]
+
+
+async def collect_weather_alerts(weather_api, now: datetime | None = None) -> dict[int, list[AlertEvent]]:
+    """
+    Проверяет все подписки: прогноз каждого города запрашивается один раз,
+    не больше ALERT_FORECAST_CONCURRENCY одновременно.
+    Время первого превышения сохраняется в подписке, чтобы не предупреждать о том же явлении повторно.
+    :param weather_api: экземпляр WeatherAPI
+    :param now: текущее время (локальное, как слоты прогноза)
+    :return: Telegram ID -> новые предупреждения
+    """
+    now = now or datetime.now()
+    index = AlertIndex(await load_subscriptions())
+    semaphore = asyncio.Semaphore(ALERT_FORECAST_CONCURRENCY)
+
+    async def evaluate(city: str) -> list[AlertEvent]:
+        async with semaphore:
+            forecast_data = await weather_api.get_forecast(city, days=index.forecast_days(city))
+        if not forecast_data:
+            logger.warning("Не удалось получить прогноз для проверки предупреждений, город: %s", city)
+            return []
+        return index.evaluate(city, forecast_data, now)
+
+    events = [event for city_events in await asyncio.gather(*(evaluate(city) for city in index.cities))
+              for event in city_events]
+    if events:
+        async with async_session() as session:
+            await session.execute(
+                update(AlertSubscription),
+                [{"id": event.subscription_id, "last_event_at": event.starts_at} for event in events]
+            )
+            await session.commit()
+
+    notifications = select_notifications(events)
+    logger.info("Проверка предупреждений: городов %s, сработало подписок %s, получателей %s",
+                len(index.cities), len(events), len(notifications))
+    return notifications
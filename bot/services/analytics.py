@@ -1,69 +1,209 @@
+import asyncio
 import logging
-from datetime import datetime, timedelta
-from typing import Any, Optional
-from sqlalchemy import and_
+from datetime import date, datetime, time
+from typing import TYPE_CHECKING, Any, Optional
+from sqlalchemy import Integer, and_, case, cast, func, or_, union_all
 from sqlalchemy.future import select
-from bot.database.models import WeatherData, User
-from bot.database.database import async_session
+from bot.config.config import config
+from bot.database.models import WeatherData, WeatherDailyAggregate, User
+from bot.database.database import async_session, engine
+from bot.services.trends import (SIGNIFICANCE_T, TREND_METRICS, TrendAccumulator, TrendEstimate, day_moment,
+                                 load_trends, record_trend_observation, regression_from_sums, utc_now,
+                                 window_start)
+from bot.utils.cache import LRUCache
+from bot.utils.executor import analytics_runner
+from bot.utils.logger import SAMPLED
+
+if TYPE_CHECKING:
+    import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# фрагменты описаний OWM, по которым наблюдение считается дождливым
+# (живые запросы идут с lang=ru, архивы истории OWM - на английском)
+RAIN_KEYWORDS = ("дожд", "ливень", "ливн", "гроз", "морось", "rain", "drizzle", "thunderstorm", "shower")
+
+
+def rain_condition(description_column):
+    """SQL-условие: описание погоды содержит признак осадков."""
+    return or_(*(description_column.like(f"%{keyword}%") for keyword in RAIN_KEYWORDS))
+
+
+# сезоны по номеру (месяц % 12) // 3: декабрь-февраль, март-май, июнь-август, сентябрь-ноябрь
+SEASON_NAMES = ("зима", "весна", "лето", "осень")
+# процентили температуры в долгосрочных отчётах
+REPORT_PERCENTILES = (10, 50, 90)
+
+
+def _year_and_month(day_column) -> tuple:
+    """Год и номер месяца дня как целочисленные SQL-выражения для текущего диалекта."""
+    if engine.dialect.name == "sqlite":
+        return (cast(func.strftime("%Y", day_column), Integer),
+                cast(func.strftime("%m", day_column), Integer))
+    return (cast(func.extract("year", day_column), Integer),
+            cast(func.extract("month", day_column), Integer))
+
+
+def daily_history(since: date | None = None, until: date | None = None, cities: list[str] | None = None):
+    """
+    Подзапрос с дневными показателями городов: сырые наблюдения, сгруппированные по дням,
+    и дневные агрегаты, в которые свёрнута старая история (одна строка на город и день).
+    :param since: первый день (включительно), None - вся история
+    :param until: день, с которого данные не берутся (исключительно), None - без ограничения
+    :param cities: города, None - все города
+    :return: подзапрос с колонками city, day, temp, temp_min, temp_max, rainy
+    """
+    raw_filters, aggregate_filters = [], []
+    if since is not None:
+        raw_filters.append(WeatherData.date >= datetime.combine(since, time.min))
+        aggregate_filters.append(WeatherDailyAggregate.date >= since)
+    if until is not None:
+        raw_filters.append(WeatherData.date < datetime.combine(until, time.min))
+        aggregate_filters.append(WeatherDailyAggregate.date < until)
+    if cities is not None:
+        aggregate_filters.append(WeatherDailyAggregate.city.in_(cities))
+
+    raw_day = func.date(WeatherData.date)
+    raw_columns = (
+        raw_day.label("day"),
+        func.count(WeatherData.temperature).label("samples"),
+        func.sum(WeatherData.temperature).label("temp_sum"),
+        func.min(WeatherData.temperature).label("temp_min"),
+        func.max(WeatherData.temperature).label("temp_max"),
+        func.sum(case((rain_condition(WeatherData.description), 1), else_=0)).label("rainy"),
+    )
+    # записи с городом (импорт и новые наблюдения) и старые записи, где город известен только у пользователя
+    with_city = (
+        select(WeatherData.city.label("city"), *raw_columns)
+        .where(WeatherData.city.in_(cities) if cities is not None else WeatherData.city.is_not(None),
+               *raw_filters)
+        .group_by(WeatherData.city, raw_day)
+    )
+    legacy = (
+        select(User.city.label("city"), *raw_columns)
+        .join(User, User.id == WeatherData.user_id)
+        .where(WeatherData.city.is_(None), *raw_filters,
+               *([User.city.in_(cities)] if cities is not None else []))
+        .group_by(User.city, raw_day)
+    )
+    aggregated = select(
+        WeatherDailyAggregate.city.label("city"),
+        WeatherDailyAggregate.date.label("day"),
+        case((WeatherDailyAggregate.temperature_avg.is_not(None), WeatherDailyAggregate.samples),
+             else_=0).label("samples"),
+        (WeatherDailyAggregate.temperature_avg * WeatherDailyAggregate.samples).label("temp_sum"),
+        WeatherDailyAggregate.temperature_min.label("temp_min"),
+        WeatherDailyAggregate.temperature_max.label("temp_max"),
+        WeatherDailyAggregate.rainy_samples.label("rainy"),
+    ).where(*aggregate_filters)
+
+    history = union_all(with_city, legacy, aggregated).subquery("history")
+    return (
+        select(
+            history.c.city,
+            history.c.day,
+            (func.sum(history.c.temp_sum) / func.nullif(func.sum(history.c.samples), 0)).label("temp"),
+            func.min(history.c.temp_min).label("temp_min"),
+            func.max(history.c.temp_max).label("temp_max"),
+            func.max(case((history.c.rainy > 0, 1), else_=0)).label("rainy"),
+        )
+        .group_by(history.c.city, history.c.day)
+        .subquery("days")
+    )
+
+
+# сколько прогнозов городов запрашивать у апи одновременно при воскресной рассылке
+FORECAST_CONCURRENCY = 5
+
+# готовые недельные отчёты: внутренний ID пользователя -> (отпечаток строк недели, отчёт или None)
+weekly_analysis_cache = LRUCache(maxsize=config.ANALYSIS_CACHE_SIZE)
+
 
 class WeatherAnalytics:
     @staticmethod
-    async def get_weekly_analysis(user_id):
+    async def _load_user(user_id: int) -> Optional[User]:
+        """Загружает пользователя по внутреннему ID."""
+        async with async_session() as session:
+            result = await session.execute(select(User).where(User.id == user_id))
+            return result.scalar_one_or_none()
+
+    @staticmethod
+    async def get_weekly_analysis(user: User | int):
         """Получение еженедельного анализа погоды для пользователя из база данных.
-        Используется для ручного запроса пользователя по команде
+        Используется для ручного запроса пользователя по команде.
+        Отчёт кэшируется вместе с отпечатком строк недели (город, количество и наибольший ID):
+        запись наблюдений любым процессом, импорт истории города и выход старых строк из окна
+        меняют отпечаток, и отчёт строится заново.
+        :param user: пользователь (например, из middleware) или его внутренний ID
         """
+        user_id = user if isinstance(user, int) else user.id
         try:
-            async with async_session() as session:
-                # данные о пользователе
-                user_stmt = select(User).where(User.id == user_id)
-                user_result = await session.execute(user_stmt)
-                user = user_result.scalar_one_or_none()
-
+            if isinstance(user, int):
+                user = await WeatherAnalytics._load_user(user_id)
                 if not user:
-                    logger.error(f"Пользователь {user_id} не найден.")
+                    logger.error("Пользователь %s не найден.", user_id)
                     return None
 
-                # определение временного диапазона за последние 7 дней
-                end_date = datetime.now()
-                start_date = end_date - timedelta(days=7)
-
-                # получение погодных данных за неделю
-                stmt = select(WeatherData).where(
-                    and_(
+            async with async_session() as session:
+                # определение временного диапазона: 7 суток UTC, включая текущие (даты наблюдений хранятся в UTC),
+                # по тем же суткам хранятся суммы тенденций
+                end_date = utc_now()
+                start_date = window_start(end_date)
+
+                # собственные наблюдения пользователя и импортированная история его города
+                week_filter = and_(
+                    or_(
                         WeatherData.user_id == user.id,
-                        WeatherData.date >= start_date,
-                        WeatherData.date <= end_date
-                    )
-                ).order_by(WeatherData.date)
+                        and_(WeatherData.user_id.is_(None), WeatherData.city == user.city)
+                    ),
+                    WeatherData.date >= start_date,
+                    WeatherData.date <= end_date
+                )
 
+                # строки недели добавляются, но не меняются: одинаковые количество и наибольший ID -
+                # те же данные, что и у готового отчёта
+                count, last_id = (await session.execute(
+                    select(func.count(WeatherData.id), func.max(WeatherData.id)).where(week_filter)
+                )).one()
+                fingerprint = (user.city, count, last_id)
+                cached = weekly_analysis_cache.get(user_id)
+                if cached is not None and cached[0] == fingerprint:
+                    return cached[1]
+
+                # получение погодных данных за неделю
+                stmt = select(WeatherData).where(week_filter).order_by(WeatherData.date)
                 result = await session.execute(stmt)
                 weather_data = result.scalars().all()
 
                 if not weather_data:
-                    logger.warning(f"Данные погоды за неделю для пользователя {user_id} не найдены.")
+                    logger.warning("Данные погоды за неделю для пользователя %s не найдены.", user_id)
+                    weekly_analysis_cache.set(user_id, (fingerprint, None))
                     return None
 
-                return WeatherAnalytics._analyze_weekly_data(weather_data, user.city)
+                # тенденции читаются из сумм суток, которые пополняются при записи наблюдений
+                trends = await load_trends(session, user.id, user.city, start_date.date())
+                report = WeatherAnalytics._analyze_weekly_data(weather_data, user.city, trends)
+                weekly_analysis_cache.set(user_id, (fingerprint, report))
+                return report
         except Exception as e:
-            logger.error(f"Ошибка при получении анализа погоды: {e}")
+            logger.error("Ошибка при получении анализа погоды: %s", e)
             return None
 
     @staticmethod
-    def _analyze_weekly_data(weather_data: list, city: str) -> Optional[dict[str, Any]]:
+    def _analyze_weekly_data(weather_data: list, city: str,
+                             trends: dict[str, TrendEstimate] | None = None) -> Optional[dict[str, Any]]:
         """Анализ погодных данных за неделю и формирование отчета:
         Группирует данные по дням.
         Вычисляет средние, минимальные и максимальные значения для каждого дня.
-        Определяет тенденции изменения температуры, влажности и ветра.
+        Определяет тенденции изменения температуры, влажности и ветра регрессией по всем наблюдениям
+        (готовые оценки из сумм тенденций передаются в trends, иначе считаются по weather_data).
         Формирует прогноз на следующую неделю на основе тенденций.
         Возвращает структурированный отчет.
         """
         try:
             if not weather_data or len(weather_data) < 2:
                 logger.warning(
-                    f"Недостаточно данных для анализа: {len(weather_data) if weather_data else 0} записей")
+                    "Недостаточно данных для анализа: %s записей", len(weather_data) if weather_data else 0)
                 return None
 
             daily_data = {}  # Словарь для хранения данных о погоде по дням
@@ -96,44 +236,12 @@ class WeatherAnalytics:
             # Сортировка данных по дате
             daily_analysis.sort(key=lambda x: x["date"])
 
-            # Определение тенденций
+            # Определение тенденций: наклон регрессии по всем наблюдениям недели
             if len(daily_analysis) >= 2:
-                days_for_trend = min(2, len(daily_analysis) // 2)
-
-                first_days = daily_analysis[:days_for_trend]
-                last_days = daily_analysis[-days_for_trend:]
-
-                first_avg_temp = sum(d["avg_temp"] for d in first_days) / len(first_days)
-                last_avg_temp = sum(d["avg_temp"] for d in last_days) / len(last_days)
-
-                first_avg_humidity = sum(d["avg_humidity"] for d in first_days) / len(
-                    first_days)
-                last_avg_humidity = sum(d["avg_humidity"] for d in last_days) / len(
-                    last_days)
-
-                first_avg_wind = sum(d["avg_wind"] for d in first_days) / len(first_days)
-                last_avg_wind = sum(d["avg_wind"] for d in last_days) / len(last_days)
-
-                temp_trend = last_avg_temp - first_avg_temp
-                humidity_trend = last_avg_humidity - first_avg_humidity
-                wind_trend = last_avg_wind - first_avg_wind
-
+                estimates = trends if trends is not None else WeatherAnalytics._estimate_trends(weather_data)
                 trends = {
-                    "temperature": {
-                        "value": round(temp_trend, 1),
-                        "description": WeatherAnalytics._get_trend_description(temp_trend,
-                                                                               "temperature")
-                    },
-                    "humidity": {
-                        "value": round(humidity_trend, 1),
-                        "description": WeatherAnalytics._get_trend_description(
-                            humidity_trend, "humidity")
-                    },
-                    "wind": {
-                        "value": round(wind_trend, 1),
-                        "description": WeatherAnalytics._get_trend_description(wind_trend,
-                                                                               "wind")
-                    }
+                    metric: WeatherAnalytics._trend_summary(estimate, metric)
+                    for metric, estimate in estimates.items()
                 }
             else:
                 trends = None
@@ -149,49 +257,322 @@ class WeatherAnalytics:
             }
 
         except Exception as e:
-            logger.error(f"Ошибка при анализе данных погоды: {e}", exc_info=True)
+            logger.error("Ошибка при анализе данных погоды: %s", e, exc_info=True)
             return None
 
     @staticmethod
-    async def get_weekly_analysis_with_forecast(user_id: int, weather_api) -> Optional[dict[str, Any]]:
+    def _estimate_trends(weather_data: list) -> dict[str, TrendEstimate]:
+        """Оценки тенденций по списку наблюдений."""
+        accumulators = {metric: TrendAccumulator() for metric in TREND_METRICS}
+        for data in weather_data:
+            accumulators["temperature"].add(data.date, data.temperature)
+            accumulators["humidity"].add(data.date, data.humidity)
+            accumulators["wind"].add(data.date, data.wind_speed)
+        return {metric: accumulator.estimate() for metric, accumulator in accumulators.items()}
+
+    @staticmethod
+    def _trend_summary(estimate: TrendEstimate, metric: str) -> dict[str, Any]:
+        """Тенденция в формате отчёта: изменение за период, наклон за сутки и R²."""
+        return {
+            "value": round(estimate.change, 1),
+            "slope": round(estimate.slope, 2),
+            "r_squared": round(estimate.r_squared, 2),
+            "description": WeatherAnalytics._get_trend_description(estimate.change, metric,
+                                                                   estimate.significant)
+        }
+
+    @staticmethod
+    def _rows_to_arrays(rows: list[tuple]) -> "tuple[np.ndarray, ...]":
+        """Строки (владелец, дата, температура, влажность, ветер) в колонки для _analyze_weekly_arrays."""
+        import numpy as np
+
+        owners = np.empty(len(rows), dtype=np.int64)
+        times = np.empty(len(rows), dtype=np.float64)
+        temperature = np.empty(len(rows), dtype=np.float64)
+        humidity = np.empty(len(rows), dtype=np.float64)
+        wind = np.empty(len(rows), dtype=np.float64)
+        for i, (owner, observed_at, temp, hum, wind_speed) in enumerate(rows):
+            owners[i] = owner
+            times[i] = day_moment(observed_at)
+            temperature[i] = temp
+            humidity[i] = hum
+            wind[i] = wind_speed
+        return owners, times, temperature, humidity, wind
+
+    @staticmethod
+    async def _analyze_weekly_pooled(owners: "np.ndarray", times: "np.ndarray", temperature: "np.ndarray",
+                                     humidity: "np.ndarray", wind: "np.ndarray",
+                                     cities: dict[int, str]) -> dict[int, Optional[dict[str, Any]]]:
+        """Запускает _analyze_weekly_arrays в пуле аналитики частями по ANALYTICS_CHUNK_USERS пользователей.
+        Цикл событий в это время обслуживает пользователей, а небольшие части результата
+        не задерживают его надолго при передаче из другого процесса.
+        """
+        # сортировка миллионов наблюдений тоже заметна, поэтому и разбиение идёт в потоке
+        chunks = await asyncio.to_thread(WeatherAnalytics._split_by_owner, owners, times, temperature,
+                                         humidity, wind, chunk_users=config.ANALYTICS_CHUNK_USERS)
+        tasks = [
+            analytics_runner.run(WeatherAnalytics._analyze_weekly_arrays, *chunk,
+                                 {owner: cities[owner] for owner in chunk_owners})
+            for chunk_owners, chunk in chunks
+        ]
+        reports = {}
+        for part in await asyncio.gather(*tasks):
+            reports.update(part)
+        return reports
+
+    @staticmethod
+    def _split_by_owner(owners: "np.ndarray", *columns: "np.ndarray",
+                        chunk_users: int) -> "list[tuple[list[int], tuple[np.ndarray, ...]]]":
+        """Делит колонки наблюдений на части не больше chunk_users владельцев.
+        :return: список (владельцы части, (owners, *columns) части)
+        """
+        import numpy as np
+
+        order = np.argsort(owners, kind="stable")
+        owners = owners[order]
+        columns = [column[order] for column in columns]
+        unique_owners = np.unique(owners)
+        bounds = np.append(np.searchsorted(owners, unique_owners[::chunk_users]), owners.size)
+        return [
+            (unique_owners[i * chunk_users:(i + 1) * chunk_users].tolist(),
+             (owners[start:end], *(column[start:end] for column in columns)))
+            for i, (start, end) in enumerate(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+        ]
+
+    @staticmethod
+    def _analyze_weekly_arrays(owners: "np.ndarray", times: "np.ndarray", temperature: "np.ndarray",
+                               humidity: "np.ndarray", wind: "np.ndarray",
+                               cities: dict[int, str]) -> dict[int, Optional[dict[str, Any]]]:
+        """Векторизованный аналог _analyze_weekly_data для наблюдений многих пользователей.
+        :param owners: ID пользователя для каждого наблюдения
+        :param times: момент наблюдения в сутках (trends.day_moment) для каждого наблюдения
+        :param temperature: температура наблюдений
+        :param humidity: влажность наблюдений
+        :param wind: скорость ветра наблюдений
+        :param cities: город каждого пользователя
+        :return: словарь {ID пользователя: отчёт или None, если наблюдений меньше двух}
+        """
+        import numpy as np
+
+        if owners.size == 0:
+            return {}
+
+        # сортировка по пользователю и времени, границы групп (пользователь, день)
+        order = np.lexsort((times, owners))
+        owners, times = owners[order], times[order]
+        days = np.floor(times).astype(np.int64)
+        temperature, humidity, wind = temperature[order], humidity[order], wind[order]
+
+        day_change = np.empty(owners.size, dtype=bool)
+        day_change[0] = True
+        day_change[1:] = (owners[1:] != owners[:-1]) | (days[1:] != days[:-1])
+        day_starts = np.flatnonzero(day_change)
+        day_counts = np.diff(np.append(day_starts, owners.size))
+
+        # дневные показатели, округлённые так же, как в _analyze_weekly_data
+        daily_temp = np.round(np.add.reduceat(temperature, day_starts) / day_counts, 1)
+        daily_min = np.round(np.minimum.reduceat(temperature, day_starts), 1)
+        daily_max = np.round(np.maximum.reduceat(temperature, day_starts), 1)
+        daily_humidity = np.round(np.add.reduceat(humidity, day_starts) / day_counts, 1)
+        daily_wind = np.round(np.add.reduceat(wind, day_starts) / day_counts, 1)
+        daily_owner = owners[day_starts]
+        daily_day = days[day_starts]
+
+        # границы пользователей среди дневных групп
+        user_change = np.empty(daily_owner.size, dtype=bool)
+        user_change[0] = True
+        user_change[1:] = daily_owner[1:] != daily_owner[:-1]
+        user_starts = np.flatnonzero(user_change)
+        user_ends = np.append(user_starts[1:], daily_owner.size)
+        user_days = user_ends - user_starts
+        user_observations = np.add.reduceat(day_counts, user_starts)
+
+        # тенденции: суммы регрессии каждого пользователя по всем его наблюдениям,
+        # x отсчитывается от начала первого дня пользователя, как в TrendAccumulator
+        observation_starts = day_starts[user_starts]
+        x = times - np.repeat(np.floor(times[observation_starts]), user_observations)
+        n = user_observations.astype(np.float64)
+        sx = np.add.reduceat(x, observation_starts)
+        sxx = np.add.reduceat(x * x, observation_starts)
+        span = np.maximum.reduceat(x, observation_starts) - np.minimum.reduceat(x, observation_starts)
+
+        def regression_trend(values: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+            sy = np.add.reduceat(values, observation_starts)
+            sxy = np.add.reduceat(x * values, observation_starts)
+            syy = np.add.reduceat(values * values, observation_starts)
+            slope, r_squared, t_value = regression_from_sums(n, sx, sy, sxy, sxx, syy)
+            significant = (n >= 3) & (np.abs(t_value) >= SIGNIFICANCE_T)
+            return slope, slope * span, r_squared, significant
+
+        # дальше собираются словари отчёта: все дневные записи создаются одним проходом,
+        # а пользователям достаются срезы этого списка
+        dates = {ordinal: date.fromordinal(ordinal) for ordinal in np.unique(daily_day).tolist()}
+        all_days = [
+            {
+                "date": dates[ordinal],
+                "avg_temp": avg_temp,
+                "min_temp": min_temp,
+                "max_temp": max_temp,
+                "avg_humidity": avg_humidity,
+                "avg_wind": avg_wind
+            }
+            for ordinal, avg_temp, min_temp, max_temp, avg_humidity, avg_wind in zip(
+                daily_day.tolist(), daily_temp.tolist(), daily_min.tolist(), daily_max.tolist(),
+                daily_humidity.tolist(), daily_wind.tolist()
+            )
+        ]
+        # значения округляются round() Python, как в построчном _trend_summary
+        trend_values = {}
+        for metric, values in (("temperature", temperature), ("humidity", humidity), ("wind", wind)):
+            slope, change, r_squared, significant = regression_trend(values)
+            trend_values[metric] = (change.tolist(), slope.tolist(), r_squared.tolist(), significant.tolist())
+        user_starts, user_ends = user_starts.tolist(), user_ends.tolist()
+        user_days, user_observations = user_days.tolist(), user_observations.tolist()
+
+        reports = {}
+        for i, user_id in enumerate(daily_owner[user_starts].tolist()):
+            if user_observations[i] < 2:
+                reports[user_id] = None
+                continue
+
+            daily_analysis = all_days[user_starts[i]:user_ends[i]]
+
+            trends = None
+            if user_days[i] >= 2:
+                trends = {
+                    metric: {
+                        "value": round(change[i], 1),
+                        "slope": round(slope[i], 2),
+                        "r_squared": round(r_squared[i], 2),
+                        "description": WeatherAnalytics._get_trend_description(change[i], metric,
+                                                                               significant[i])
+                    }
+                    for metric, (change, slope, r_squared, significant) in trend_values.items()
+                }
+
+            reports[user_id] = {
+                "city": cities.get(user_id),
+                "period": {
+                    "start": daily_analysis[0]["date"],
+                    "end": daily_analysis[-1]["date"]
+                },
+                "daily_analysis": daily_analysis,
+                "trends": trends
+            }
+
+        return reports
+
+    @staticmethod
+    async def get_weekly_analysis_with_forecast(user: User | int, weather_api) -> Optional[dict[str, Any]]:
         """
         Метод воскресной рассылки, который получает анализ погоды за последнюю неделю и прогноз на следующие 5 дней из апи.
-        :param user_id: IF пользователя, внутренний ID из таблицы User
+        История из БД и прогноз из апи загружаются одновременно.
+        :param user: пользователь, уже загруженный вызывающим кодом, или его внутренний ID из таблицы User
         :param weather_api: Экземпляр WeatherAPI для получения прогноза
         :return: словарь с анализом прошлой недели и прогнозом на следующую неделю
         """
         try:
-            async with async_session() as session:
-                user_stmt = select(User).where(User.id == user_id)
-                user_result = await session.execute(user_stmt)
-                user = user_result.scalar_one_or_none()
-
+            if isinstance(user, int):
+                user_id = user
+                user = await WeatherAnalytics._load_user(user_id)
                 if not user:
-                    logger.error(f"Пользователь c ID {user_id} не найден.")
+                    logger.error("Пользователь c ID %s не найден.", user_id)
                     return None
 
-                past_week_analysis = await WeatherAnalytics.get_weekly_analysis(user_id)  # анализ прошлой недели из бд
-                forecast_data = await weather_api.get_forecast(user.city, days=5)
+            # анализ прошлой недели из бд, пока ждём ответа апи
+            past_week_analysis, forecast_data = await asyncio.gather(
+                WeatherAnalytics.get_weekly_analysis(user),
+                weather_api.get_forecast(user.city, days=5, lat=user.latitude, lon=user.longitude)
+            )
 
-                if not forecast_data:
-                    logger.error(f"Ошибка при получении прогноза погоды для {user.city}")
-                    # Если нет прогноза, вернем хотя бы анализ прошлой недели
-                    return {
-                        "city": user.city,
-                        "past_week": past_week_analysis,
-                        "next_week_forecast": None
-                    }
-                # обработка прогноза
-                forecast_analysis = WeatherAnalytics._analyze_forecast(forecast_data)
-                return {
-                    "city": user.city,
-                    "past_week": past_week_analysis,
-                    "next_week_forecast": forecast_analysis
-                }
+            return WeatherAnalytics._combine_with_forecast(user.city, past_week_analysis, forecast_data)
         except Exception as e:
-            logger.error(f"Ошибка при получении анализа погоды с прогнозом: {e}")
+            logger.error("Ошибка при получении анализа погоды с прогнозом: %s", e)
             return None
 
+    @staticmethod
+    def _combine_with_forecast(city: str, past_week_analysis: Optional[dict[str, Any]],
+                               forecast_data: Optional[dict[str, Any]]) -> dict[str, Any]:
+        """Отчёт воскресной рассылки из анализа прошлой недели и ответа апи с прогнозом."""
+        if not forecast_data:
+            logger.error("Ошибка при получении прогноза погоды для %s", city)
+            # Если нет прогноза, вернем хотя бы анализ прошлой недели
+            return {
+                "city": city,
+                "past_week": past_week_analysis,
+                "next_week_forecast": None
+            }
+        # обработка прогноза
+        forecast_analysis = WeatherAnalytics._analyze_forecast(forecast_data)
+        return {
+            "city": city,
+            "past_week": past_week_analysis,
+            "next_week_forecast": forecast_analysis
+        }
+
+    @staticmethod
+    async def get_city_weekly_analysis_batch(cities: list[str]) -> dict[str, Optional[dict[str, Any]]]:
+        """Анализ прошлой недели по городам: один отчёт на город.
+        В отчёт города входят наблюдения всех его пользователей и импортированная история,
+        всё загружается одним запросом и анализируется одним векторизованным проходом.
+        :param cities: названия городов
+        :return: словарь {город: отчёт в формате _analyze_weekly_data или None}
+        """
+        cities = list(dict.fromkeys(cities))
+        if not cities:
+            return {}
+        # даты наблюдений хранятся в UTC, окно то же, что у отчёта пользователя
+        end_date = utc_now()
+        start_date = window_start(end_date)
+
+        # у импортированной истории нет пользователя, город хранится в самой записи
+        row_city = func.coalesce(WeatherData.city, User.city)
+        stmt = (
+            select(row_city, WeatherData.date, WeatherData.temperature,
+                   WeatherData.humidity, WeatherData.wind_speed)
+            .outerjoin(User, User.id == WeatherData.user_id)
+            .where(row_city.in_(cities), WeatherData.date >= start_date, WeatherData.date <= end_date)
+        )
+
+        try:
+            async with async_session() as session:
+                rows = (await session.execute(stmt)).all()
+        except Exception as e:
+            logger.error("Ошибка при загрузке данных для анализа по городам: %s", e)
+            return {city: None for city in cities}
+
+        # номера городов играют роль владельцев наблюдений
+        index = {city: i for i, city in enumerate(cities)}
+        arrays = WeatherAnalytics._rows_to_arrays([(index[city], *observation) for city, *observation in rows])
+        reports = await WeatherAnalytics._analyze_weekly_pooled(*arrays, dict(enumerate(cities)))
+        return {city: reports.get(i) for i, city in enumerate(cities)}
+
+    @staticmethod
+    async def get_city_weekly_reports(cities: list[str], weather_api) -> dict[str, dict[str, Any]]:
+        """
+        Отчёты воскресной рассылки для запуска: анализ прошлой недели и прогноз считаются
+        один раз на каждый город и общие для всех его пользователей.
+        Прогнозы городов запрашиваются параллельно, не больше FORECAST_CONCURRENCY одновременно.
+        :param cities: города получателей (повторы допускаются)
+        :param weather_api: Экземпляр WeatherAPI для получения прогноза
+        :return: словарь {город: отчёт в формате get_weekly_analysis_with_forecast}
+        """
+        cities = list(dict.fromkeys(cities))
+        past_weeks = await WeatherAnalytics.get_city_weekly_analysis_batch(cities)
+        semaphore = asyncio.Semaphore(FORECAST_CONCURRENCY)
+
+        async def build(city: str) -> dict[str, Any]:
+            async with semaphore:
+                try:
+                    forecast_data = await weather_api.get_forecast(city, days=5)
+                except Exception as e:
+                    logger.error("Ошибка при получении прогноза погоды для %s: %s", city, e)
+                    forecast_data = None
+            return WeatherAnalytics._combine_with_forecast(city, past_weeks.get(city), forecast_data)
+
+        reports = await asyncio.gather(*(build(city) for city in cities))
+        return dict(zip(cities, reports))
+
     @staticmethod
     def _analyze_forecast(forecast_data: dict[str, Any]) -> Optional[dict[str, Any]]:
         """
@@ -245,14 +626,120 @@ class WeatherAnalytics:
             }
 
         except Exception as e:
-            logger.error(f"Ошибка при анализе прогноза: {e}", exc_info=True)
+            logger.error("Ошибка при анализе прогноза: %s", e, exc_info=True)
             return None
 
     @staticmethod
-    def _get_trend_description(value: float, metric_type: str) -> str:
-        """Возвращает текстовое описание тенденции"""
+    async def get_monthly_report(city: str, months: int = 12) -> Optional[list[dict[str, Any]]]:
+        """
+        Помесячный отчёт по городу за длительный период.
+        :param city: название города
+        :param months: сколько последних месяцев включить (включая текущий)
+        :return: список месяцев со средней, экстремальной температурой, процентилями и дождливыми днями
+        """
+        return await WeatherAnalytics._get_long_horizon_report(city, months, by_season=False)
+
+    @staticmethod
+    async def get_seasonal_report(city: str, months: int = 12) -> Optional[list[dict[str, Any]]]:
+        """
+        Отчёт по сезонам (зима считается годом, на который приходятся январь и февраль).
+        :param city: название города
+        :param months: сколько последних месяцев включить (включая текущий)
+        :return: список сезонов с теми же показателями, что и помесячный отчёт
+        """
+        return await WeatherAnalytics._get_long_horizon_report(city, months, by_season=True)
+
+    @staticmethod
+    async def _get_long_horizon_report(city: str, months: int,
+                                       by_season: bool) -> Optional[list[dict[str, Any]]]:
+        """
+        Долгосрочный отчёт, полностью посчитанный в БД.
+        Сначала наблюдения сворачиваются в дневные средние, затем дни ранжируются внутри периода
+        оконными функциями: процентиль P - наименьшая дневная температура с рангом не ниже P% дней.
+        В Python приходит одна строка на период.
+        """
+        today = date.today()
+        first_month = today.year * 12 + today.month - months
+        since = date(first_month // 12, first_month % 12 + 1, 1)
+
+        days = daily_history(since, cities=[city])
+        year, month = _year_and_month(days.c.day)
+        if by_season:
+            # декабрь относится к зиме следующего года
+            period_year = year + case((month == 12, 1), else_=0)
+            period = (month % 12) // 3
+        else:
+            period_year, period = year, month
+
+        partition = (period_year, period)
+        ranked = (
+            select(
+                period_year.label("period_year"),
+                period.label("period"),
+                days.c.temp,
+                days.c.temp_min,
+                days.c.temp_max,
+                days.c.rainy,
+                func.row_number().over(partition_by=partition, order_by=days.c.temp).label("rank"),
+                func.count().over(partition_by=partition).label("total"),
+            )
+            .where(days.c.temp.is_not(None))
+            .subquery("ranked")
+        )
+        percentiles = [
+            func.min(case((ranked.c.rank * 100 >= ranked.c.total * percentile, ranked.c.temp)))
+            for percentile in REPORT_PERCENTILES
+        ]
+        stmt = (
+            select(
+                ranked.c.period_year,
+                ranked.c.period,
+                func.count(),
+                func.avg(ranked.c.temp),
+                func.min(ranked.c.temp_min),
+                func.max(ranked.c.temp_max),
+                func.sum(ranked.c.rainy),
+                *percentiles,
+            )
+            .group_by(ranked.c.period_year, ranked.c.period)
+            .order_by(ranked.c.period_year, ranked.c.period)
+        )
+
+        try:
+            async with async_session() as session:
+                rows = (await session.execute(stmt)).all()
+        except Exception as e:
+            logger.error("Ошибка при построении долгосрочного отчёта для %s: %s", city, e)
+            return None
+
+        report = []
+        for period_year, period_value, day_count, avg_temp, min_temp, max_temp, rainy_days, *values in rows:
+            entry = {"year": int(period_year)}
+            if by_season:
+                entry["season"] = SEASON_NAMES[int(period_value)]
+            else:
+                entry["month"] = int(period_value)
+            entry.update({
+                "days": day_count,
+                "avg_temp": round(avg_temp, 1),
+                "min_temp": round(min_temp, 1) if min_temp is not None else None,
+                "max_temp": round(max_temp, 1) if max_temp is not None else None,
+                "rainy_days": int(rainy_days or 0),
+            })
+            for percentile, value in zip(REPORT_PERCENTILES, values):
+                entry[f"p{percentile}"] = round(value, 1)
+            report.append(entry)
+        return report
+
+    @staticmethod
+    def _get_trend_description(value: float, metric_type: str, significant: bool = True) -> str:
+        """Возвращает текстовое описание тенденции.
+        :param value: изменение величины за период по линии регрессии
+        :param metric_type: temperature, humidity или wind
+        :param significant: наклон статистически значим (иначе изменение считается шумом)
+        """
         # порог незначительного изменения (меньше 1 градуса, %, м/с)
-        if abs(value) < 1.0:
+        if not significant or abs(value) < 1.0:
             return "стабильность"
         if metric_type == "temperature":
             return "повышение" if value > 0 else "понижение"
@@ -264,18 +751,23 @@ class WeatherAnalytics:
 
 
     @staticmethod
-    async def save_weather_data_for_week_analysis(user_id: int, weather_data: dict[str, Any]):
+    async def save_weather_data_for_week_analysis(user_id: int, weather_data: dict[str, Any],
+                                                  city: str | None = None):
         """
         Сохраняет данные о погоде для еженедельного анализа.
         :param user_id: ID пользователя
         :param weather_data: данные о погоде - температуре, влажности, ветре и т.д.
+        :param city: город пользователя, для которого получены данные
         :return:
         """
         try:
+            observed_at = utc_now()
             async with async_session() as session:
                 # Создаем новую запись WeatherData
                 new_weather_data = WeatherData(
                     user_id=user_id,
+                    city=city,
+                    date=observed_at,
                     temperature=weather_data["temperature"],
                     feels_like=weather_data["feels_like"],
                     pressure=weather_data["pressure"],
@@ -284,7 +776,11 @@ class WeatherAnalytics:
                     description=weather_data["description"]
                 )
                 session.add(new_weather_data)
+                # суммы тенденций пополняются в той же транзакции, что и запись наблюдения
+                await record_trend_observation(session, user_id, observed_at, weather_data["temperature"],
+                                               weather_data["humidity"], weather_data["wind_speed"])
                 await session.commit()
-                logger.info(f"Сохранена погодная информация для пользователя {user_id}")
+            # сохраняется на каждого получателя утренней рассылки - запись прореживается
+            logger.info("Сохранена погодная информация для пользователя %s", user_id, extra=SAMPLED)
         except Exception as e:
-            logger.error(f"Ошибка при сохранении погодных данных для пользователя {user_id}: {e}")
+            logger.error("Ошибка при сохранении погодных данных для пользователя %s: %s", user_id, e)
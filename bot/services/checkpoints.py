@@ -0,0 +1,41 @@
+import json
+import logging
+from datetime import date
+from bot.database.database import async_session
+from bot.database.models import BroadcastCheckpoint
+
+logger = logging.getLogger(__name__)
+
+
+async def save_checkpoint(job: str, delivered: set[str], run_date: date | None = None) -> None:
+    """
+    Сохраняет ключи получателей, которым рассылка уже отправлена (при остановке посреди рассылки).
+    :param job: название рассылки
+    :param delivered: ключи обработанных получателей
+    :param run_date: день запуска рассылки (по умолчанию сегодня)
+    """
+    async with async_session() as session:
+        await session.merge(BroadcastCheckpoint(job=job, run_date=run_date or date.today(),
+                                                delivered=json.dumps(sorted(delivered))))
+        await session.commit()
+    logger.info("Рассылка %s прервана остановкой, сохранена контрольная точка: обработано %s", job, len(delivered))
+
+
+async def take_checkpoint(job: str, run_date: date | None = None) -> set[str] | None:
+    """
+    Забирает контрольную точку рассылки: запись удаляется.
+    Точка другого дня устарела (утренний прогноз за вчера уже не нужен) и тоже удаляется.
+    :param run_date: день, рассылку которого можно продолжить (по умолчанию сегодня)
+    :return: ключи обработанных получателей или None, если продолжать нечего
+    """
+    async with async_session() as session:
+        checkpoint = await session.get(BroadcastCheckpoint, job)
+        if checkpoint is None:
+            return None
+        await session.delete(checkpoint)
+        await session.commit()
+
+    if checkpoint.run_date != (run_date or date.today()):
+        logger.info("Контрольная точка рассылки %s за %s устарела и удалена", job, checkpoint.run_date)
+        return None
+    return set(json.loads(checkpoint.delivered))
@@ -0,0 +1,148 @@
+"""
+Локальный справочник городов для проверки и подсказок при вводе города.
+
+Города загружаются из bot/data/cities.csv (русское и английское название, страна, население).
+Каждое название приводится к ключу: нижний регистр, «ё» -> «е», дефисы и лишние пробелы
+убраны, кириллица транслитерирована латиницей. Поэтому «санкт петербург», «Sankt-Peterburg»
+и «Saint Petersburg» находят один город. Поиск работает по трём структурам в памяти:
+словарю точных ключей, отсортированному списку ключей (префикс - бинарным поиском)
+и индексу триграмм для опечаток. Апи погоды вызывается только для окончательно выбранного города.
+"""
+
+import csv
+import logging
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+CITIES_FILE = Path(__file__).resolve().parent.parent / "data" / "cities.csv"
+
+# транслитерация без диакритики: ключ кириллического названия совпадает с набором латиницей
+TRANSLIT = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ж": "zh", "з": "z", "и": "i",
+    "й": "i", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o", "п": "p", "р": "r", "с": "s",
+    "т": "t", "у": "u", "ф": "f", "х": "kh", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "shch",
+    "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "iu", "я": "ia",
+})
+# латинские написания, которые транслитерация сводит к одному варианту
+LATIN_VARIANTS = (("yo", "e"), ("ye", "e"), ("yu", "iu"), ("ya", "ia"), ("iy", "i"), ("y", "i"), ("h", "kh"),
+                  ("kkh", "kh"), ("zkh", "zh"), ("ckh", "ch"), ("skh", "sh"), ("x", "ks"), ("w", "v"), ("ii", "i"))
+
+_SEPARATORS = re.compile(r"[\s\-‐–—'’`.,]+")
+
+
+def normalize_city(text: str) -> str:
+    """Ключ поиска города: регистр, «ё», разделители и алфавит не учитываются."""
+    key = _SEPARATORS.sub("", text.casefold().replace("ё", "е")).translate(TRANSLIT)
+    for variant, replacement in LATIN_VARIANTS:
+        key = key.replace(variant, replacement)
+    return key
+
+
+def trigrams(key: str) -> set[str]:
+    """Триграммы ключа с границами слова."""
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass(frozen=True, slots=True)
+class City:
+    """Город справочника."""
+    name: str
+    name_en: str
+    country: str
+    population: int
+
+
+class CityIndex:
+    """
+    Индекс городов: точный поиск, поиск по началу названия и по похожести (опечатки).
+    Атрибуты:
+        cities (list[City]): Города справочника
+    """
+
+    # минимальная доля общих триграмм (коэффициент Дайса) для подсказки с опечаткой
+    FUZZY_THRESHOLD = 0.45
+
+    def __init__(self, cities: list[City]):
+        self.cities = cities
+        self._exact: dict[str, int] = {}
+        self._trigrams: dict[str, list[int]] = defaultdict(list)
+        keys: list[tuple[str, int]] = []
+        for i, city in enumerate(cities):
+            for key in {normalize_city(city.name), normalize_city(city.name_en)}:
+                # при совпадении названий выигрывает более крупный город
+                if key not in self._exact or city.population > cities[self._exact[key]].population:
+                    self._exact[key] = i
+                keys.append((key, i))
+        keys.sort()
+        self._keys = [key for key, _ in keys]
+        self._key_cities = [i for _, i in keys]
+        for position, key in enumerate(self._keys):
+            for gram in trigrams(key):
+                self._trigrams[gram].append(position)
+
+    @classmethod
+    def load(cls, path: Path = CITIES_FILE) -> "CityIndex":
+        """Загружает справочник из CSV."""
+        with open(path, encoding="utf-8", newline="") as f:
+            cities = [City(row["name"], row["name_en"], row["country"], int(row["population"]))
+                      for row in csv.DictReader(f)]
+        logger.info("Загружен справочник городов: %s", len(cities))
+        return cls(cities)
+
+    def resolve(self, text: str) -> City | None:
+        """Город, название которого совпадает с текстом с точностью до нормализации."""
+        i = self._exact.get(normalize_city(text))
+        return None if i is None else self.cities[i]
+
+    def _prefix(self, key: str) -> set[int]:
+        found = set()
+        for position in range(bisect_left(self._keys, key), len(self._keys)):
+            if not self._keys[position].startswith(key):
+                break
+            found.add(self._key_cities[position])
+        return found
+
+    def _fuzzy(self, key: str) -> dict[int, float]:
+        grams = trigrams(key)
+        shared = Counter(position for gram in grams for position in self._trigrams.get(gram, ()))
+        scores: dict[int, float] = {}
+        for position, count in shared.items():
+            score = 2 * count / (len(grams) + len(self._keys[position]) + 1)
+            i = self._key_cities[position]
+            if score >= self.FUZZY_THRESHOLD and score > scores.get(i, 0):
+                scores[i] = score
+        return scores
+
+    def suggest(self, text: str, limit: int = 5) -> list[City]:
+        """
+        Подсказки по введённому тексту: сначала города, название которых начинается с текста
+        (крупные выше), затем похожие названия для текста с опечаткой.
+        """
+        key = normalize_city(text)
+        if not key:
+            return []
+        prefix = sorted(self._prefix(key), key=lambda i: -self.cities[i].population)
+        result = prefix[:limit]
+        if len(result) < limit:
+            fuzzy = self._fuzzy(key)
+            ranked = sorted((i for i in fuzzy if i not in prefix),
+                            key=lambda i: (-fuzzy[i], -self.cities[i].population))
+            result += ranked[:limit - len(result)]
+        return [self.cities[i] for i in result]
+
+
+_city_index: CityIndex | None = None
+
+
+def get_city_index() -> CityIndex:
+    """Справочник городов, загружаемый при первом обращении."""
+    global _city_index
+    if _city_index is None:
+        _city_index = CityIndex.load()
+    return _city_index
@@ -0,0 +1,253 @@
+"""
+Климатическая норма городов и аномалии погоды.
+
+Норма - средняя температура и её разброс для каждого дня года, посчитанные по всей
+сохранённой истории города (сырые наблюдения и дневные агрегаты) и сглаженные по окну
+±CLIMATE_WINDOW_DAYS дней. Для каждого дня года в БД хранятся суммы Σt и Σt²
+среднесуточных температур, поэтому ночной пересчёт читает только дни, появившиеся
+с прошлого запуска. Нормы держатся в памяти процесса, и оценка аномалии для текущей
+погоды или прогноза - одно обращение к словарю.
+"""
+
+import calendar
+import logging
+import math
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, timedelta
+from sqlalchemy import delete, union
+from sqlalchemy.future import select
+from bot.config.config import config
+from bot.database.database import async_session
+from bot.database.models import (ClimateBaseline, ClimateBaselineProgress, User, WeatherData,
+                                 WeatherDailyAggregate)
+from bot.services.analytics import daily_history
+
+logger = logging.getLogger(__name__)
+
+DAYS_IN_YEAR = 365
+
+
+def day_of_year(day: date) -> int:
+    """День года от 1 до 365: в високосный год 29 февраля совпадает с 28 февраля."""
+    number = day.timetuple().tm_yday
+    if number > 59 and calendar.isleap(day.year):
+        number -= 1
+    return number
+
+
+@dataclass(frozen=True, slots=True)
+class Baseline:
+    """Климатическая норма на день года."""
+    mean: float
+    std: float
+    samples: int
+
+
+@dataclass(frozen=True, slots=True)
+class Anomaly:
+    """Отклонение температуры от нормы."""
+    delta: float
+    z_score: float | None
+
+    def describe(self) -> str:
+        """Текст для сообщения, например «+7.0°C к норме»."""
+        if abs(self.delta) < 1.0:
+            return "в пределах нормы"
+        return f"{self.delta:+.1f}°C к норме"
+
+
+@dataclass
+class ClimateRebuildStats:
+    """Итоги пересчёта норм."""
+    cities: int = 0
+    days_added: int = 0
+    elapsed: float = 0.0
+
+
+def _smooth(sums: dict[int, list[float]], window_days: int) -> dict[int, tuple[int, float, float]]:
+    """
+    Сглаживает суммы по дням года окном ±window_days (через границу года).
+    :param sums: день года -> [количество дней, Σt, Σt²]
+    :return: день года -> (дней в окне, норма, стандартное отклонение)
+    """
+    smoothed = {}
+    for day in range(1, DAYS_IN_YEAR + 1):
+        samples, total, squares = 0, 0.0, 0.0
+        for offset in range(-window_days, window_days + 1):
+            entry = sums.get((day - 1 + offset) % DAYS_IN_YEAR + 1)
+            if entry:
+                samples += entry[0]
+                total += entry[1]
+                squares += entry[2]
+        if samples:
+            mean = total / samples
+            smoothed[day] = (samples, mean, math.sqrt(max(squares / samples - mean * mean, 0.0)))
+    return smoothed
+
+
+async def _load_new_days(session, progress: dict[str, ClimateBaselineProgress], cities: set[str],
+                         until: date) -> dict[str, list[tuple[date, float]]]:
+    """Среднесуточные температуры городов за дни, ещё не учтённые в норме."""
+    new_cities = sorted(cities - progress.keys())
+    known_cities = sorted(cities & progress.keys())
+
+    queries = []
+    if new_cities:
+        queries.append((daily_history(until=until, cities=new_cities), {}))
+    if known_cities:
+        since = min(progress[city].last_day for city in known_cities) + timedelta(days=1)
+        watermarks = {city: progress[city].last_day for city in known_cities}
+        queries.append((daily_history(since, until=until, cities=known_cities), watermarks))
+
+    new_days: dict[str, list[tuple[date, float]]] = defaultdict(list)
+    for days, watermarks in queries:
+        rows = await session.execute(select(days.c.city, days.c.day, days.c.temp))
+        for city, raw_day, temp in rows:
+            if temp is None:
+                continue
+            day = raw_day if isinstance(raw_day, date) else date.fromisoformat(raw_day)
+            # города с разным прогрессом читаются одним запросом, лишние дни отбрасываются здесь
+            if city in watermarks and day <= watermarks[city]:
+                continue
+            new_days[city].append((day, float(temp)))
+    return new_days
+
+
+async def rebuild_climate_baselines(window_days: int | None = None) -> ClimateRebuildStats:
+    """
+    Добавляет в нормы городов дни истории, накопленные с прошлого запуска, и пересчитывает сглаживание.
+    Текущий день не учитывается, пока он не закончился.
+    :param window_days: полуширина окна сглаживания (по умолчанию из конфига)
+    :return: статистика пересчёта
+    """
+    window_days = config.CLIMATE_WINDOW_DAYS if window_days is None else window_days
+    stats = ClimateRebuildStats()
+    started = time.perf_counter()
+    today = date.today()
+
+    async with async_session() as session:
+        progress = {
+            row.city: row for row in (await session.execute(select(ClimateBaselineProgress))).scalars().all()
+        }
+        cities_stmt = union(
+            select(User.city),
+            select(WeatherData.city).where(WeatherData.city.is_not(None)),
+            select(WeatherDailyAggregate.city).where(WeatherDailyAggregate.city.is_not(None)),
+        )
+        cities = set((await session.execute(cities_stmt)).scalars().all())
+        new_days = await _load_new_days(session, progress, cities, today)
+
+        if new_days:
+            existing_stmt = select(ClimateBaseline).where(ClimateBaseline.city.in_(list(new_days)))
+            baselines: dict[str, dict[int, ClimateBaseline]] = defaultdict(dict)
+            for row in (await session.execute(existing_stmt)).scalars().all():
+                baselines[row.city][row.day_of_year] = row
+
+            for city, days in new_days.items():
+                city_rows = baselines[city]
+                sums: dict[int, list[float]] = {
+                    number: [row.samples, row.temperature_sum, row.temperature_sq_sum]
+                    for number, row in city_rows.items()
+                }
+                for day, temp in days:
+                    entry = sums.setdefault(day_of_year(day), [0, 0.0, 0.0])
+                    entry[0] += 1
+                    entry[1] += temp
+                    entry[2] += temp * temp
+
+                for number, (window_samples, mean, std) in _smooth(sums, window_days).items():
+                    row = city_rows.get(number)
+                    if row is None:
+                        row = ClimateBaseline(city=city, day_of_year=number)
+                        session.add(row)
+                        city_rows[number] = row
+                    row.samples, row.temperature_sum, row.temperature_sq_sum = sums.get(number, [0, 0.0, 0.0])
+                    row.window_samples = window_samples
+                    row.temperature_mean = mean
+                    row.temperature_std = std
+
+                last_day = max(day for day, _ in days)
+                if city in progress:
+                    progress[city].last_day = last_day
+                else:
+                    session.add(ClimateBaselineProgress(city=city, last_day=last_day))
+                stats.days_added += len(days)
+
+            await session.commit()
+        stats.cities = len(new_days)
+
+    await climate_baselines.load()
+    stats.elapsed = time.perf_counter() - started
+    logger.info("Пересчёт климатических норм: городов %s, новых дней %s, время %.2f c",
+                stats.cities, stats.days_added, stats.elapsed)
+    return stats
+
+
+async def reset_climate_baseline(city: str) -> None:
+    """Удаляет норму города, чтобы следующий пересчёт построил её по всей истории заново
+    (например, после импорта архива за прошлые годы).
+    """
+    async with async_session() as session:
+        await session.execute(delete(ClimateBaseline).where(ClimateBaseline.city == city))
+        await session.execute(delete(ClimateBaselineProgress).where(ClimateBaselineProgress.city == city))
+        await session.commit()
+
+
+class ClimateBaselines:
+    """
+    Нормы всех городов в памяти: (город, день года) -> Baseline.
+    Загружаются из БД при первом обращении и после каждого пересчёта.
+    Атрибуты:
+        reload_after (float | None): Через сколько секунд загруженные нормы читаются из БД заново
+            (пересчёт, выполненный другим процессом), None - не перечитываются
+    """
+
+    def __init__(self, reload_after: float | None = None):
+        self._baselines: dict[tuple[str, int], Baseline] = {}
+        self.loaded = False
+        self.reload_after = reload_after
+        self._loaded_at = 0.0
+
+    async def load(self) -> None:
+        """Загружает надёжные нормы (не меньше CLIMATE_MIN_SAMPLES дней в окне)."""
+        stmt = (
+            select(ClimateBaseline.city, ClimateBaseline.day_of_year, ClimateBaseline.temperature_mean,
+                   ClimateBaseline.temperature_std, ClimateBaseline.window_samples)
+            .where(ClimateBaseline.window_samples >= config.CLIMATE_MIN_SAMPLES)
+        )
+        async with async_session() as session:
+            rows = (await session.execute(stmt)).all()
+        self._baselines = {
+            (city, number): Baseline(mean, std or 0.0, samples) for city, number, mean, std, samples in rows
+        }
+        self.loaded = True
+        self._loaded_at = time.monotonic()
+
+    async def ensure_loaded(self) -> None:
+        """Загружает нормы, если это ещё не сделано или загруженные старше reload_after."""
+        stale = self.reload_after is not None and time.monotonic() - self._loaded_at >= self.reload_after
+        if not self.loaded or stale:
+            await self.load()
+
+    def get(self, city: str, day: date) -> Baseline | None:
+        """Норма города на день или None, если истории недостаточно."""
+        return self._baselines.get((city, day_of_year(day)))
+
+    def anomaly(self, city: str, day: date, temperature: float | None) -> Anomaly | None:
+        """Отклонение температуры от нормы города на этот день года."""
+        baseline = self.get(city, day)
+        if baseline is None or temperature is None:
+            return None
+        delta = temperature - baseline.mean
+        z_score = round(delta / baseline.std, 2) if baseline.std > 0 else None
+        return Anomaly(round(delta, 1), z_score)
+
+    def clear(self) -> None:
+        """Сбрасывает нормы в памяти."""
+        self._baselines = {}
+        self.loaded = False
+
+
+climate_baselines = ClimateBaselines()
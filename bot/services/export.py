@@ -0,0 +1,171 @@
+"""
+Потоковая выгрузка истории наблюдений.
+
+Строки читаются из БД курсором на стороне сервера частями по yield_per,
+сериализуются в CSV или NDJSON и пишутся в gzip-файлы. Сериализация, сжатие
+и запись на диск выполняются в отдельном потоке, поэтому цикл событий не блокируется,
+а потребление памяти не зависит от объёма выгрузки. При превышении
+part_size выгрузка продолжается в следующий файл (для лимита документов Telegram).
+"""
+
+import asyncio
+import csv
+import gzip
+import io
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from sqlalchemy import func
+from sqlalchemy.future import select
+from bot.config.config import config
+from bot.database.models import User, WeatherData
+from bot.database.database import async_session
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("csv", "ndjson")
+EXPORT_FIELDS = ("id", "user_id", "city", "date", "temperature", "feels_like",
+                 "pressure", "humidity", "wind_speed", "description")
+
+
+@dataclass
+class ExportResult:
+    """Итоги выгрузки: созданные файлы, количество строк и время."""
+    files: list[Path] = field(default_factory=list)
+    rows: int = 0
+    elapsed: float = 0.0
+
+
+def parse_date(value: str | None) -> date | None:
+    """Разбирает дату в формате ГГГГ-ММ-ДД или ДД.ММ.ГГГГ."""
+    if not value:
+        return None
+    for fmt in ("%Y-%m-%d", "%d.%m.%Y"):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Некорректная дата: {value}")
+
+
+def _serialize(rows, fmt: str) -> str:
+    """Превращает пачку строк в текст выбранного формата."""
+    buffer = io.StringIO()
+    if fmt == "csv":
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(row)
+    else:
+        for row in rows:
+            record = dict(zip(EXPORT_FIELDS, row))
+            record["date"] = record["date"].isoformat() if record["date"] else None
+            buffer.write(json.dumps(record, ensure_ascii=False))
+            buffer.write("\n")
+    return buffer.getvalue()
+
+
+class _PartWriter:
+    """Пишет сжатые части выгрузки и переключается на новый файл по достижении лимита."""
+
+    def __init__(self, output_dir: Path, prefix: str, fmt: str, part_size: int):
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.fmt = fmt
+        self.part_size = part_size
+        self.files: list[Path] = []
+        self._gzip = None
+        self._file = None
+
+    def _open_part(self) -> None:
+        path = self.output_dir / f"{self.prefix}_part{len(self.files) + 1:03d}.{self.fmt}.gz"
+        self._gzip = gzip.GzipFile(path, "wb")
+        self._file = io.TextIOWrapper(self._gzip, encoding="utf-8", newline="")
+        self.files.append(path)
+        if self.fmt == "csv":
+            csv.writer(self._file).writerow(EXPORT_FIELDS)
+
+    def write_rows(self, rows) -> None:
+        """Вызывается в отдельном потоке: сериализует пачку строк и пишет её."""
+        self.write(_serialize(rows, self.fmt))
+
+    def write(self, data: str) -> None:
+        """Вызывается в отдельном потоке: сжимает и пишет данные."""
+        if self._file is None:
+            self._open_part()
+        self._file.write(data)
+        # размер уже сжатых данных в файле; остаток в буфере компрессора не превышает пары сотен КБ
+        if self.part_size and self._gzip.fileobj.tell() >= self.part_size:
+            self.close()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._gzip = None
+
+
+async def export_weather_data(output_dir: Path, fmt: str = "csv", city: str | None = None,
+                              date_from: date | None = None, date_to: date | None = None,
+                              part_size: int = 0, chunk_rows: int | None = None) -> ExportResult:
+    """
+    Выгружает наблюдения в сжатые файлы CSV или NDJSON.
+    :param output_dir: папка для файлов выгрузки
+    :param fmt: формат - csv или ndjson
+    :param city: фильтр по городу
+    :param date_from: первый день выгрузки (включительно)
+    :param date_to: последний день выгрузки (включительно)
+    :param part_size: максимальный размер одной части в байтах, 0 - без разбиения
+    :param chunk_rows: сколько строк читать из курсора за раз
+    :return: список файлов и статистика выгрузки
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат выгрузки: {fmt}")
+    chunk_rows = chunk_rows or config.EXPORT_CHUNK_ROWS
+    started = time.perf_counter()
+
+    # у импортированной истории нет пользователя, город хранится в самой записи
+    row_city = func.coalesce(WeatherData.city, User.city)
+    conditions = []
+    if city:
+        conditions.append(row_city == city)
+    if date_from:
+        conditions.append(WeatherData.date >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        conditions.append(WeatherData.date < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+
+    # выбираем колонки, а не ORM-объекты, чтобы строки не копились в identity map сессии
+    stmt = (
+        select(WeatherData.id, WeatherData.user_id, row_city, WeatherData.date,
+               WeatherData.temperature, WeatherData.feels_like, WeatherData.pressure,
+               WeatherData.humidity, WeatherData.wind_speed, WeatherData.description)
+        .outerjoin(User, User.id == WeatherData.user_id)
+        .where(*conditions)
+        .order_by(WeatherData.id)
+        .execution_options(yield_per=chunk_rows)
+    )
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    prefix = f"weather_{city or 'all'}_{datetime.now():%Y%m%d_%H%M%S}"
+    writer = _PartWriter(output_dir, prefix, fmt, part_size)
+    result = ExportResult()
+
+    try:
+        async with async_session() as session:
+            stream = await session.stream(stmt)
+            try:
+                async for partition in stream.partitions():
+                    # сериализация тоже уходит в поток, чтобы большие пачки не задерживали цикл событий
+                    await asyncio.to_thread(writer.write_rows, partition)
+                    result.rows += len(partition)
+            finally:
+                await stream.close()
+    finally:
+        await asyncio.to_thread(writer.close)
+
+    result.files = writer.files
+    result.elapsed = time.perf_counter() - started
+    logger.info("Выгрузка истории погоды: %s строк, %s файлов, %.1f c", result.rows, len(result.files), result.elapsed)
+    return result
@@ -0,0 +1,161 @@
+"""
+Загрузка исторических наблюдений города из архива OpenWeatherMap (History Bulk).
+
+Поддерживаются оба формата выгрузки OWM:
+- JSON - массив записей вида {"dt": ..., "main": {"temp": ...}, "wind": {...}, "weather": [{...}]}
+- CSV - плоские колонки dt, temp, feels_like, pressure, humidity, wind_speed, weather_description
+
+Записи вставляются многострочными INSERT пачками, уже загруженные
+наблюдения (тот же город и время) пропускаются, поэтому архив можно
+загружать повторно.
+"""
+
+import asyncio
+import csv
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Iterator
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from bot.config.config import config
+from bot.database.models import WeatherData
+from bot.database.database import async_session, engine
+from bot.services.climate import reset_climate_baseline
+from bot.services.trends import rebuild_trend_days, window_start
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ImportStats:
+    """Итоги загрузки архива."""
+    read: int = 0
+    inserted: int = 0
+    skipped: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        """Скорость обработки строк архива."""
+        return self.read / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def _observation_time(timestamp) -> datetime:
+    """Время наблюдения в UTC без часового пояса, как его пишет func.now() в SQLite."""
+    return datetime.fromtimestamp(int(float(timestamp)), timezone.utc).replace(tzinfo=None)
+
+
+def _float(value) -> float | None:
+    return float(value) if value not in (None, "") else None
+
+
+def _parse_json_record(record: dict[str, Any], city: str) -> dict[str, Any]:
+    main = record.get("main", {})
+    weather = record.get("weather") or [{}]
+    return {
+        "city": city,
+        "date": _observation_time(record["dt"]),
+        "temperature": _float(main.get("temp")),
+        "feels_like": _float(main.get("feels_like")),
+        "pressure": int(main["pressure"]) if main.get("pressure") is not None else None,
+        "humidity": int(main["humidity"]) if main.get("humidity") is not None else None,
+        "wind_speed": _float(record.get("wind", {}).get("speed")),
+        "description": weather[0].get("description"),
+    }
+
+
+def _parse_csv_record(record: dict[str, str], city: str) -> dict[str, Any]:
+    return {
+        "city": city,
+        "date": _observation_time(record["dt"]),
+        "temperature": _float(record.get("temp")),
+        "feels_like": _float(record.get("feels_like")),
+        "pressure": int(float(record["pressure"])) if record.get("pressure") else None,
+        "humidity": int(float(record["humidity"])) if record.get("humidity") else None,
+        "wind_speed": _float(record.get("wind_speed")),
+        "description": record.get("weather_description") or None,
+    }
+
+
+def read_owm_history(path: Path, city: str) -> Iterator[dict[str, Any]]:
+    """
+    Читает архив OWM и возвращает записи в формате колонок WeatherData.
+    :param path: путь к файлу .json или .csv
+    :param city: название города, под которым сохранить данные (как его вводят пользователи)
+    """
+    if path.suffix.lower() == ".csv":
+        with path.open(newline="", encoding="utf-8") as f:
+            for record in csv.DictReader(f):
+                yield _parse_csv_record(record, city)
+    elif path.suffix.lower() == ".json":
+        with path.open(encoding="utf-8") as f:
+            records = json.load(f)
+        for record in records:
+            yield _parse_json_record(record, city)
+    else:
+        raise ValueError(f"Неподдерживаемый формат архива: {path.suffix}")
+
+
+def _insert_ignore_duplicates():
+    """INSERT, пропускающий строки, которые нарушают уникальный индекс (город, время)."""
+    if engine.dialect.name == "sqlite":
+        return sqlite.insert(WeatherData).on_conflict_do_nothing()
+    if engine.dialect.name == "postgresql":
+        return postgresql.insert(WeatherData).on_conflict_do_nothing()
+    return insert(WeatherData).prefix_with("IGNORE")
+
+
+async def _insert_chunk(chunk: list[dict[str, Any]]) -> int:
+    """Вставляет пачку одним многострочным INSERT и возвращает количество новых строк.
+    Если в пачке есть наблюдения недельного окна, суммы тенденций их суток пересчитываются
+    по строкам БД - пропущенные дубликаты в суммы второй раз не попадают.
+    """
+    async with async_session() as session:
+        result = await session.execute(_insert_ignore_duplicates().values(chunk))
+        await session.commit()
+
+    since = window_start().date()
+    recent_days = [row["date"].date() for row in chunk if row["date"].date() >= since]
+    if result.rowcount and recent_days:
+        await rebuild_trend_days(min(recent_days), max(recent_days) + timedelta(days=1), chunk[0]["city"])
+    return result.rowcount
+
+
+async def import_owm_history(path: Path, city: str, chunk_rows: int | None = None) -> ImportStats:
+    """
+    Загружает историю наблюдений города из архива OWM.
+    :param path: путь к архиву .json или .csv
+    :param city: название города в БД
+    :param chunk_rows: строк в одном INSERT (по умолчанию из конфига)
+    :return: количество прочитанных, добавленных и пропущенных строк и скорость загрузки
+    """
+    chunk_rows = chunk_rows or config.IMPORT_CHUNK_ROWS
+    stats = ImportStats()
+    started = time.perf_counter()
+
+    chunk: list[dict[str, Any]] = []
+    for row in read_owm_history(path, city):
+        chunk.append(row)
+        if len(chunk) >= chunk_rows:
+            inserted = await _insert_chunk(chunk)
+            stats.read += len(chunk)
+            stats.inserted += inserted
+            chunk = []
+            # даём циклу событий обработать другие задачи между пачками
+            await asyncio.sleep(0)
+    if chunk:
+        stats.read += len(chunk)
+        stats.inserted += await _insert_chunk(chunk)
+
+    stats.skipped = stats.read - stats.inserted
+    if stats.inserted:
+        # архив может содержать прошлые годы - норма города будет построена заново при следующем пересчёте
+        await reset_climate_baseline(city)
+    stats.elapsed = time.perf_counter() - started
+    logger.info("Импорт истории %s из %s: прочитано %s, добавлено %s, пропущено %s, %.0f строк/с",
+                city, path.name, stats.read, stats.inserted, stats.skipped, stats.rows_per_second)
+    return stats
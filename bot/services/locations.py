@@ -0,0 +1,137 @@
+"""
+Несколько мест пользователя: основной город (User.city) и дополнительные места (UserLocation).
+
+Погода запрашивается по координатам места (по названию города, если координат нет) через общий
+кэш WeatherAPI. Координаты округляются до ячейки геохеша, поэтому одно и то же место у разных
+пользователей запрашивается у апи один раз: новые места увеличивают число запросов только
+на количество новых различных ячеек.
+"""
+
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from sqlalchemy import delete, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.future import select
+from bot.config.config import config
+from bot.database.models import User, UserLocation
+from bot.database.database import async_session
+from bot.services.weather_api import coordinates_cell, place_key
+from bot.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# дополнительные места по внутреннему ID пользователя; сбрасывается при изменении
+locations_cache = LRUCache(maxsize=config.USER_CACHE_SIZE, ttl=config.USER_CACHE_TTL)
+
+
+@dataclass(frozen=True, slots=True)
+class Place:
+    """Место, для которого пользователь получает погоду."""
+    label: str
+    city: str
+    # основной город пользователя: по нему ведётся история и недельный анализ
+    primary: bool = False
+    latitude: float | None = None
+    longitude: float | None = None
+    # ID дополнительного места (UserLocation.id), 0 - основной город
+    location_id: int = 0
+
+    @property
+    def cell(self) -> str | None:
+        """Ячейка геохеша места (None - место без координат, запрашивается по названию)."""
+        if self.latitude is None or self.longitude is None:
+            return None
+        return coordinates_cell(self.latitude, self.longitude)
+
+
+def user_places(user: User, locations: list[UserLocation]) -> list[Place]:
+    """Места пользователя: основной город, затем дополнительные места в порядке добавления.
+    Место, совпавшее с основным городом после его смены, не дублируется.
+    """
+    primary = place_key(user.city)
+    return [Place(user.city, user.city, primary=True, latitude=user.latitude, longitude=user.longitude)] + [
+        Place(location.label, location.city, latitude=location.latitude, longitude=location.longitude,
+              location_id=location.id)
+        for location in locations if place_key(location.city) != primary
+    ]
+
+
+async def get_locations(user_id: int) -> list[UserLocation]:
+    """Дополнительные места пользователя (из кэша, к БД - только при промахе)."""
+    locations = locations_cache.get(user_id)
+    if locations is None:
+        async with async_session() as session:
+            stmt = select(UserLocation).where(UserLocation.user_id == user_id).order_by(UserLocation.id)
+            locations = list((await session.execute(stmt)).scalars().all())
+        locations_cache.set(user_id, locations)
+    return locations
+
+
+async def get_places(user: User) -> list[Place]:
+    """Все места пользователя."""
+    return user_places(user, await get_locations(user.id))
+
+
+async def add_location(user: User, city: str, name: str | None = None,
+                       latitude: float | None = None, longitude: float | None = None) -> bool:
+    """
+    Сохраняет дополнительное место пользователя.
+    :return: False, если город уже есть среди мест пользователя или превышен лимит MAX_LOCATIONS
+    """
+    if place_key(city) == place_key(user.city):
+        return False
+    async with async_session() as session:
+        count = await session.scalar(
+            select(func.count()).select_from(UserLocation).where(UserLocation.user_id == user.id)
+        )
+        if count >= config.MAX_LOCATIONS:
+            return False
+        session.add(UserLocation(user_id=user.id, name=name or city, city=city,
+                                 latitude=latitude, longitude=longitude))
+        try:
+            await session.commit()
+        except IntegrityError:
+            return False
+    locations_cache.pop(user.id)
+    return True
+
+
+async def remove_location(user_id: int, location_id: int) -> bool:
+    """Удаляет дополнительное место пользователя."""
+    async with async_session() as session:
+        result = await session.execute(
+            delete(UserLocation).where(UserLocation.user_id == user_id, UserLocation.id == location_id)
+        )
+        await session.commit()
+    locations_cache.pop(user_id)
+    return bool(result.rowcount)
+
+
+async def places_by_city(users: list[User]) -> dict[str, list[tuple[User, Place]]]:
+    """
+    Получатели рассылки (активные пользователи), сгруппированные по городу места: места всех
+    пользователей загружаются одним запросом, и погода каждого города запрашивается один раз.
+    :return: город -> список (пользователь, место)
+    """
+    locations: dict[int, list[UserLocation]] = defaultdict(list)
+    if users:
+        # места всех активных пользователей через JOIN, а не IN со списком ID:
+        # у SQLite ограничено количество параметров запроса
+        user_ids = {user.id for user in users}
+        stmt = (
+            select(UserLocation)
+            .join(User, User.id == UserLocation.user_id)
+            .where(User.is_active.is_(True))
+            .order_by(UserLocation.id)
+        )
+        async with async_session() as session:
+            for location in (await session.execute(stmt)).scalars().all():
+                if location.user_id in user_ids:
+                    locations[location.user_id].append(location)
+
+    deliveries: dict[str, list[tuple[User, Place]]] = defaultdict(list)
+    for user in users:
+        for place in user_places(user, locations[user.id]):
+            deliveries[place.city].append((user, place))
+    return dict(deliveries)
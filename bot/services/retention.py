@@ -0,0 +1,202 @@
+"""
+Очистка истории погоды.
+
+Сырые наблюдения старше окна хранения сворачиваются в дневные агрегаты
+(таблица weather_daily) и удаляются пачками, чтобы не держать долгую
+блокировку записи в SQLite. После удаления освобождённые страницы
+возвращаются системе через PRAGMA incremental_vacuum.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from sqlalchemy import and_, case, delete, func
+from sqlalchemy.future import select
+from bot.config.config import config
+from bot.database.database import async_session, engine
+from bot.database.models import User, WeatherData, WeatherDailyAggregate
+from bot.services.analytics import rain_condition
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RetentionStats:
+    """Результат одного запуска очистки истории."""
+    rows_deleted: int = 0
+    aggregates_written: int = 0
+    batches: int = 0
+    pages_freed: int = 0
+    elapsed: float = 0.0
+
+
+def _merge_average(old_avg, old_count: int, new_avg, new_count: int):
+    """Взвешенное среднее двух частичных агрегатов."""
+    if old_avg is None:
+        return new_avg
+    if new_avg is None:
+        return old_avg
+    return (old_avg * old_count + new_avg * new_count) / (old_count + new_count)
+
+
+def _merge_extreme(pick, old_value, new_value):
+    """Минимум или максимум двух значений с учётом пропусков."""
+    values = [value for value in (old_value, new_value) if value is not None]
+    return pick(values) if values else None
+
+
+async def _downsample_batch(cutoff: datetime, batch_size: int) -> tuple[int, int]:
+    """Сворачивает и удаляет одну пачку наблюдений старше cutoff.
+    Возвращает количество удалённых строк и записанных агрегатов.
+    """
+    async with async_session() as session:
+        # верхняя граница пачки по id: старые записи имеют наименьшие id, поэтому скан короткий
+        ids_stmt = (
+            select(WeatherData.id)
+            .where(WeatherData.date < cutoff)
+            .order_by(WeatherData.id)
+            .limit(batch_size)
+        )
+        ids = (await session.execute(ids_stmt)).scalars().all()
+        if not ids:
+            return 0, 0
+        last_id = ids[-1]
+        batch_filter = and_(WeatherData.id <= last_id, WeatherData.date < cutoff)
+
+        day = func.date(WeatherData.date).label("day")
+        row_city = func.coalesce(WeatherData.city, User.city)
+        aggregate_stmt = (
+            select(
+                WeatherData.user_id,
+                row_city,
+                day,
+                func.count(WeatherData.id),
+                func.avg(WeatherData.temperature),
+                func.min(WeatherData.temperature),
+                func.max(WeatherData.temperature),
+                func.avg(WeatherData.feels_like),
+                func.avg(WeatherData.pressure),
+                func.avg(WeatherData.humidity),
+                func.avg(WeatherData.wind_speed),
+                func.sum(case((rain_condition(WeatherData.description), 1), else_=0)),
+            )
+            .outerjoin(User, User.id == WeatherData.user_id)
+            .where(batch_filter)
+            .group_by(WeatherData.user_id, row_city, day)
+        )
+        groups = (await session.execute(aggregate_stmt)).all()
+
+        days = {row[2] if isinstance(row[2], date) else date.fromisoformat(row[2]) for row in groups}
+        existing_stmt = select(WeatherDailyAggregate).where(WeatherDailyAggregate.date.in_(days))
+        existing = {
+            (aggregate.user_id, aggregate.city, aggregate.date): aggregate
+            for aggregate in (await session.execute(existing_stmt)).scalars().all()
+        }
+
+        for (user_id, city, raw_day, samples, temp_avg, temp_min, temp_max,
+             feels_avg, pressure_avg, humidity_avg, wind_avg, rainy) in groups:
+            day_value = raw_day if isinstance(raw_day, date) else date.fromisoformat(raw_day)
+            aggregate = existing.get((user_id, city, day_value))
+            if aggregate is None:
+                aggregate = WeatherDailyAggregate(
+                    user_id=user_id,
+                    city=city,
+                    date=day_value,
+                    samples=samples,
+                    temperature_avg=temp_avg,
+                    temperature_min=temp_min,
+                    temperature_max=temp_max,
+                    feels_like_avg=feels_avg,
+                    pressure_avg=pressure_avg,
+                    humidity_avg=humidity_avg,
+                    wind_speed_avg=wind_avg,
+                    rainy_samples=rainy or 0,
+                )
+                session.add(aggregate)
+                existing[(user_id, city, day_value)] = aggregate
+                continue
+
+            # день уже частично свёрнут предыдущей пачкой - объединяем агрегаты
+            old = aggregate.samples
+            aggregate.temperature_avg = _merge_average(aggregate.temperature_avg, old, temp_avg, samples)
+            aggregate.feels_like_avg = _merge_average(aggregate.feels_like_avg, old, feels_avg, samples)
+            aggregate.pressure_avg = _merge_average(aggregate.pressure_avg, old, pressure_avg, samples)
+            aggregate.humidity_avg = _merge_average(aggregate.humidity_avg, old, humidity_avg, samples)
+            aggregate.wind_speed_avg = _merge_average(aggregate.wind_speed_avg, old, wind_avg, samples)
+            aggregate.temperature_min = _merge_extreme(min, aggregate.temperature_min, temp_min)
+            aggregate.temperature_max = _merge_extreme(max, aggregate.temperature_max, temp_max)
+            aggregate.rainy_samples += rainy or 0
+            aggregate.samples = old + samples
+
+        result = await session.execute(delete(WeatherData).where(batch_filter))
+        await session.commit()
+        return result.rowcount, len(groups)
+
+
+async def _reclaim_space(max_pages: int) -> int:
+    """Возвращает системе до max_pages свободных страниц SQLite.
+    Работает только при auto_vacuum = INCREMENTAL, иначе ничего не делает.
+    """
+    if engine.dialect.name != "sqlite" or max_pages <= 0:
+        return 0
+
+    async with engine.connect() as conn:
+        auto_vacuum = (await conn.exec_driver_sql("PRAGMA auto_vacuum")).scalar()
+        if auto_vacuum != 2:
+            logger.info("auto_vacuum не в режиме INCREMENTAL, освобождение страниц пропущено "
+                        "(для включения требуется разовый VACUUM)")
+            return 0
+
+        before = (await conn.exec_driver_sql("PRAGMA freelist_count")).scalar()
+        # через execute драйвер делает один шаг и освобождает лишь одну страницу,
+        # executescript выполняет прагму до конца
+        raw_connection = await conn.get_raw_connection()
+        await raw_connection.driver_connection.executescript(f"PRAGMA incremental_vacuum({int(max_pages)});")
+        after = (await conn.exec_driver_sql("PRAGMA freelist_count")).scalar()
+        await conn.commit()
+
+    return max(before - after, 0)
+
+
+async def downsample_weather_history(retention_days: int | None = None,
+                                     batch_size: int | None = None,
+                                     vacuum_pages: int | None = None) -> RetentionStats:
+    """
+    Сворачивает наблюдения старше окна хранения в дневные агрегаты и удаляет их.
+    :param retention_days: сколько дней хранить сырые данные (по умолчанию из конфига)
+    :param batch_size: размер пачки на одну транзакцию (по умолчанию из конфига)
+    :param vacuum_pages: лимит освобождаемых страниц SQLite (по умолчанию из конфига)
+    :return: статистика запуска
+    """
+    retention_days = config.RETENTION_DAYS if retention_days is None else retention_days
+    batch_size = config.RETENTION_BATCH_SIZE if batch_size is None else batch_size
+    vacuum_pages = config.RETENTION_VACUUM_PAGES if vacuum_pages is None else vacuum_pages
+
+    stats = RetentionStats()
+    started = time.perf_counter()
+
+    # сворачиваем только целые дни, чтобы агрегат за день не собирался из разных запусков
+    cutoff = datetime.combine(date.today() - timedelta(days=retention_days), datetime.min.time())
+
+    while True:
+        deleted, written = await _downsample_batch(cutoff, batch_size)
+        if not deleted:
+            break
+        stats.rows_deleted += deleted
+        stats.aggregates_written += written
+        stats.batches += 1
+        # отдаём управление циклу событий между пачками
+        await asyncio.sleep(0)
+
+    if stats.rows_deleted:
+        stats.pages_freed = await _reclaim_space(vacuum_pages)
+
+    stats.elapsed = time.perf_counter() - started
+    logger.info(
+        "Очистка истории погоды: удалено %s строк, агрегатов записано %s, пачек %s, "
+        "освобождено страниц %s, время %.2f c",
+        stats.rows_deleted, stats.aggregates_written, stats.batches, stats.pages_freed, stats.elapsed
+    )
+    return stats
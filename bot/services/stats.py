@@ -0,0 +1,139 @@
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any
+from sqlalchemy import case, func
+from sqlalchemy.future import select
+from bot.config.config import config
+from bot.database.models import User, WeatherData, WeatherDailyAggregate
+from bot.database.database import async_session, engine
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BroadcastStats:
+    """Итоги одной рассылки."""
+    job: str
+    sent: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+    loop_lag_max: float = 0.0
+    finished_at: datetime = field(default_factory=datetime.now)
+
+    @property
+    def throughput(self) -> float:
+        """Количество отправленных сообщений в секунду."""
+        return self.sent / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class BotStats:
+    """
+    Статистика бота для команды /stats.
+    Счётчики пользователей загружаются из БД одним запросом при первом обращении,
+    а затем поддерживаются инкрементально при регистрации, смене города и деактивации.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.active = 0
+        self.cities: Counter[str] = Counter()
+        self.loaded = False
+        self.broadcasts: dict[str, BroadcastStats] = {}
+
+    @staticmethod
+    async def query_user_stats(limit: int | None = None) -> tuple[int, int, list[tuple[str, int]]]:
+        """
+        Один агрегирующий запрос: количество пользователей по городам и общие итоги
+        (через оконные функции над сгруппированным результатом).
+        :param limit: сколько городов вернуть, LIMIT выполняется в SQL
+        :return: всего пользователей, активных пользователей, список (город, количество)
+        """
+        city_users = func.count(User.id)
+        active_users = func.sum(case((User.is_active.is_(True), 1), else_=0))
+        stmt = (
+            select(
+                User.city,
+                city_users,
+                func.sum(city_users).over(),
+                func.sum(active_users).over()
+            )
+            .group_by(User.city)
+            .order_by(city_users.desc())
+        )
+        if limit:
+            stmt = stmt.limit(limit)
+
+        async with async_session() as session:
+            rows = (await session.execute(stmt)).all()
+
+        if not rows:
+            return 0, 0, []
+        total, active = int(rows[0][2]), int(rows[0][3] or 0)
+        return total, active, [(city, count) for city, count, _, _ in rows]
+
+    async def load(self) -> None:
+        """Заполняет счётчики из БД."""
+        self.total, self.active, cities = await self.query_user_stats()
+        self.cities = Counter(dict(cities))
+        self.loaded = True
+
+    async def get_user_stats(self, limit: int = 10) -> tuple[int, int, list[tuple[str, int]]]:
+        """Возвращает итоги и топ городов из памяти, при отключенном кэше - прямо из БД."""
+        if not config.STATS_CACHE_ENABLED:
+            return await self.query_user_stats(limit)
+        if not self.loaded:
+            await self.load()
+        return self.total, self.active, self.cities.most_common(limit)
+
+    def on_register(self, city: str) -> None:
+        """Учитывает нового пользователя."""
+        if not self.loaded:
+            return
+        self.total += 1
+        self.active += 1
+        self.cities[city] += 1
+
+    def on_city_change(self, old_city: str, new_city: str) -> None:
+        """Переносит пользователя из одного города в другой."""
+        if not self.loaded or old_city == new_city:
+            return
+        self.cities[old_city] -= 1
+        if self.cities[old_city] <= 0:
+            del self.cities[old_city]
+        self.cities[new_city] += 1
+
+    def on_deactivate(self) -> None:
+        """Учитывает деактивацию пользователя."""
+        if self.loaded:
+            self.active = max(self.active - 1, 0)
+
+    def record_broadcast(self, stats: BroadcastStats) -> None:
+        """Сохраняет итоги последней рассылки."""
+        self.broadcasts[stats.job] = stats
+        logger.info("Рассылка %s: отправлено %s, ошибок %s, %.1f c (%.2f сообщ./с), "
+                    "макс. задержка цикла событий %.0f мс",
+                    stats.job, stats.sent, stats.failed, stats.elapsed, stats.throughput, stats.loop_lag_max * 1000)
+
+    @staticmethod
+    async def get_storage_stats() -> dict[str, Any]:
+        """Размер таблиц наблюдений и файла БД."""
+        stmt = select(
+            select(func.count(WeatherData.id)).scalar_subquery(),
+            select(func.count(WeatherDailyAggregate.id)).scalar_subquery()
+        )
+        async with async_session() as session:
+            observations, aggregates = (await session.execute(stmt)).one()
+
+        size_bytes = None
+        if engine.dialect.name == "sqlite":
+            async with engine.connect() as conn:
+                page_count = (await conn.exec_driver_sql("PRAGMA page_count")).scalar()
+                page_size = (await conn.exec_driver_sql("PRAGMA page_size")).scalar()
+            size_bytes = page_count * page_size
+
+        return {"observations": observations, "aggregates": aggregates, "size_bytes": size_bytes}
+
+
+bot_stats = BotStats()
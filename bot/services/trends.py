@@ -0,0 +1,313 @@
+"""
+Оценка тенденций погоды линейной регрессией по методу наименьших квадратов.
+
+Для каждой величины (температура, влажность, ветер) накапливаются суммы
+n, Σx, Σy, Σxy, Σx², Σy², где x - время наблюдения в сутках, y - значение:
+наблюдения недели проходятся один раз, а наклон считается по готовым суммам.
+
+Суммы за каждые сутки UTC хранятся в таблице weather_trend_days и пополняются
+при записи наблюдения, поэтому тенденция недели читается из нескольких строк
+без загрузки самих наблюдений.
+"""
+
+import logging
+import math
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Iterable
+from sqlalchemy import and_, delete, func, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from bot.database.database import async_session, engine
+from bot.database.models import WeatherData, WeatherTrendDay
+
+logger = logging.getLogger(__name__)
+
+TREND_METRICS = ("temperature", "humidity", "wind")
+# |t| >= 2 примерно соответствует 95% уверенности в том, что наклон не нулевой
+SIGNIFICANCE_T = 2.0
+_EPSILON = 1e-12
+# сутки UTC недельного окна, включая текущие; суммы тенденций хранятся только за них
+TREND_WINDOW_DAYS = 7
+# колонки weather_trend_days, которые складываются при добавлении наблюдений
+_SUM_COLUMNS = ("samples", "x_sum", "x_sq_sum",
+                *(f"{metric}_{suffix}" for metric in TREND_METRICS for suffix in ("sum", "x_sum", "sq_sum")))
+
+
+def regression_from_sums(n, sx, sy, sxy, sxx, syy):
+    """
+    Наклон, коэффициент детерминации и t-статистика наклона по суммам регрессии.
+    Работает как со скалярами, так и с массивами NumPy (для пакетного анализа).
+    :return: кортеж (наклон за сутки, R², t-статистика)
+    """
+    # NumPy импортируется при первой оценке тенденции, а не при запуске бота
+    import numpy as np
+
+    n = np.asarray(n, dtype=np.float64)
+    safe_n = np.maximum(n, 1.0)
+    sxx_c = sxx - sx * sx / safe_n
+    sxy_c = sxy - sx * sy / safe_n
+    syy_c = syy - sy * sy / safe_n
+
+    has_spread = sxx_c > _EPSILON
+    slope = np.where(has_spread, sxy_c / np.where(has_spread, sxx_c, 1.0), 0.0)
+
+    varies = has_spread & (syy_c > _EPSILON)
+    r_squared = np.where(varies, sxy_c * sxy_c / np.where(varies, sxx_c * syy_c, 1.0), 0.0)
+
+    # стандартная ошибка наклона по остаточной дисперсии, n - 2 степени свободы
+    residual = np.maximum(syy_c - slope * sxy_c, 0.0)
+    dof = np.maximum(n - 2, 1.0)
+    stderr = np.sqrt(residual / dof / np.where(has_spread, sxx_c, 1.0))
+    exact_fit = stderr <= _EPSILON * np.maximum(np.abs(slope), 1.0)
+    t_value = np.where(exact_fit, np.where(np.abs(slope) > _EPSILON, np.inf, 0.0),
+                       slope / np.where(exact_fit, 1.0, stderr))
+    t_value = np.where((n > 2) & has_spread, t_value, 0.0)
+    return slope, np.minimum(r_squared, 1.0), t_value
+
+
+@dataclass(frozen=True)
+class TrendEstimate:
+    """Оценка тенденции одной величины."""
+    slope: float
+    change: float
+    r_squared: float
+    t_value: float
+    samples: int
+
+    @property
+    def significant(self) -> bool:
+        """Наклон статистически отличим от нуля."""
+        return self.samples >= 3 and abs(self.t_value) >= SIGNIFICANCE_T
+
+
+def day_fraction(observed_at: datetime) -> float:
+    """Доля суток, прошедшая к моменту наблюдения."""
+    return (observed_at.hour * 3600 + observed_at.minute * 60 + observed_at.second) / 86400
+
+
+def day_moment(observed_at: datetime) -> float:
+    """Момент наблюдения в сутках: порядковый номер дня плюс доля суток."""
+    return observed_at.toordinal() + day_fraction(observed_at)
+
+
+class TrendAccumulator:
+    """
+    Суммы регрессии по наблюдениям одной величины.
+    Атрибуты:
+        origin (float | None): Начало отсчёта x (первое наблюдение) для численной устойчивости
+    """
+    __slots__ = ("origin", "_totals", "_first", "_last")
+
+    def __init__(self):
+        self.origin = None
+        # [n, Σx, Σy, Σxy, Σx², Σy²]
+        self._totals = [0.0] * 6
+        self._first = math.inf
+        self._last = -math.inf
+
+    def add(self, observed_at: datetime, value: float | None) -> None:
+        """Добавляет наблюдение."""
+        if value is None:
+            return
+        moment = day_moment(observed_at)
+        if self.origin is None:
+            self.origin = math.floor(moment)
+        x = moment - self.origin
+        y = float(value)
+
+        for i, term in enumerate((1.0, x, y, x * y, x * x, y * y)):
+            self._totals[i] += term
+        self._first = min(self._first, x)
+        self._last = max(self._last, x)
+
+    def add_day(self, day: date, samples: int, x_sum: float, x_sq_sum: float, x_min: float, x_max: float,
+                y_sum: float, xy_sum: float, y_sq_sum: float) -> None:
+        """Добавляет готовые суммы наблюдений одних суток (x в них - доля суток)."""
+        if not samples:
+            return
+        if self.origin is None:
+            self.origin = day.toordinal()
+        # x наблюдений суток сдвигается на offset: Σ(x+o) = Σx + n·o, Σ(x+o)² = Σx² + 2o·Σx + n·o²
+        offset = day.toordinal() - self.origin
+        terms = (samples, x_sum + samples * offset, y_sum, xy_sum + offset * y_sum,
+                 x_sq_sum + 2 * offset * x_sum + samples * offset * offset, y_sq_sum)
+        for i, term in enumerate(terms):
+            self._totals[i] += term
+        self._first = min(self._first, offset + x_min)
+        self._last = max(self._last, offset + x_max)
+
+    def estimate(self) -> TrendEstimate:
+        """Оценка тенденции по накопленным суммам."""
+        n = int(round(self._totals[0]))
+        if n == 0:
+            return TrendEstimate(0.0, 0.0, 0.0, 0.0, 0)
+        slope, r_squared, t_value = regression_from_sums(*self._totals)
+        span = self._last - self._first
+        return TrendEstimate(float(slope), float(slope) * span, float(r_squared), float(t_value), n)
+
+
+def utc_now() -> datetime:
+    """Текущее время UTC без часового пояса - в этом виде даты наблюдений хранятся в БД."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def window_start(now: datetime | None = None) -> datetime:
+    """Начало недельного окна: полночь UTC первых из TREND_WINDOW_DAYS суток, включая текущие."""
+    now = now or utc_now()
+    return datetime.combine(now.date() - timedelta(days=TREND_WINDOW_DAYS - 1), time.min)
+
+
+def _observation_sums(observed_at: datetime, values: Iterable[float]) -> dict[str, Any]:
+    """Колонки weather_trend_days для одного наблюдения (значения в порядке TREND_METRICS)."""
+    x = day_fraction(observed_at)
+    sums = {"samples": 1, "x_sum": x, "x_sq_sum": x * x, "x_min": x, "x_max": x}
+    for metric, value in zip(TREND_METRICS, values):
+        y = float(value)
+        sums[f"{metric}_sum"] = y
+        sums[f"{metric}_x_sum"] = x * y
+        sums[f"{metric}_sq_sum"] = y * y
+    return sums
+
+
+def _merge_sums(total: dict[str, Any], sums: dict[str, Any]) -> None:
+    """Добавляет суммы одного наблюдения к суммам суток."""
+    for column in _SUM_COLUMNS:
+        total[column] += sums[column]
+    total["x_min"] = min(total["x_min"], sums["x_min"])
+    total["x_max"] = max(total["x_max"], sums["x_max"])
+
+
+def _upsert_trend_day(values: dict[str, Any]):
+    """Upsert сумм суток, складывающий их с уже записанными; None - диалект без ON CONFLICT."""
+    if engine.dialect.name == "sqlite":
+        stmt = sqlite.insert(WeatherTrendDay).values(**values)
+        least, greatest = func.min, func.max
+    elif engine.dialect.name == "postgresql":
+        stmt = postgresql.insert(WeatherTrendDay).values(**values)
+        least, greatest = func.least, func.greatest
+    else:
+        return None
+
+    update = {column: getattr(WeatherTrendDay, column) + getattr(stmt.excluded, column) for column in _SUM_COLUMNS}
+    update["x_min"] = least(WeatherTrendDay.x_min, stmt.excluded.x_min)
+    update["x_max"] = greatest(WeatherTrendDay.x_max, stmt.excluded.x_max)
+    return stmt.on_conflict_do_update(index_elements=["owner_id", "city", "day"], set_=update)
+
+
+async def record_trend_observation(session: AsyncSession, owner_id: int, observed_at: datetime,
+                                   temperature: float | None, humidity: float | None,
+                                   wind: float | None) -> None:
+    """
+    Добавляет наблюдение пользователя в суммы его суток одним upsert.
+    Вызывается в транзакции, записывающей само наблюдение, поэтому суммы не расходятся со строками.
+    Наблюдения без какой-либо из величин в суммы не входят.
+    """
+    if None in (temperature, humidity, wind):
+        return
+    values = {"owner_id": owner_id, "city": "", "day": observed_at.date(),
+              **_observation_sums(observed_at, (temperature, humidity, wind))}
+    stmt = _upsert_trend_day(values)
+    if stmt is not None:
+        await session.execute(stmt)
+        return
+
+    record = (await session.execute(select(WeatherTrendDay).where(
+        WeatherTrendDay.owner_id == owner_id, WeatherTrendDay.city == "", WeatherTrendDay.day == values["day"]
+    ))).scalar_one_or_none()
+    if record is None:
+        session.add(WeatherTrendDay(**values))
+        return
+    total = {column: getattr(record, column) for column in (*_SUM_COLUMNS, "x_min", "x_max")}
+    _merge_sums(total, values)
+    for column, value in total.items():
+        setattr(record, column, value)
+
+
+async def rebuild_trend_days(since: date | None = None, until: date | None = None,
+                             city: str | None = None) -> int:
+    """
+    Пересчитывает суммы тенденций по сохранённым наблюдениям: заполнение таблицы для уже
+    накопленных данных и обновление после импорта истории.
+    :param since: первые сутки (включительно), по умолчанию начало недельного окна
+    :param until: сутки, с которых суммы не пересчитываются (исключительно), None - до текущего момента
+    :param city: только импортированная история этого города, None - все наблюдения
+    :return: количество записанных строк сумм
+    """
+    since = since or window_start().date()
+    row_filters = [WeatherData.date >= datetime.combine(since, time.min)]
+    day_filters = [WeatherTrendDay.day >= since]
+    if until is not None:
+        row_filters.append(WeatherData.date < datetime.combine(until, time.min))
+        day_filters.append(WeatherTrendDay.day < until)
+    if city is not None:
+        row_filters += [WeatherData.user_id.is_(None), WeatherData.city == city]
+        day_filters += [WeatherTrendDay.owner_id == 0, WeatherTrendDay.city == city]
+
+    async with async_session() as session:
+        rows = (await session.execute(
+            select(WeatherData.user_id, WeatherData.city, WeatherData.date,
+                   WeatherData.temperature, WeatherData.humidity, WeatherData.wind_speed)
+            .where(*row_filters)
+        )).all()
+
+        days: dict[tuple, dict[str, Any]] = {}
+        for user_id, row_city, observed_at, *values in rows:
+            if None in values:
+                continue
+            # наблюдения пользователя учитываются независимо от города, история - по городу
+            key = (user_id, "", observed_at.date()) if user_id is not None else (0, row_city or "", observed_at.date())
+            sums = _observation_sums(observed_at, values)
+            if key in days:
+                _merge_sums(days[key], sums)
+            else:
+                days[key] = sums
+
+        await session.execute(delete(WeatherTrendDay).where(*day_filters))
+        session.add_all(WeatherTrendDay(owner_id=owner_id, city=row_city, day=day, **sums)
+                        for (owner_id, row_city, day), sums in days.items())
+        await session.commit()
+    return len(days)
+
+
+async def refresh_trend_days() -> int:
+    """
+    Ночное обслуживание сумм тенденций: удаляет суммы суток, вышедших из окна,
+    и пересчитывает прошедшие сутки окна по строкам (текущие пополняются записью наблюдений).
+    :return: количество записанных строк сумм
+    """
+    today = utc_now().date()
+    async with async_session() as session:
+        await session.execute(delete(WeatherTrendDay).where(WeatherTrendDay.day < window_start().date()))
+        await session.commit()
+    written = await rebuild_trend_days(until=today)
+    logger.info("Суммы тенденций погоды пересчитаны: %s строк", written)
+    return written
+
+
+async def load_trends(session: AsyncSession, user_id: int, city: str | None,
+                      since: date) -> dict[str, TrendEstimate]:
+    """
+    Тенденции пользователя по суммам суток: собственные наблюдения и импортированная история его города.
+    Читается не больше двух строк на сутки окна, независимо от количества наблюдений.
+    :param session: открытая сессия БД
+    :param user_id: внутренний ID пользователя
+    :param city: город пользователя
+    :param since: первые сутки окна
+    :return: оценки тенденций по величинам TREND_METRICS
+    """
+    owners = WeatherTrendDay.owner_id == user_id
+    if city:
+        owners = or_(owners, and_(WeatherTrendDay.owner_id == 0, WeatherTrendDay.city == city))
+    records = (await session.execute(
+        select(WeatherTrendDay).where(owners, WeatherTrendDay.day >= since).order_by(WeatherTrendDay.day)
+    )).scalars().all()
+
+    accumulators = {metric: TrendAccumulator() for metric in TREND_METRICS}
+    for record in records:
+        for metric, accumulator in accumulators.items():
+            accumulator.add_day(record.day, record.samples, record.x_sum, record.x_sq_sum, record.x_min,
+                                record.x_max, getattr(record, f"{metric}_sum"),
+                                getattr(record, f"{metric}_x_sum"), getattr(record, f"{metric}_sq_sum"))
+    return {metric: accumulator.estimate() for metric, accumulator in accumulators.items()}
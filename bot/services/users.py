@@ -0,0 +1,56 @@
+import logging
+from sqlalchemy import update
+from sqlalchemy.future import select
+from bot.config.config import config
+from bot.database.models import User
+from bot.database.database import async_session
+from bot.services.stats import bot_stats
+from bot.utils.cache import LRUCache
+from bot.utils.logger import SAMPLED
+
+logger = logging.getLogger(__name__)
+
+# кэш зарегистрированных пользователей по Telegram ID; отсутствие пользователя не кэшируется,
+# чтобы регистрация (в том числе в другом процессе вебхука) была видна сразу
+user_cache = LRUCache(maxsize=config.USER_CACHE_SIZE, ttl=config.USER_CACHE_TTL)
+
+
+async def get_user(telegram_id: int) -> User | None:
+    """
+    Возвращает пользователя по Telegram ID, обращаясь к БД только при промахе кэша.
+    Незарегистрированный пользователь каждый раз ищется в БД.
+    :param telegram_id: ID пользователя в Telegram
+    :return: отсоединённый от сессии объект User или None, если пользователь не зарегистрирован
+    """
+    user = user_cache.get(telegram_id)
+    if user is not None:
+        return user
+
+    async with async_session() as session:
+        stmt = select(User).where(User.user_id == telegram_id)
+        result = await session.execute(stmt)
+        user = result.scalar_one_or_none()
+
+    if user is not None:
+        user_cache.set(telegram_id, user)
+    return user
+
+
+def invalidate_user(telegram_id: int) -> None:
+    """Сбрасывает запись о пользователе в кэше после изменения его данных."""
+    user_cache.pop(telegram_id)
+
+
+async def deactivate_user(telegram_id: int) -> None:
+    """Помечает пользователя неактивным (например, если он заблокировал бота)."""
+    async with async_session() as session:
+        result = await session.execute(
+            update(User).where(User.user_id == telegram_id, User.is_active.is_(True)).values(is_active=False)
+        )
+        await session.commit()
+
+    invalidate_user(telegram_id)
+    if result.rowcount:
+        bot_stats.on_deactivate()
+    # в рассылке деактивируются сразу многие пользователи - запись прореживается
+    logger.info("Пользователь %s деактивирован", telegram_id, extra=SAMPLED)
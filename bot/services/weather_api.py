@@ -1,90 +1,172 @@
+import asyncio
 import logging
-import aiohttp
 from datetime import datetime
-from bot.config.config import Config
+from typing import Any, Awaitable, Callable, Hashable
+from bot.config.config import config
+from bot.container import app
+from bot.utils import geohash
+from bot.utils.cache import LRUCache
 
 logger = logging.getLogger(__name__)
-config = Config()
+
+# ответы апи, общие для всех пользователей и всех экземпляров WeatherAPI:
+# место запрашивается один раз, сколько бы пользователей его ни сохранили.
+# Значения не изменяются вызывающим кодом - он только читает их
+weather_cache = LRUCache(maxsize=config.WEATHER_CACHE_SIZE, ttl=config.WEATHER_CACHE_TTL)
+# названия мест по ячейкам геохеша: соседние пользователи делят одну запись
+geocode_cache = LRUCache(maxsize=config.GEOCODE_CACHE_SIZE, ttl=config.GEOCODE_CACHE_TTL)
+# запросы, которые уже выполняются: одновременные обращения к тому же месту ждут их результата
+_in_flight: dict[Hashable, asyncio.Future] = {}
+_MISSING = object()
+
+
+def place_key(city: str) -> str:
+    """Ключ места для кэша: регистр и лишние пробелы в названии города не различаются."""
+    return " ".join(city.split()).casefold()
+
+
+def coordinates_cell(lat: float, lon: float) -> str:
+    """Ячейка сетки (геохеш длины GEOHASH_PRECISION), в которую попадают координаты."""
+    return geohash.encode(lat, lon, config.GEOHASH_PRECISION)
+
+
+async def _shared(key: Hashable, fetch: Callable[[], Awaitable[Any]], cache: LRUCache = weather_cache,
+                  ttl: float | None = None) -> Any:
+    """Возвращает ответ из кэша, результат уже идущего запроса или выполняет запрос сам.
+    :param ttl: время жизни ответа в кэше, если оно отличается от общего
+    """
+    cached = cache.get(key, _MISSING)
+    if cached is not _MISSING:
+        return cached
+
+    future = _in_flight.get(key)
+    if future is None:
+        future = _in_flight[key] = asyncio.ensure_future(fetch())
+        future.add_done_callback(lambda _: _in_flight.pop(key, None))
+    # shield: отмена одного ожидающего не отменяет запрос для остальных
+    result = await asyncio.shield(future)
+    # ошибки апи не кэшируются, следующий вызов повторит запрос
+    if result is not None:
+        cache.set(key, result, ttl)
+    return result
 
 
 class WeatherAPI:
     def __init__(self):
         self.api_key = config.WEATHER_API_KEY
-        self.base_url = "https://api.openweathermap.org/data/2.5"
+        self.base_url = f"{config.WEATHER_API_URL.rstrip('/')}/data/2.5"
+        self.geo_url = f"{config.WEATHER_API_URL.rstrip('/')}/geo/1.0"
 
-    async def get_current_weather(self, city: str) -> None:
-        """Получает информацию о текущей погоде по названию города"""
+    @staticmethod
+    def _location(city: str | None, lat: float | None, lon: float | None) -> tuple[Hashable, dict[str, Any]]:
+        """
+        Ключ кэша и параметры запроса места. Координаты округляются до центра ячейки геохеша:
+        все точки ячейки дают один запрос и один ответ, а одноимённые города не путаются.
+        Без координат место запрашивается по названию города.
+        """
+        if lat is not None and lon is not None:
+            cell = coordinates_cell(lat, lon)
+            cell_lat, cell_lon = geohash.center(cell)
+            return ("cell", cell), {"lat": round(cell_lat, 4), "lon": round(cell_lon, 4)}
+        return ("city", place_key(city)), {"q": city}
+
+    async def get_current_weather(self, city: str | None, lat: float | None = None,
+                                  lon: float | None = None) -> dict[str, Any] | None:
+        """Получает информацию о текущей погоде по координатам места или по названию города
+        (общий кэш на все места)"""
+        key, location = self._location(city, lat, lon)
+        return await _shared(("weather", key), lambda: self._fetch_current_weather(location))
+
+    async def _fetch_current_weather(self, location: dict[str, Any]) -> dict[str, Any] | None:
+        """Запрос текущей погоды к апи"""
         url = f"{self.base_url}/weather"
         params = {
-            "q": city,
+            **location,
             "appid": self.api_key,
             "units": "metric",
             "lang": "ru"
         }
 
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return self._parse_weather_data(data)
-                    else:
-                        error_data = await response.json()
-                        logger.error(f"Ошибка при получении данных о погоде: {error_data}")
-                        return None
-            except Exception as e:
-                logger.error(f"Ошибка при получении данных о погоде: {e}")
-                return None
+        session = await app.http()
+        try:
+            async with session.get(url, params=params) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    return self._parse_weather_data(data)
+                else:
+                    error_data = await response.json()
+                    logger.error("Ошибка при получении данных о погоде: %s", error_data)
+                    return None
+        except Exception as e:
+            logger.error("Ошибка при получении данных о погоде: %s", e)
+            return None
 
-    async def get_weather_by_coordinates(self, lat: float, lon: float) -> dict[float, float]:
+    async def get_weather_by_coordinates(self, lat: float, lon: float) -> dict[str, Any] | None:
         """Получает информацию о текущей погоде по координатам"""
-        url = f"{self.base_url}/weather"
+        return await self.get_current_weather(None, lat, lon)
+
+    async def reverse_geocode(self, lat: float, lon: float) -> str | None:
+        """Название населённого пункта по координатам (кэш по ячейкам геохеша)"""
+        key, location = self._location(None, lat, lon)
+        return await _shared(("geocode", key), lambda: self._fetch_place_name(location), cache=geocode_cache)
+
+    async def _fetch_place_name(self, location: dict[str, Any]) -> str | None:
+        """Запрос обратного геокодирования к апи: русское название, если оно есть"""
+        url = f"{self.geo_url}/reverse"
         params = {
-            "lat": lat,
-            "lon": lon,
-            "appid": self.api_key,
-            "units": "metric",
-            "lang": "ru"
+            **location,
+            "limit": 1,
+            "appid": self.api_key
         }
 
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return self._parse_weather_data(data)
-                    else:
-                        error_data = await response.json()
-                        logger.error(f"Ошибка при получении данных о погоде: {error_data}")
+        session = await app.http()
+        try:
+            async with session.get(url, params=params) as response:
+                if response.status == 200:
+                    places = await response.json()
+                    if not places:
                         return None
-            except Exception as e:
-                logger.error(f"Ошибка при получении данных о погоде: {e}")
-                return None
+                    return places[0].get("local_names", {}).get("ru") or places[0]["name"]
+                else:
+                    error_data = await response.json()
+                    logger.error("Ошибка при определении места по координатам: %s", error_data)
+                    return None
+        except Exception as e:
+            logger.error("Ошибка при определении места по координатам: %s", e)
+            return None
+
+    async def get_forecast(self, city: str | None, days: int = 7, lat: float | None = None,
+                           lon: float | None = None) -> dict[str, Any] | None:
+        """Получает прогноз погоды на несколько дней по координатам места или по названию города
+        (общий кэш на все места; прогноз обновляется раз в несколько часов и хранится FORECAST_CACHE_TTL)"""
+        key, location = self._location(city, lat, lon)
+        return await _shared(("forecast", key, days), lambda: self._fetch_forecast(location, days),
+                             ttl=config.FORECAST_CACHE_TTL)
 
-    async def get_forecast(self, city, days=7):
-        """Получает прогноз погоды на несколько дней"""
+    async def _fetch_forecast(self, location: dict[str, Any], days: int) -> dict[str, Any] | None:
+        """Запрос прогноза погоды к апи"""
         url = f"{self.base_url}/forecast"
         params = {
-            "q": city,
+            **location,
             "appid": self.api_key,
             "units": "metric",
             "lang": "ru",
             "cnt": days * 8  # Количество дней * 8 (каждые 3 часа)
         }
 
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return self._parse_forecast_data(data)
-                    else:
-                        error_data = await response.json()
-                        logger.error(f"Ошибка при получении данных о прогнозе погоды: {error_data}")
-                        return None
-            except Exception as e:
-                logger.error(f"Ошибка при получении данных о прогнозе погоды: {e}")
-                return None
+        session = await app.http()
+        try:
+            async with session.get(url, params=params) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    return self._parse_forecast_data(data)
+                else:
+                    error_data = await response.json()
+                    logger.error("Ошибка при получении данных о прогнозе погоды: %s", error_data)
+                    return None
+        except Exception as e:
+            logger.error("Ошибка при получении данных о прогнозе погоды: %s", e)
+            return None
 
     def _parse_weather_data(self, data):
         """Обрабатывает данные о погоде и возвращает информацию о текущей погоде"""
@@ -109,7 +191,7 @@ class WeatherAPI:
             }
             return weather
         except Exception as e:
-            logger.error(f"Ошибка при обработке данных о погоде: {e}")
+            logger.error("Ошибка при обработке данных о погоде: %s", e)
             return None
 
     def _parse_forecast_data(self, data):
@@ -176,5 +258,5 @@ class WeatherAPI:
             }
 
         except Exception as e:
-            logger.error(f"Ошибка при обработке данных о прогнозе погоды: {e}")
+            logger.error("Ошибка при обработке данных о прогнозе погоды: %s", e)
             return None
@@ -0,0 +1,27 @@
+import os
+
+# по умолчанию тесты работают с отдельной БД в памяти, а не с боевым файлом
+os.environ.setdefault("DB_URL", "sqlite+aiosqlite:///:memory:")
+# тяжёлая аналитика в тестах считается в том же процессе; пул процессов проверяется отдельно
+os.environ.setdefault("ANALYTICS_EXECUTOR", "inline")
+
+import pytest_asyncio
+from bot.database.database import Base, engine, setup_db
+from bot.services.analytics import weekly_analysis_cache
+from bot.services.climate import climate_baselines
+from bot.services.locations import locations_cache
+from bot.services.weather_api import geocode_cache, weather_cache
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def database():
+    """Создаёт таблицы перед тестом и удаляет их после (вместе с кэшами отчётов в памяти)."""
+    await setup_db()
+    yield
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    weekly_analysis_cache.clear()
+    climate_baselines.clear()
+    locations_cache.clear()
+    weather_cache.clear()
+    geocode_cache.clear()
@@ -0,0 +1,125 @@
+import datetime
+import random
+import pytest
+from unittest.mock import AsyncMock
+from bot.database.models import User
+from bot.database.database import async_session
+from bot.services.alerts import (AlertIndex, Subscription, add_alert, collect_weather_alerts, list_alerts,
+                                 parse_alert, remove_alerts)
+
+
+NOW = datetime.datetime(2025, 1, 10, 12, 0)
+
+
+def make_forecast(temperatures, winds=None, start=NOW):
+    """Прогноз в формате WeatherAPI.get_forecast: слоты по 3 часа начиная со start."""
+    winds = winds or [3.0] * len(temperatures)
+    days = {}
+    for i, (temp, wind) in enumerate(zip(temperatures, winds)):
+        at = start + datetime.timedelta(hours=3 * i)
+        days.setdefault(at.date(), []).append({"time": at.time(), "temperature": temp, "wind_speed": wind})
+    return {"city": "Москва", "country": "RU",
+            "forecasts": [{"date": day, "details": details} for day, details in days.items()]}
+
+
+def brute_force(subscriptions, forecast, now):
+    """Проверка каждой подписки перебором слотов - эталон для индекса."""
+    fired = set()
+    for subscription in subscriptions:
+        for day in forecast["forecasts"]:
+            for item in day["details"]:
+                at = datetime.datetime.combine(day["date"], item["time"])
+                if at > now + datetime.timedelta(hours=subscription.window_hours):
+                    continue
+                value = item["wind_speed"] if subscription.metric == "ветер" else item["temperature"]
+                if ((subscription.metric == "мороз" and value <= subscription.threshold)
+                        or (subscription.metric != "мороз" and value >= subscription.threshold)):
+                    fired.add(subscription.id)
+    return fired
+
+
+def test_index_matches_brute_force():
+    """Тест: сработавшие по индексу подписки совпадают с проверкой перебором."""
+    rng = random.Random(7)
+    temperatures = [rng.uniform(-25, 10) for _ in range(40)]
+    winds = [rng.uniform(0, 25) for _ in range(40)]
+    forecast = make_forecast(temperatures, winds)
+    subscriptions = [
+        Subscription(i, 100 + i, "Москва", rng.choice(["мороз", "жара", "ветер"]),
+                     round(rng.uniform(-25, 25), 1), rng.choice([6, 24, 48, 120]))
+        for i in range(300)
+    ]
+
+    events = AlertIndex(subscriptions).evaluate("Москва", forecast, NOW)
+
+    assert {event.subscription_id for event in events} == brute_force(subscriptions, forecast, NOW)
+
+
+def test_index_reports_first_crossing_and_peak():
+    """Тест: время первого превышения и самое опасное значение в окне подписки."""
+    forecast = make_forecast([0, -4, -11, -15, -9, -20])
+    index = AlertIndex([Subscription(1, 101, "Москва", "мороз", -10, 12)])
+
+    event, = index.evaluate("Москва", forecast, NOW)
+
+    assert event.starts_at == NOW + datetime.timedelta(hours=6)
+    # слот через 15 часов (-20°C) за пределами окна в 12 часов
+    assert event.peak == -15
+    assert event.new
+    assert "до -15.0°C" in event.describe()
+
+
+def test_repeated_event_is_not_new():
+    """Тест: о том же явлении (в пределах ALERT_REPEAT_HOURS) повторно не предупреждаем."""
+    forecast = make_forecast([-12] * 8)
+    seen = NOW - datetime.timedelta(hours=1)
+
+    repeated, = AlertIndex([Subscription(1, 101, "Москва", "мороз", -10, 24, seen)]).evaluate("Москва", forecast, NOW)
+    fresh, = AlertIndex([Subscription(1, 101, "Москва", "мороз", -10, 24, seen - datetime.timedelta(days=2))]
+                        ).evaluate("Москва", forecast, NOW)
+
+    assert not repeated.new
+    assert fresh.new
+
+
+def test_parse_alert():
+    """Тест разбора аргументов команды /alert."""
+    assert parse_alert("мороз -10") == ("мороз", -10.0, 24)
+    assert parse_alert("Ветер 15,5 6") == ("ветер", 15.5, 6)
+    with pytest.raises(ValueError):
+        parse_alert("снег 5")
+    with pytest.raises(ValueError):
+        parse_alert("жара 30 500")
+
+
+@pytest.mark.asyncio
+async def test_collect_fetches_each_city_once_and_deduplicates():
+    """Тест: прогноз города запрашивается один раз, предупреждение приходит один раз на вид и явление."""
+    async with async_session() as session:
+        users = [User(user_id=101, city="Москва"), User(user_id=102, city="Москва"), User(user_id=103, city="Сочи")]
+        session.add_all(users)
+        await session.commit()
+
+    assert await add_alert(users[0].id, "мороз", -10, 24)
+    # более строгая подписка того же вида - в сообщении останется только она
+    assert await add_alert(users[0].id, "мороз", -15, 24)
+    assert not await add_alert(users[0].id, "мороз", -15, 24)
+    assert await add_alert(users[1].id, "ветер", 20, 24)
+    assert await add_alert(users[2].id, "жара", 30, 24)
+
+    weather_api = AsyncMock()
+    weather_api.get_forecast.side_effect = lambda city, days: make_forecast([-5, -12, -16, -8])
+
+    notifications = await collect_weather_alerts(weather_api, now=NOW)
+
+    assert sorted(call.args[0] for call in weather_api.get_forecast.call_args_list) == ["Москва", "Сочи"]
+    assert list(notifications) == [101]
+    event, = notifications[101]
+    assert event.threshold == -15
+
+    # следующая проверка видит то же явление - повторного предупреждения нет
+    notifications = await collect_weather_alerts(weather_api, now=NOW + datetime.timedelta(hours=1))
+    assert notifications == {}
+
+    assert len(await list_alerts(users[0].id)) == 2
+    assert await remove_alerts(users[0].id) == 2
@@ -1,8 +1,13 @@
 import pytest
 import datetime
-from bot.database.models import User, WeatherData
+import numpy as np
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from bot.database.models import User, WeatherData, WeatherDailyAggregate
 from bot.database.database import async_session
 from bot.services.analytics import WeatherAnalytics
+from bot.services.importer import _insert_chunk
+from bot.services.trends import day_moment, load_trends, rebuild_trend_days, utc_now, window_start
 
 
 @pytest.mark.asyncio
@@ -19,10 +24,10 @@ async def test_weekly_analysis():
         # получение id пользователя
         user_id = test_user.id
 
-        # создание тестовых данных о погоде за неделю
-        now = datetime.datetime.now()
+        # создание тестовых данных о погоде за неделю (от старых наблюдений к новым)
+        now = utc_now()
         for i in range(7):
-            date = now - datetime.timedelta(days=i)
+            date = now - datetime.timedelta(days=6 - i)
             weather_data = WeatherData(
                 user_id=user_id,
                 temperature=20.0 - i,  # Температура понижается
@@ -36,9 +41,11 @@ async def test_weekly_analysis():
             session.add(weather_data)
 
         await session.commit()
+        # строки записаны напрямую, мимо сохранения наблюдений: суммы тенденций собираются пересчётом
+        await rebuild_trend_days()
 
         # получение анализа погоды
-        analysis_data = await WeatherAnalytics.get_weekly_analysis(999999)
+        analysis_data = await WeatherAnalytics.get_weekly_analysis(user_id)
 
         # проверка результатов анализа
         assert analysis_data is not None
@@ -59,4 +66,239 @@ async def test_weekly_analysis():
         await session.commit()
 
 
+def _synthetic_week(users: int, per_day: int, seed: int = 7):
+    """Случайные наблюдения за неделю: объекты для построчного анализа и те же данные колонками."""
+    rng = np.random.default_rng(seed)
+    start = datetime.datetime(2025, 4, 1, 6, 0)
+    observations = {}
+    for user_id in range(1, users + 1):
+        days = rng.integers(1, 8)
+        observations[user_id] = [
+            SimpleNamespace(date=start + datetime.timedelta(days=day, hours=3 * k),
+                            temperature=float(rng.normal(10, 5)),
+                            humidity=float(rng.integers(30, 95)),
+                            wind_speed=float(rng.uniform(0, 12)))
+            for day in range(days) for k in range(rng.integers(1, per_day + 1))
+        ]
+    return observations
+
+
+def test_weekly_analysis_arrays_matches_per_user_loop():
+    """Тест: векторизованный анализ даёт тот же отчёт, что и анализ по одному пользователю."""
+    observations = _synthetic_week(users=50, per_day=3)
+    flat = [(user_id, item) for user_id, items in observations.items() for item in items]
+    owners = np.array([user_id for user_id, _ in flat])
+    times = np.array([day_moment(item.date) for _, item in flat])
+    temperature = np.array([item.temperature for _, item in flat])
+    humidity = np.array([item.humidity for _, item in flat])
+    wind = np.array([item.wind_speed for _, item in flat])
+    cities = {user_id: f"Город {user_id}" for user_id in observations}
+
+    batch = WeatherAnalytics._analyze_weekly_arrays(owners, times, temperature, humidity, wind, cities)
+
+    for user_id, items in observations.items():
+        expected = WeatherAnalytics._analyze_weekly_data(items, cities[user_id])
+        actual = batch[user_id]
+        if expected is None:
+            assert actual is None
+            continue
+        assert actual["period"] == expected["period"]
+        assert actual["daily_analysis"] == pytest.approx(expected["daily_analysis"])
+        assert (actual["trends"] is None) == (expected["trends"] is None)
+        if expected["trends"]:
+            for metric in ("temperature", "humidity", "wind"):
+                for key in ("value", "slope", "r_squared"):
+                    assert actual["trends"][metric][key] == pytest.approx(expected["trends"][metric][key])
+                assert actual["trends"][metric]["description"] == expected["trends"][metric]["description"]
+
+
+@pytest.mark.asyncio
+async def test_weekly_analysis_cached_until_new_observation():
+    """Тест: повторный запрос отчёта отдаётся из кэша, новое наблюдение его сбрасывает."""
+    now = datetime.datetime.now()
+    async with async_session() as session:
+        user = User(user_id=100003, city="Пермь")
+        session.add(user)
+        await session.commit()
+        for i in range(3):
+            session.add(WeatherData(user_id=user.id, city="Пермь", temperature=5.0 + i, feels_like=5.0,
+                                    pressure=1000, humidity=70, wind_speed=1.0, description="пасмурно",
+                                    date=now - datetime.timedelta(days=3 - i)))
+        await session.commit()
+
+    first = await WeatherAnalytics.get_weekly_analysis(user.id)
+    second = await WeatherAnalytics.get_weekly_analysis(user.id)
+    assert second is first
+
+    await WeatherAnalytics.save_weather_data_for_week_analysis(user.id, {
+        "temperature": 9.0, "feels_like": 8.0, "pressure": 1000, "humidity": 70,
+        "wind_speed": 1.0, "description": "ясно"
+    }, "Пермь")
+    third = await WeatherAnalytics.get_weekly_analysis(user.id)
+
+    assert third is not first
+    assert third["daily_analysis"] != first["daily_analysis"]
+
+
+@pytest.mark.asyncio
+async def test_weekly_trends_include_rows_saved_elsewhere():
+    """Тест: тенденции учитывают строки недели, записанные не этим процессом (импорт, другой воркер)."""
+    now = utc_now()
+    async with async_session() as session:
+        user = User(user_id=100009, city="Ярославль")
+        session.add(user)
+        await session.commit()
+        for i in range(3):
+            session.add(WeatherData(user_id=user.id, city="Ярославль", temperature=10.0, feels_like=10.0,
+                                    pressure=1000, humidity=70, wind_speed=2.0, description="ясно",
+                                    date=now - datetime.timedelta(days=6 - i)))
+        await session.commit()
+    await rebuild_trend_days()
+
+    first = await WeatherAnalytics.get_weekly_analysis(user.id)
+    assert first["trends"]["temperature"]["description"] == "стабильность"
+
+    # импортированная история города: строки без пользователя, суммы их суток пополняет импорт
+    await _insert_chunk([
+        {"city": "Ярославль", "date": now - datetime.timedelta(days=2 - i, hours=1), "temperature": 15.0 + 3 * i,
+         "feels_like": 15.0, "pressure": 1000, "humidity": 70, "wind_speed": 2.0, "description": "clear sky"}
+        for i in range(3)
+    ])
+
+    second = await WeatherAnalytics.get_weekly_analysis(user.id)
+    assert second["trends"]["temperature"]["description"] == "повышение"
+
+
+@pytest.mark.asyncio
+async def test_trend_sums_match_rows():
+    """Тест: тенденции из сумм суток, пополняемых при сохранении, совпадают с регрессией по строкам недели."""
+    async with async_session() as session:
+        user = User(user_id=100010, city="Тверь")
+        session.add(user)
+        await session.commit()
+
+    start = window_start()
+    rng = np.random.default_rng(3)
+    for step in range(20):
+        observed_at = start + datetime.timedelta(hours=7 * step + 5, minutes=int(rng.integers(0, 60)))
+        weather = {"temperature": float(rng.normal(10, 4)) + 0.5 * step, "feels_like": 9.0, "pressure": 1000,
+                   "humidity": int(rng.integers(40, 90)), "wind_speed": float(rng.uniform(0, 8)),
+                   "description": "ясно"}
+        with patch("bot.services.analytics.utc_now", return_value=observed_at):
+            await WeatherAnalytics.save_weather_data_for_week_analysis(user.id, weather, "Тверь")
+
+    async with async_session() as session:
+        rows = (await session.execute(WeatherData.__table__.select().order_by(WeatherData.date))).all()
+        from_sums = await load_trends(session, user.id, "Тверь", start.date())
+    from_rows = WeatherAnalytics._estimate_trends(rows)
+
+    for metric, estimate in from_rows.items():
+        assert from_sums[metric].samples == estimate.samples == 20
+        assert from_sums[metric].slope == pytest.approx(estimate.slope)
+        assert from_sums[metric].change == pytest.approx(estimate.change)
+        assert from_sums[metric].t_value == pytest.approx(estimate.t_value)
+
+    # пересчёт по строкам даёт те же суммы, что и пополнение при сохранении
+    await rebuild_trend_days()
+    async with async_session() as session:
+        rebuilt = await load_trends(session, user.id, "Тверь", start.date())
+    assert rebuilt["temperature"].slope == pytest.approx(from_sums["temperature"].slope)
+
+
+@pytest.mark.asyncio
+async def test_weekly_analysis_with_forecast_reuses_loaded_user():
+    """Тест: переданный пользователь не загружается повторно, история и прогноз запрашиваются вместе."""
+    now = datetime.datetime.now()
+    async with async_session() as session:
+        user = User(user_id=100004, city="Сочи")
+        session.add(user)
+        await session.commit()
+        for i in range(3):
+            session.add(WeatherData(user_id=user.id, city="Сочи", temperature=20.0 + i, feels_like=20.0,
+                                    pressure=1010, humidity=60, wind_speed=3.0, description="ясно",
+                                    date=now - datetime.timedelta(days=2 - i)))
+        await session.commit()
+
+    weather_api = SimpleNamespace(get_forecast=AsyncMock(return_value=None))
+    with patch.object(WeatherAnalytics, "_load_user", AsyncMock()) as load_user:
+        result = await WeatherAnalytics.get_weekly_analysis_with_forecast(user, weather_api)
+
+    load_user.assert_not_awaited()
+    weather_api.get_forecast.assert_awaited_once_with("Сочи", days=5, lat=None, lon=None)
+    assert result["city"] == "Сочи"
+    assert len(result["past_week"]["daily_analysis"]) == 3
+    assert result["next_week_forecast"] is None
+
+
+@pytest.mark.asyncio
+async def test_city_weekly_reports_once_per_city():
+    """Тест: отчёт и прогноз считаются один раз на город, наблюдения всех его пользователей общие."""
+    now = datetime.datetime.now()
+    async with async_session() as session:
+        first = User(user_id=100005, city="Омск")
+        second = User(user_id=100006, city="Омск")
+        third = User(user_id=100007, city="Тула")
+        session.add_all([first, second, third])
+        await session.commit()
+        for i in range(4):
+            owner = first if i % 2 else second
+            session.add(WeatherData(user_id=owner.id, city="Омск", temperature=-5.0 + 2 * i, feels_like=-8.0,
+                                    pressure=1020, humidity=80, wind_speed=4.0, description="снег",
+                                    date=now - datetime.timedelta(days=3 - i)))
+        await session.commit()
+
+    weather_api = SimpleNamespace(get_forecast=AsyncMock(return_value=None))
+    reports = await WeatherAnalytics.get_city_weekly_reports(["Омск", "Омск", "Тула"], weather_api)
+
+    assert set(reports) == {"Омск", "Тула"}
+    assert weather_api.get_forecast.await_count == 2
+    assert len(reports["Омск"]["past_week"]["daily_analysis"]) == 4
+    assert reports["Омск"]["past_week"]["trends"]["temperature"]["description"] == "повышение"
+    assert reports["Тула"]["past_week"] is None
+
+
+@pytest.mark.asyncio
+async def test_monthly_and_seasonal_reports_from_sql():
+    """Тест долгосрочных отчётов: дневные агрегаты и сырые наблюдения сводятся по месяцам и сезонам в БД."""
+    today = datetime.date.today()
+    month_index = today.year * 12 + today.month - 1 - 3
+    old_month = datetime.date(month_index // 12, month_index % 12 + 1, 1)
+    async with async_session() as session:
+        user = User(user_id=100008, city="Тверь")
+        session.add(user)
+        await session.commit()
+        for day in range(10):
+            session.add(WeatherDailyAggregate(
+                user_id=None, city="Тверь", date=old_month + datetime.timedelta(days=day), samples=4,
+                temperature_avg=float(day + 1), temperature_min=day - 2.0, temperature_max=day + 5.0,
+                rainy_samples=1 if day < 3 else 0
+            ))
+        # агрегат другого пользователя за тот же день объединяется с городским (взвешенно по числу наблюдений)
+        session.add(WeatherDailyAggregate(user_id=user.id, city="Тверь", date=old_month, samples=4,
+                                          temperature_avg=1.0, temperature_min=-1.0, temperature_max=3.0))
+        now = datetime.datetime.now()
+        for temp in (18.0, 22.0):
+            session.add(WeatherData(user_id=user.id, city="Тверь", temperature=temp, feels_like=temp,
+                                    pressure=1000, humidity=50, wind_speed=1.0, description="небольшой дождь",
+                                    date=now))
+        await session.commit()
+
+    monthly = await WeatherAnalytics.get_monthly_report("Тверь")
+
+    assert [(entry["year"], entry["month"]) for entry in monthly] == [
+        (old_month.year, old_month.month), (now.year, now.month)
+    ]
+    old, current = monthly
+    assert old["days"] == 10
+    assert old["avg_temp"] == 5.5
+    assert (old["min_temp"], old["max_temp"]) == (-2.0, 14.0)
+    assert (old["p10"], old["p50"], old["p90"]) == (1.0, 5.0, 9.0)
+    assert old["rainy_days"] == 3
+    assert current["days"] == 1
+    assert current["avg_temp"] == 20.0
+    assert current["rainy_days"] == 1
 
+    seasonal = await WeatherAnalytics.get_seasonal_report("Тверь")
+    assert sum(entry["days"] for entry in seasonal) == 11
+    assert all(entry["season"] in ("зима", "весна", "лето", "осень") for entry in seasonal)
+    assert await WeatherAnalytics.get_monthly_report("Неизвестный город") == []
@@ -0,0 +1,72 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from bot.handlers.registration import process_city, process_location
+from bot.services.cities import City, CityIndex, get_city_index, normalize_city
+
+
+def test_normalize_transliteration():
+    """Тест: кириллица, латиница, регистр, «ё» и дефисы приводятся к одному ключу."""
+    assert normalize_city("Санкт-Петербург") == normalize_city("sankt peterburg")
+    assert normalize_city("Орёл") == normalize_city("Oryol") == normalize_city("орел")
+    assert normalize_city("Нижний Новгород") == normalize_city("Nizhniy Novgorod")
+
+
+def test_resolve_and_suggest():
+    """Тест: точное совпадение, подсказки по началу названия (крупные выше) и с опечаткой."""
+    index = CityIndex([
+        City("Москва", "Moscow", "RU", 13000000),
+        City("Мосальск", "Mosalsk", "RU", 4000),
+        City("Тамбов", "Tambov", "RU", 260000),
+    ])
+    assert index.resolve(" moscow ").name == "Москва"
+    assert index.resolve("Моск") is None
+    assert [city.name for city in index.suggest("мос")] == ["Москва", "Мосальск"]
+    assert [city.name for city in index.suggest("тамбв")] == ["Тамбов"]
+    assert index.suggest("xyz") == []
+
+
+def test_bundled_index():
+    """Тест: справочник из bot/data загружается и находит крупные города."""
+    index = get_city_index()
+    assert index.resolve("Екатеринбург").name_en == "Yekaterinburg"
+    assert index.suggest("масква")[0].name == "Москва"
+
+
+@pytest.mark.asyncio
+async def test_typo_suggests_without_api_call():
+    """Тест: при опечатке бот предлагает варианты и не обращается к апи погоды."""
+    message = MagicMock(text="Масква", answer=AsyncMock())
+    with patch("bot.handlers.registration.weather_api") as weather_api:
+        await process_city(message, AsyncMock())
+
+    weather_api.get_current_weather.assert_not_called()
+    keyboard = message.answer.await_args.kwargs["reply_markup"]
+    assert keyboard.inline_keyboard[0][0].callback_data == "city:Москва"
+
+
+@pytest.mark.asyncio
+async def test_known_city_checked_once():
+    """Тест: город из справочника сохраняется под каноническим названием после одного запроса к апи."""
+    message = MagicMock(text="moskva", answer=AsyncMock())
+    message.from_user = MagicMock(id=101, username="user", first_name="Имя", last_name=None)
+    with patch("bot.handlers.registration.weather_api") as weather_api:
+        weather_api.get_current_weather = AsyncMock(return_value={"lat": 55.75, "lon": 37.62})
+        await process_city(message, AsyncMock())
+
+    weather_api.get_current_weather.assert_awaited_once_with("Москва", None, None)
+    assert "Москва" in message.answer.await_args.args[0]
+
+
+@pytest.mark.asyncio
+async def test_location_registration_uses_coordinates():
+    """Тест: при регистрации по местоположению город определяется по координатам, погода - по ним же."""
+    message = MagicMock(text=None, answer=AsyncMock())
+    message.location = MagicMock(latitude=55.7512, longitude=37.6184)
+    message.from_user = MagicMock(id=102, username="user", first_name="Имя", last_name=None)
+    with patch("bot.handlers.registration.weather_api") as weather_api:
+        weather_api.reverse_geocode = AsyncMock(return_value="Москва")
+        weather_api.get_current_weather = AsyncMock(return_value={"lat": 55.74, "lon": 37.64})
+        await process_location(message, AsyncMock())
+
+    weather_api.get_current_weather.assert_awaited_once_with("Москва", 55.7512, 37.6184)
+    assert "Москва" in message.answer.await_args.args[0]
@@ -0,0 +1,82 @@
+import datetime
+import pytest
+from sqlalchemy.future import select
+from bot.database.models import ClimateBaseline, ClimateBaselineProgress, User, WeatherData, WeatherDailyAggregate
+from bot.database.database import async_session
+from bot.services.climate import ClimateBaselines, climate_baselines, day_of_year, rebuild_climate_baselines
+
+
+def test_day_of_year_ignores_leap_day():
+    """Тест: 29 февраля совпадает с 28 февраля, дальше нумерация как в обычном году."""
+    assert day_of_year(datetime.date(2024, 2, 29)) == day_of_year(datetime.date(2023, 2, 28))
+    assert day_of_year(datetime.date(2024, 3, 1)) == day_of_year(datetime.date(2023, 3, 1)) == 60
+    assert day_of_year(datetime.date(2024, 12, 31)) == 365
+
+
+@pytest.mark.asyncio
+async def test_rebuild_baselines_incrementally_and_score_anomaly():
+    """Тест: норма строится по истории, новые дни добавляются при следующем пересчёте."""
+    today = datetime.date.today()
+    async with async_session() as session:
+        # два прошлых года вокруг сегодняшнего дня: температура 10 и 14 градусов
+        for years_ago, temperature in ((1, 10.0), (2, 14.0)):
+            center = today.replace(year=today.year - years_ago, day=min(today.day, 28))
+            for offset in range(-10, 11):
+                session.add(WeatherDailyAggregate(city="Самара", date=center + datetime.timedelta(days=offset),
+                                                  samples=4, temperature_avg=temperature))
+        await session.commit()
+
+    stats = await rebuild_climate_baselines(window_days=15)
+
+    assert stats.cities == 1
+    assert stats.days_added == 42
+    baseline = climate_baselines.get("Самара", today)
+    assert baseline.mean == pytest.approx(12.0)
+    assert baseline.std == pytest.approx(2.0)
+    anomaly = climate_baselines.anomaly("Самара", today, 19.0)
+    assert anomaly.delta == 7.0
+    assert anomaly.z_score == 3.5
+    assert anomaly.describe() == "+7.0°C к норме"
+    assert climate_baselines.anomaly("Самара", today, 12.4).describe() == "в пределах нормы"
+    assert climate_baselines.get("Неизвестный город", today) is None
+
+    # вчерашнее наблюдение пользователя учитывается следующим запуском, старые дни повторно не читаются
+    async with async_session() as session:
+        user = User(user_id=100009, city="Самара")
+        session.add(user)
+        await session.commit()
+        session.add(WeatherData(user_id=user.id, city="Самара", temperature=12.0, feels_like=12.0, pressure=1000,
+                                humidity=50, wind_speed=1.0, description="ясно",
+                                date=datetime.datetime.combine(today - datetime.timedelta(days=1),
+                                                               datetime.time(12))))
+        # сегодняшний день ещё не закончился и в норму не попадает
+        session.add(WeatherData(user_id=user.id, city="Самара", temperature=40.0, feels_like=40.0, pressure=1000,
+                                humidity=50, wind_speed=1.0, description="ясно",
+                                date=datetime.datetime.combine(today, datetime.time(0, 30))))
+        await session.commit()
+
+    stats = await rebuild_climate_baselines(window_days=15)
+
+    assert stats.days_added == 1
+    async with async_session() as session:
+        progress = (await session.execute(select(ClimateBaselineProgress))).scalar_one()
+        samples = sum((await session.execute(select(ClimateBaseline.samples))).scalars().all())
+    assert progress.last_day == today - datetime.timedelta(days=1)
+    assert samples == 43
+
+
+@pytest.mark.asyncio
+async def test_baselines_reloaded_after_rebuild_elsewhere():
+    """Тест: нормы, пересчитанные другим процессом, перечитываются по истечении reload_after."""
+    today = datetime.date.today()
+    baselines = ClimateBaselines(reload_after=0)
+    await baselines.ensure_loaded()
+    assert baselines.get("Пермь", today) is None
+
+    async with async_session() as session:
+        session.add(ClimateBaseline(city="Пермь", day_of_year=day_of_year(today), samples=30,
+                                    window_samples=30, temperature_mean=5.0, temperature_std=1.0))
+        await session.commit()
+
+    await baselines.ensure_loaded()
+    assert baselines.get("Пермь", today).mean == 5.0
@@ -0,0 +1,26 @@
+import sys
+import pytest
+from bot.utils.event_loop import loop_factory, loop_name, run_loop
+
+
+def test_uvloop_falls_back_to_asyncio(monkeypatch):
+    """Тест: без установленного uvloop бот запускается на стандартном цикле asyncio."""
+    monkeypatch.setitem(sys.modules, "uvloop", None)
+
+    async def current_loop():
+        return loop_name()
+
+    assert run_loop(current_loop(), "uvloop") == "asyncio"
+    with pytest.raises(ValueError):
+        loop_factory("trio")
+
+
+def test_uvloop_runner():
+    """Тест: EVENT_LOOP выбирает цикл, даже если aiogram уже включил uvloop политикой asyncio."""
+    pytest.importorskip("uvloop")
+
+    async def current_loop():
+        return loop_name()
+
+    assert run_loop(current_loop(), "uvloop") == "uvloop"
+    assert run_loop(current_loop(), "asyncio") == "asyncio"
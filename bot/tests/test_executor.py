@@ -0,0 +1,75 @@
+import asyncio
+import time
+import numpy as np
+import pytest
+from bot.services.analytics import WeatherAnalytics
+from bot.utils.executor import AnalyticsRunner
+from bot.utils.loop_lag import LoopLagMonitor
+
+
+def _sample_arrays():
+    owners = np.repeat(np.array([1, 2]), 8)
+    times = np.tile(739000 + np.arange(8) * 0.75, 2)
+    temperature = np.concatenate([10.0 + np.arange(8), np.full(8, 5.0)])
+    humidity = np.full(16, 70.0)
+    wind = np.linspace(1.0, 4.0, 16)
+    return owners, times, temperature, humidity, wind
+
+
+@pytest.mark.asyncio
+async def test_process_runner_matches_inline():
+    """Тест: пакетный анализ в пуле процессов даёт тот же результат, что и в цикле событий."""
+    arrays = _sample_arrays()
+    cities = {1: "Москва", 2: "Казань"}
+
+    inline = await AnalyticsRunner("inline").run(WeatherAnalytics._analyze_weekly_arrays, *arrays, cities)
+    runner = AnalyticsRunner("process", workers=1)
+    try:
+        pooled = await runner.run(WeatherAnalytics._analyze_weekly_arrays, *arrays, cities)
+    finally:
+        runner.shutdown()
+
+    assert pooled == inline
+    assert pooled[1]["city"] == "Москва"
+
+
+def test_runner_rejects_unknown_kind():
+    """Тест: неизвестный тип пула - ошибка конфигурации."""
+    with pytest.raises(ValueError):
+        AnalyticsRunner("gpu")
+
+
+@pytest.mark.asyncio
+async def test_loop_lag_monitor_sees_blocking_call():
+    """Тест: блокирующий вызов в цикле событий виден как задержка."""
+    monitor = LoopLagMonitor(interval=0.01)
+    monitor.start()
+    await asyncio.sleep(0.03)
+    time.sleep(0.2)
+    await asyncio.sleep(0.03)
+    await monitor.stop()
+
+    assert monitor.peak >= 0.15
+    assert monitor.percentile(100) == monitor.peak
+    assert monitor.reset_peak() >= 0.15
+    assert monitor.peak == 0.0
+
+
+@pytest.mark.asyncio
+async def test_pooled_analysis_matches_single_pass(monkeypatch):
+    """Тест: анализ частями по нескольку пользователей совпадает с анализом одним проходом."""
+    from bot.services import analytics
+    owners, times, temperature, humidity, wind = _sample_arrays()
+    # перемешанные строки нескольких пользователей, как их возвращает БД
+    owners = np.concatenate([owners, owners + 2])
+    times, temperature, humidity, wind = (np.concatenate([column, column]) for column in (times, temperature,
+                                                                                            humidity, wind))
+    shuffle = np.random.default_rng(1).permutation(owners.size)
+    arrays = tuple(column[shuffle] for column in (owners, times, temperature, humidity, wind))
+    cities = {1: "Москва", 2: "Казань", 3: "Тверь", 4: "Омск"}
+
+    monkeypatch.setattr(analytics.config, "ANALYTICS_CHUNK_USERS", 3)
+    pooled = await WeatherAnalytics._analyze_weekly_pooled(*arrays, cities)
+
+    assert pooled == WeatherAnalytics._analyze_weekly_arrays(*arrays, cities)
+    assert set(pooled) == {1, 2, 3, 4}
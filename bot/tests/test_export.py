@@ -0,0 +1,56 @@
+import pytest
+import gzip
+import json
+import datetime
+from bot.database.models import User, WeatherData
+from bot.database.database import async_session
+from bot.services.export import export_weather_data
+
+
+async def _create_history(rows: int):
+    async with async_session() as session:
+        moscow = User(user_id=1, city="Москва")
+        kazan = User(user_id=2, city="Казань")
+        session.add_all([moscow, kazan])
+        await session.commit()
+
+        start = datetime.datetime(2025, 1, 1, 12, 0)
+        for i in range(rows):
+            session.add(WeatherData(user_id=moscow.id if i % 2 == 0 else kazan.id, temperature=float(i),
+                                    feels_like=float(i), pressure=1000, humidity=50, wind_speed=1.0,
+                                    description="облачно", date=start + datetime.timedelta(days=i)))
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_export_csv_with_filters(tmp_path):
+    """Тест выгрузки в CSV с фильтром по городу и датам."""
+    await _create_history(10)
+
+    result = await export_weather_data(tmp_path, fmt="csv", city="Москва",
+                                       date_from=datetime.date(2025, 1, 3),
+                                       date_to=datetime.date(2025, 1, 7), chunk_rows=2)
+
+    assert result.rows == 3  # 3, 5 и 7 января
+    with gzip.open(result.files[0], "rt", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert lines[0].startswith("id,user_id,city,date")
+    assert len(lines) == 4
+    assert all(",Москва," in line for line in lines[1:])
+
+
+@pytest.mark.asyncio
+async def test_export_ndjson_parts(tmp_path):
+    """Тест выгрузки в NDJSON с разбиением на части."""
+    await _create_history(20)
+
+    result = await export_weather_data(tmp_path, fmt="ndjson", part_size=1, chunk_rows=5)
+
+    assert result.rows == 20
+    assert len(result.files) == 4
+    records = []
+    for path in result.files:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            records.extend(json.loads(line) for line in f)
+    assert [record["temperature"] for record in records] == [float(i) for i in range(20)]
+    assert records[0]["date"] == "2025-01-01T12:00:00"
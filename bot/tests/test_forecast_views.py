@@ -0,0 +1,67 @@
+import datetime
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from aiogram.types import InaccessibleMessage, Message
+from bot.database.database import async_session
+from bot.database.models import User
+from bot.handlers.weather import get_weather_forecast, switch_forecast_view
+from bot.keyboards.inline import ForecastCallback
+from bot.services.weather_api import WeatherAPI
+
+
+def make_forecast(days: int = 5) -> dict:
+    """Прогноз в формате WeatherAPI.get_forecast на несколько дней."""
+    today = datetime.date.today()
+    return {"city": "Moscow", "country": "RU", "forecasts": [
+        {"date": today + datetime.timedelta(days=i), "avg_temp": 10.0 + i, "min_temp": 5.0, "max_temp": 15.0,
+         "avg_humidity": 70, "avg_wind": 3.0, "description": "облачно",
+         "details": [{"time": datetime.time(hour), "temperature": 10.0 + i, "description": "облачно"}
+                     for hour in (9, 12)]}
+        for i in range(days)
+    ]}
+
+
+def make_callback(data: str, text: str) -> MagicMock:
+    return MagicMock(data=data, answer=AsyncMock(), message=MagicMock(spec=Message, text=text, edit_text=AsyncMock()))
+
+
+@pytest.mark.asyncio
+async def test_forecast_views_reuse_cached_forecast():
+    """Тест: переключение дней прогноза редактирует сообщение без новых запросов к апи."""
+    async with async_session() as session:
+        user = User(user_id=201, city="Москва")
+        session.add(user)
+        await session.commit()
+
+    message = MagicMock(answer=AsyncMock())
+    with patch.object(WeatherAPI, "_fetch_forecast", AsyncMock(return_value=make_forecast())) as fetch:
+        await get_weather_forecast(message, user)
+        full_text = message.answer.await_args.args[0]
+        keyboard = message.answer.await_args.kwargs["reply_markup"]
+        assert [button.callback_data for button in keyboard.inline_keyboard[0]] == \
+               ["forecast:today:0", "forecast:tomorrow:0"]
+
+        tomorrow = make_callback("forecast:tomorrow:0", full_text)
+        await switch_forecast_view(tomorrow, ForecastCallback.unpack(tomorrow.data), user)
+        # та же кнопка ещё раз - сообщение не меняется
+        same = make_callback("forecast:5days:0", full_text)
+        await switch_forecast_view(same, ForecastCallback.unpack(same.data), user)
+
+    assert fetch.await_count == 1
+    text = tomorrow.message.edit_text.await_args.args[0]
+    assert "на завтра" in text and "🕒 09:00" in text
+    assert (datetime.date.today() + datetime.timedelta(days=1)).strftime("%d.%m") in text
+    same.message.edit_text.assert_not_awaited()
+    same.answer.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_forecast_view_on_inaccessible_message():
+    """Тест: кнопка под удалённым или старым сообщением получает ответ вместо ошибки."""
+    callback = MagicMock(data="forecast:today:0", answer=AsyncMock(),
+                         message=InaccessibleMessage(chat={"id": 201, "type": "private"}, message_id=1))
+
+    await switch_forecast_view(callback, ForecastCallback.unpack(callback.data), User(user_id=201, city="Москва"))
+
+    callback.answer.assert_awaited_once()
+    assert "устарело" in callback.answer.await_args.args[0]
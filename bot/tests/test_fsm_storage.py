@@ -0,0 +1,96 @@
+import pytest
+from datetime import datetime, timedelta
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from sqlalchemy import update
+from bot.database.database import async_session
+from bot.database.models import FSMRecord
+from bot.database.storage import DatabaseStorage, delete_expired_states
+from bot.handlers.registration import RegistrationForm
+
+
+KEY = StorageKey(bot_id=1, chat_id=101, user_id=101)
+
+
+@pytest.mark.asyncio
+async def test_state_survives_restart():
+    """Тест: состояние и данные, записанные одним хранилищем, видны новому (перезапуск или другой процесс)."""
+    storage = DatabaseStorage()
+    context = FSMContext(storage=storage, key=KEY)
+    await context.set_state(RegistrationForm.waiting_for_city)
+    await context.update_data(city="Москва")
+
+    restarted = FSMContext(storage=DatabaseStorage(), key=KEY)
+    assert await restarted.get_state() == RegistrationForm.waiting_for_city.state
+    assert await restarted.get_data() == {"city": "Москва"}
+
+    # изменения вызывающего кода не попадают в кэш хранилища
+    data = await context.get_data()
+    data["city"] = "Казань"
+    assert await context.get_data() == {"city": "Москва"}
+
+    await context.clear()
+    assert await DatabaseStorage().get_state(KEY) is None
+    assert await DatabaseStorage().get_data(KEY) == {}
+
+
+@pytest.mark.asyncio
+async def test_expired_state_ignored_and_cleaned():
+    """Тест: брошенное состояние не возвращается и удаляется очисткой вместе с пустыми записями."""
+    storage = DatabaseStorage(state_ttl=3600, cache_ttl=0)
+    await storage.set_state(KEY, RegistrationForm.waiting_for_city)
+    other = StorageKey(bot_id=1, chat_id=102, user_id=102)
+    await storage.set_state(other, RegistrationForm.waiting_for_city)
+    await storage.set_state(other, None)
+
+    async with async_session() as session:
+        await session.execute(
+            update(FSMRecord).where(FSMRecord.key.startswith("1:101:"))
+            .values(updated_at=datetime.utcnow() - timedelta(hours=2))
+        )
+        await session.commit()
+
+    assert await storage.get_state(KEY) is None
+    assert await delete_expired_states(state_ttl=3600) == 2
+
+
+@pytest.mark.asyncio
+async def test_write_to_expired_record_does_not_revive_other_column():
+    """Тест: запись состояния в брошенную запись сбрасывает её данные, запись данных - состояние."""
+    storage = DatabaseStorage(state_ttl=3600)
+    other = StorageKey(bot_id=1, chat_id=102, user_id=102)
+    for key in (KEY, other):
+        await storage.set_state(key, RegistrationForm.waiting_for_city)
+        await storage.set_data(key, {"city": "Москва"})
+
+    async with async_session() as session:
+        await session.execute(update(FSMRecord).values(updated_at=datetime.utcnow() - timedelta(hours=2)))
+        await session.commit()
+    assert await DatabaseStorage(state_ttl=3600).get_state(KEY) is None
+
+    # запись идёт через хранилище, в кэше которого записи ещё действующие
+    await storage.set_state(KEY, RegistrationForm.waiting_for_city)
+    await storage.set_data(other, {"city": "Казань"})
+
+    # и кэш записавшего хранилища, и БД получают сброшенную другую колонку
+    for current in (storage, DatabaseStorage(state_ttl=3600)):
+        assert await current.get_state(KEY) == RegistrationForm.waiting_for_city.state
+        assert await current.get_data(KEY) == {}
+        assert await current.get_state(other) is None
+        assert await current.get_data(other) == {"city": "Казань"}
+
+    # у действующей записи другая колонка сохраняется
+    await storage.set_data(KEY, {"city": "Уфа"})
+    assert await DatabaseStorage().get_state(KEY) == RegistrationForm.waiting_for_city.state
+
+
+@pytest.mark.asyncio
+async def test_reads_served_from_cache():
+    """Тест: повторное чтение в пределах cache_ttl не обращается к БД."""
+    storage = DatabaseStorage(cache_ttl=60)
+    await storage.set_state(KEY, RegistrationForm.waiting_for_city)
+
+    async with async_session() as session:
+        await session.execute(update(FSMRecord).values(state=None))
+        await session.commit()
+    assert await storage.get_state(KEY) == RegistrationForm.waiting_for_city.state
@@ -0,0 +1,66 @@
+import pytest
+import json
+import datetime
+from sqlalchemy.future import select
+from bot.database.models import User, WeatherData
+from bot.database.database import async_session
+from bot.services.analytics import WeatherAnalytics
+from bot.services.importer import import_owm_history
+
+
+def _owm_record(timestamp: datetime.datetime, temperature: float) -> dict:
+    """Запись в формате архива OWM History Bulk."""
+    return {
+        "dt": int(timestamp.replace(tzinfo=datetime.timezone.utc).timestamp()),
+        "main": {"temp": temperature, "feels_like": temperature - 1, "pressure": 1012, "humidity": 70},
+        "wind": {"speed": 3.5, "deg": 180},
+        "weather": [{"id": 500, "main": "Rain", "description": "light rain", "icon": "10d"}],
+    }
+
+
+@pytest.mark.asyncio
+async def test_import_json_skips_duplicates(tmp_path):
+    """Тест загрузки архива JSON: повторная загрузка не создаёт дубликатов."""
+    start = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None, minute=0, second=0, microsecond=0)
+    records = [_owm_record(start - datetime.timedelta(hours=6 * i), 10.0 + i) for i in range(20)]
+    path = tmp_path / "history.json"
+    path.write_text(json.dumps(records), encoding="utf-8")
+
+    stats = await import_owm_history(path, "Москва", chunk_rows=7)
+    assert (stats.read, stats.inserted, stats.skipped) == (20, 20, 0)
+
+    stats = await import_owm_history(path, "Москва", chunk_rows=7)
+    assert (stats.read, stats.inserted, stats.skipped) == (20, 0, 20)
+
+    async with async_session() as session:
+        rows = (await session.execute(select(WeatherData).order_by(WeatherData.date))).scalars().all()
+    assert len(rows) == 20
+    assert rows[-1].city == "Москва"
+    assert rows[-1].user_id is None
+    assert rows[-1].temperature == 10.0
+    assert rows[-1].description == "light rain"
+
+
+@pytest.mark.asyncio
+async def test_import_csv_feeds_weekly_analysis(tmp_path):
+    """Тест: новый пользователь получает недельный анализ из импортированной истории города."""
+    start = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    path = tmp_path / "history.csv"
+    lines = ["dt,city_name,temp,feels_like,pressure,humidity,wind_speed,weather_description"]
+    for i in range(5):
+        timestamp = int((start - datetime.timedelta(days=i)).replace(tzinfo=datetime.timezone.utc).timestamp())
+        lines.append(f"{timestamp},Kazan,{15 - i},{14 - i},1010,60,2.0,overcast clouds")
+    path.write_text("\n".join(lines), encoding="utf-8")
+
+    stats = await import_owm_history(path, "Казань")
+    assert stats.inserted == 5
+
+    async with async_session() as session:
+        user = User(user_id=555555, city="Казань")
+        session.add(user)
+        await session.commit()
+
+    analysis = await WeatherAnalytics.get_weekly_analysis(user.id)
+    assert analysis is not None
+    assert analysis["city"] == "Казань"
+    assert len(analysis["daily_analysis"]) >= 4
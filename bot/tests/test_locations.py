@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+from bot.database.models import User
+from bot.database.database import async_session
+from bot.services.locations import add_location, get_locations, get_places, places_by_city, remove_location
+from bot.services.weather_api import WeatherAPI
+from bot.utils.scheduler import send_daily_weather
+
+
+WEATHER = {"city": "Москва", "temperature": 5.0, "feels_like": 3.0, "humidity": 70,
+           "wind_speed": 4.0, "description": "облачно", "pressure": 1000}
+
+
+async def create_users():
+    async with async_session() as session:
+        users = [User(user_id=101, city="Москва"), User(user_id=102, city="Москва")]
+        session.add_all(users)
+        await session.commit()
+    return users
+
+
+@pytest.mark.asyncio
+async def test_locations_grouped_by_city():
+    """Тест: места всех пользователей группируются по городу, основной город идёт первым."""
+    first, second = await create_users()
+
+    assert await add_location(first, "Истра", "Дача")
+    assert await add_location(second, "Истра")
+    # повтор и основной город не сохраняются
+    assert not await add_location(first, "Истра")
+    assert not await add_location(first, " москва")
+
+    places = await get_places(first)
+    assert [(place.label, place.primary) for place in places] == [("Москва", True), ("Дача (Истра)", False)]
+
+    deliveries = await places_by_city([first, second])
+    assert set(deliveries) == {"Москва", "Истра"}
+    assert [user.user_id for user, _ in deliveries["Истра"]] == [101, 102]
+
+    location, = await get_locations(first.id)
+    # чужое место удалить нельзя
+    assert not await remove_location(second.id, location.id)
+    assert await remove_location(first.id, location.id)
+    assert [place.city for place in await get_places(first)] == ["Москва"]
+
+
+@pytest.mark.asyncio
+async def test_weather_api_fetches_place_once():
+    """Тест: одновременные запросы одного места разными пользователями идут в апи один раз."""
+    async def slow_fetch(city):
+        await asyncio.sleep(0.01)
+        return dict(WEATHER)
+
+    with patch.object(WeatherAPI, "_fetch_current_weather", side_effect=slow_fetch, autospec=False) as fetch:
+        results = await asyncio.gather(WeatherAPI().get_current_weather("Москва"),
+                                       WeatherAPI().get_current_weather(" москва "),
+                                       WeatherAPI().get_current_weather("Москва"))
+        # повторный запрос в пределах WEATHER_CACHE_TTL - из кэша
+        await WeatherAPI().get_current_weather("МОСКВА")
+
+    assert fetch.call_count == 1
+    assert all(result == WEATHER for result in results)
+
+
+@pytest.mark.asyncio
+async def test_daily_broadcast_delivers_each_place():
+    """Тест: утренняя рассылка приходит по каждому месту, погода города запрашивается один раз."""
+    first, second = await create_users()
+    assert await add_location(first, "Истра", "Дача")
+
+    bot = AsyncMock()
+    with patch("bot.utils.scheduler.weather_api") as weather_api, \
+            patch("bot.utils.scheduler.asyncio.sleep", new=AsyncMock()):
+        weather_api.get_current_weather = AsyncMock(return_value=dict(WEATHER))
+        await send_daily_weather(bot)
+
+    assert sorted(call.args[0] for call in weather_api.get_current_weather.call_args_list) == ["Истра", "Москва"]
+    recipients = [call.args[0] for call in bot.send_message.call_args_list]
+    assert sorted(recipients) == [101, 101, 102]
+    assert any("📍 Дача (Истра)" in call.args[1] for call in bot.send_message.call_args_list)
+
+
+@pytest.mark.asyncio
+async def test_nearby_coordinates_share_cell():
+    """Тест: соседние точки одной ячейки геохеша делят запрос погоды и название места."""
+    with patch.object(WeatherAPI, "_fetch_current_weather", AsyncMock(return_value=dict(WEATHER))) as fetch, \
+            patch.object(WeatherAPI, "_fetch_place_name", AsyncMock(return_value="Москва")) as geocode:
+        # точки в нескольких сотнях метров друг от друга
+        await WeatherAPI().get_current_weather("Москва", 55.7512, 37.6184)
+        await WeatherAPI().get_weather_by_coordinates(55.7539, 37.6208)
+        assert await WeatherAPI().reverse_geocode(55.7512, 37.6184) == "Москва"
+        assert await WeatherAPI().reverse_geocode(55.7539, 37.6208) == "Москва"
+
+    assert fetch.await_count == 1
+    assert geocode.await_count == 1
+    # в апи уходит центр ячейки, а не точные координаты пользователя
+    location = fetch.await_args.args[0]
+    assert set(location) == {"lat", "lon"} and location["lat"] != 55.7512
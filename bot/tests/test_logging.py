@@ -0,0 +1,43 @@
+import json
+import logging
+from unittest.mock import patch
+from bot.utils.logger import SAMPLED, JsonFormatter, SamplingFilter
+
+
+def make_record(msg: str, *args, sampled: bool = True, level: int = logging.INFO) -> logging.LogRecord:
+    record = logging.LogRecord("bot.utils.scheduler", level, __file__, 1, msg, args, None)
+    if sampled:
+        record.__dict__.update(SAMPLED)
+    return record
+
+
+def test_sampling_filter_limits_bulk_records():
+    """Тест: однотипные записи рассылки прореживаются, следующее окно сообщает о пропущенных."""
+    sampling = SamplingFilter(burst=3, period=60)
+    template = "Отправлен прогноз погоды для пользователя %s (%s)"
+
+    with patch("bot.utils.logger.time.monotonic", return_value=1000.0):
+        passed = [sampling.filter(make_record(template, user_id, "Москва")) for user_id in range(10)]
+        # непомеченные записи и другие шаблоны не прореживаются
+        assert sampling.filter(make_record(template, 11, "Москва", sampled=False))
+        assert sampling.filter(make_record("Пользователь %s деактивирован", 12))
+        # ошибки не прореживаются, даже помеченные: при массовом сбое видны все причины
+        errors = [sampling.filter(make_record("Ошибка отправки пользователю %s: %s", user_id, "timeout",
+                                              level=logging.ERROR)) for user_id in range(10)]
+    assert passed == [True] * 3 + [False] * 7
+    assert all(errors)
+
+    with patch("bot.utils.logger.time.monotonic", return_value=1061.0):
+        record = make_record(template, 13, "Сочи")
+        assert sampling.filter(record)
+    assert record.getMessage() == "Отправлен прогноз погоды для пользователя 13 (Сочи) (пропущено похожих записей: 7)"
+
+
+def test_json_formatter():
+    """Тест: JSON-формат - одна строка с уровнем, логгером и подставленными аргументами."""
+    line = JsonFormatter().format(make_record("Рассылка %s: отправлено %s", "daily_weather", 5))
+
+    entry = json.loads(line)
+    assert "\n" not in line
+    assert entry["level"] == "INFO" and entry["logger"] == "bot.utils.scheduler"
+    assert entry["message"] == "Рассылка daily_weather: отправлено 5"
@@ -0,0 +1,50 @@
+import pytest
+import datetime
+from sqlalchemy import func
+from sqlalchemy.future import select
+from bot.database.models import User, WeatherData, WeatherDailyAggregate
+from bot.database.database import async_session
+from bot.services.retention import downsample_weather_history
+
+
+@pytest.mark.asyncio
+async def test_downsample_weather_history():
+    """Тест свёртки старых наблюдений в дневные агрегаты."""
+    async with async_session() as session:
+        test_user = User(user_id=888888, username="retention_user", city="Москва")
+        session.add(test_user)
+        await session.commit()
+
+        old_day = datetime.datetime.now() - datetime.timedelta(days=100)
+        for i, (temperature, description) in enumerate([(10.0, "ясно"), (14.0, "небольшой дождь"),
+                                                        (12.0, "облачно")]):
+            session.add(WeatherData(user_id=test_user.id, temperature=temperature, feels_like=temperature,
+                                    pressure=1000, humidity=50 + i, wind_speed=2.0, description=description,
+                                    date=old_day.replace(hour=8 + i)))
+        # свежее наблюдение не должно затрагиваться
+        session.add(WeatherData(user_id=test_user.id, temperature=20.0, feels_like=20.0, pressure=1000,
+                                humidity=40, wind_speed=1.0, description="ясно",
+                                date=datetime.datetime.now()))
+        await session.commit()
+
+    # пачка меньше количества строк за день - агрегат собирается из нескольких транзакций
+    stats = await downsample_weather_history(retention_days=90, batch_size=2)
+
+    assert stats.rows_deleted == 3
+    assert stats.batches == 2
+
+    async with async_session() as session:
+        remaining = (await session.execute(select(func.count(WeatherData.id)))).scalar_one()
+        aggregates = (await session.execute(select(WeatherDailyAggregate))).scalars().all()
+
+    assert remaining == 1
+    assert len(aggregates) == 1
+    aggregate = aggregates[0]
+    assert aggregate.city == "Москва"
+    assert aggregate.date == old_day.date()
+    assert aggregate.samples == 3
+    assert aggregate.temperature_avg == pytest.approx(12.0)
+    assert aggregate.temperature_min == 10.0
+    assert aggregate.temperature_max == 14.0
+    assert aggregate.humidity_avg == pytest.approx(51.0)
+    assert aggregate.rainy_samples == 1
@@ -2,6 +2,7 @@ import pytest
 from unittest.mock import AsyncMock, patch, MagicMock
 
 from bot.utils.scheduler import send_weekly_analysis
+from bot.database.database import async_session
 from bot.database.models import User
 
 
@@ -17,19 +18,20 @@ async def test_send_weekly_analysis_success():
     user1 = MagicMock(spec=User)
     user1.user_id = 123456
     user1.id = 1
+    user1.city = "Москва"
     user1.is_active = True
 
     # Мокаем сессию и результат запроса к БД
     with patch("bot.utils.scheduler.async_session") as mock_session:
-        mock_exec = AsyncMock()
-        mock_exec.scalars.return_value.all.return_value = [user1]
+        mock_exec = AsyncMock(return_value=MagicMock())
+        mock_exec.return_value.scalars.return_value.all.return_value = [user1]
         mock_session().__aenter__.return_value.execute = mock_exec
 
         # Мокаем WeatherAnalytics и API
-        with patch("bot.utils.scheduler.WeatherAnalytics") as mock_analytics, \
+        with patch("bot.utils.scheduler.WeatherAnalytics", autospec=True) as mock_analytics, \
                 patch("bot.utils.scheduler.weather_api") as mock_weather_api:
 
-            mock_analytics.get_weekly_analysis_with_forecast.return_value = {
+            report = {
                 "city": "Москва",
                 "past_week": {
                     "period": {
@@ -42,25 +44,28 @@ async def test_send_weekly_analysis_success():
                         "wind": {"description": "усилился", "value": 3.2}
                     }
                 },
-                "next_week_forecast": [
-                    {
-                        "date": MagicMock(strftime=MagicMock(return_value="08.04")),
-                        "avg_temp": 16.0,
-                        "min_temp": 12.0,
-                        "max_temp": 20.0,
-                        "avg_humidity": 55.0,
-                        "avg_wind": 2.8,
-                        "description": "переменная облачность"
+                "next_week_forecast": {
+                    "daily_forecasts": [
+                        {
+                            "date": MagicMock(strftime=MagicMock(return_value="08.04")),
+                            "avg_temp": 16.0,
+                            "min_temp": 12.0,
+                            "max_temp": 20.0,
+                            "avg_humidity": 55.0,
+                            "avg_wind": 2.8,
+                            "description": "переменная облачность"
+                        }
+                    ],
+                    "summary": {
+                        "avg_temp": 16.5,
+                        "min_temp": 11.0,
+                        "max_temp": 21.0,
+                        "avg_humidity": 58.0,
+                        "avg_wind": 3.0
                     }
-                ],
-                "summary": {
-                    "avg_temp": 16.5,
-                    "min_temp": 11.0,
-                    "max_temp": 21.0,
-                    "avg_humidity": 58.0,
-                    "avg_wind": 3.0
                 }
             }
+            mock_analytics.get_city_weekly_reports.return_value = {"Москва": report}
 
             # Запуск функции
             await send_weekly_analysis(bot=bot_mock)
@@ -69,9 +74,9 @@ async def test_send_weekly_analysis_success():
             bot_mock.send_message.assert_awaited_once()
             call_args = bot_mock.send_message.call_args
             assert call_args[0][0] == 123456  # user_id
-            assert "Москва" in call_args[1]["text"]
-            assert "01.04 - 07.04" in call_args[1]["text"]
-            assert "Прогноз на следующую неделю" in call_args[1]["text"]
+            assert "Москва" in call_args[0][1]
+            assert "01.04 - 07.04" in call_args[0][1]
+            assert "Прогноз на следующую неделю" in call_args[0][1]
 
 
 @pytest.mark.asyncio
@@ -84,15 +89,16 @@ async def test_send_weekly_analysis_no_data():
     user1 = MagicMock(spec=User)
     user1.user_id = 123456
     user1.id = 1
+    user1.city = "Москва"
     user1.is_active = True
 
     with patch("bot.utils.scheduler.async_session") as mock_session:
-        mock_exec = AsyncMock()
-        mock_exec.scalars.return_value.all.return_value = [user1]
+        mock_exec = AsyncMock(return_value=MagicMock())
+        mock_exec.return_value.scalars.return_value.all.return_value = [user1]
         mock_session().__aenter__.return_value.execute = mock_exec
 
-        with patch("bot.utils.scheduler.WeatherAnalytics") as mock_analytics:
-            mock_analytics.get_weekly_analysis_with_forecast.return_value = None
+        with patch("bot.utils.scheduler.WeatherAnalytics", autospec=True) as mock_analytics:
+            mock_analytics.get_city_weekly_reports.return_value = {}
 
             await send_weekly_analysis(bot=bot_mock)
 
@@ -107,14 +113,15 @@ async def test_send_weekly_analysis_user_inactive():
     """
     bot_mock = AsyncMock()
 
-    user1 = MagicMock(spec=User)
-    user1.user_id = 123456
-    user1.is_active = False  # неактивный
+    # пользователи выбираются запросом к тестовой БД: неактивного отсекает условие запроса
+    async with async_session() as session:
+        session.add(User(user_id=123456, city="Москва", is_active=False))  # неактивный
+        await session.commit()
 
-    with patch("bot.utils.scheduler.async_session") as mock_session:
-        mock_exec = AsyncMock()
-        mock_exec.scalars.return_value.all.return_value = [user1]
-        mock_session().__aenter__.return_value.execute = mock_exec
+    with patch("bot.utils.scheduler.WeatherAnalytics", autospec=True) as mock_analytics:
+        mock_analytics.get_city_weekly_reports.return_value = {"Москва": {
+            "city": "Москва", "past_week": None, "next_week_forecast": None
+        }}
 
         await send_weekly_analysis(bot=bot_mock)
 
@@ -132,24 +139,25 @@ async def test_send_weekly_analysis_exception_handling():
     user1 = MagicMock(spec=User)
     user1.user_id = 123456
     user1.id = 1
+    user1.city = "Москва"
     user1.is_active = True
 
     with patch("bot.utils.scheduler.async_session") as mock_session, \
-            patch("bot.utils.scheduler.WeatherAnalytics") as mock_analytics, \
+            patch("bot.utils.scheduler.WeatherAnalytics", autospec=True) as mock_analytics, \
             patch("bot.utils.scheduler.logger.error") as mock_log_error:
 
-        mock_exec = AsyncMock()
-        mock_exec.scalars.return_value.all.return_value = [user1]
+        mock_exec = AsyncMock(return_value=MagicMock())
+        mock_exec.return_value.scalars.return_value.all.return_value = [user1]
         mock_session().__aenter__.return_value.execute = mock_exec
 
-        mock_analytics.get_weekly_analysis_with_forecast.return_value = {
+        mock_analytics.get_city_weekly_reports.return_value = {"Москва": {
             "city": "Москва",
             "past_week": {
                 "period": {"start": MagicMock(strftime=MagicMock(return_value="01.04")), "end": MagicMock(strftime=MagicMock(return_value="07.04"))},
                 "trends": {"temperature": {"description": "повысилась", "value": 15.5}}
             },
             "next_week_forecast": []
-        }
+        }}
 
         await send_weekly_analysis(bot=bot_mock)
 
@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from unittest.mock import AsyncMock, patch
+from aiogram import Bot, Dispatcher, F
+from bot.database.database import async_session
+from bot.database.models import User
+from bot.services.checkpoints import take_checkpoint
+from bot.tests.test_throttling import RecordingSession, make_update
+from bot.utils.scheduler import resume_broadcasts, send_daily_weather
+from bot.utils.shutdown import GracefulShutdown, shutdown
+
+WEATHER = {"temperature": 10.0, "feels_like": 8.0, "humidity": 70, "wind_speed": 3.0, "description": "облачно"}
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def reset_shutdown():
+    yield
+    shutdown.reset()
+
+
+@pytest.mark.asyncio
+async def test_drain_waits_for_updates_in_flight():
+    """Тест: остановка дожидается обработки принятого апдейта и отменяет работу сверх таймаута."""
+    tracker = GracefulShutdown()
+    dp = Dispatcher()
+    dp.update.outer_middleware(tracker)
+    finished = []
+
+    async def slow_handler(message):
+        await asyncio.sleep(0.2)
+        finished.append(message.text)
+
+    dp.message.register(slow_handler, F.text)
+    bot = Bot(token="42:TEST", session=RecordingSession())
+
+    update = asyncio.create_task(dp.feed_update(bot, make_update(1, "Погода сейчас")))
+    await asyncio.sleep(0.05)
+    assert tracker.in_flight == 1
+    assert await tracker.drain(timeout=5)
+    assert update.done() and finished == ["Погода сейчас"]
+
+    @tracker.job
+    async def endless_job():
+        await asyncio.sleep(60)
+
+    job = asyncio.create_task(endless_job())
+    await asyncio.sleep(0)
+    assert not await tracker.drain(timeout=0.1)
+    assert job.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_interrupted_broadcast_resumes_after_restart():
+    """Тест: рассылка, прерванная остановкой, сохраняет контрольную точку и продолжается с оставшимися."""
+    async with async_session() as session:
+        session.add_all([User(user_id=300 + i, city="Москва") for i in range(4)])
+        await session.commit()
+
+    sent = []
+
+    async def send_message(chat_id, text):
+        sent.append(chat_id)
+        if len(sent) == 2:
+            # SIGTERM посреди рассылки
+            shutdown.stopping = True
+
+    bot = AsyncMock()
+    bot.send_message.side_effect = send_message
+    with patch("bot.utils.scheduler.weather_api.get_current_weather", AsyncMock(return_value=WEATHER)), \
+            patch("bot.utils.scheduler.WeatherAnalytics.save_weather_data_for_week_analysis", AsyncMock()), \
+            patch("bot.utils.scheduler.asyncio.sleep", AsyncMock()):
+        await send_daily_weather(bot)
+        assert len(sent) == 2
+
+        # после перезапуска рассылка продолжается только для оставшихся получателей
+        shutdown.reset()
+        await resume_broadcasts(bot)
+
+    assert sorted(sent) == [300, 301, 302, 303]
+    assert await take_checkpoint("daily_weather") is None
@@ -0,0 +1,15 @@
+import os
+import pytest
+from benchmarks.startup import measure
+
+# запас на медленные машины CI; локально бот начинает опрос за несколько секунд
+STARTUP_BUDGET = float(os.environ.get("STARTUP_BUDGET", 20))
+
+
+@pytest.mark.asyncio
+async def test_time_to_first_poll():
+    """Тест: бот в режиме polling доходит до первого getUpdates в пределах бюджета времени."""
+    timings = await measure(timeout=STARTUP_BUDGET * 2)
+
+    assert timings["getMe"] <= timings["getUpdates"]
+    assert timings["getUpdates"] < STARTUP_BUDGET, f"Время до первого опроса: {timings['getUpdates']:.1f} с"
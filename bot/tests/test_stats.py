@@ -0,0 +1,36 @@
+import pytest
+from bot.database.models import User
+from bot.database.database import async_session
+from bot.services.stats import BotStats
+
+
+@pytest.mark.asyncio
+async def test_user_stats_query_and_counters():
+    """Тест агрегирующего запроса статистики и инкрементальных счётчиков."""
+    async with async_session() as session:
+        session.add_all([
+            User(user_id=1, city="Москва"),
+            User(user_id=2, city="Москва"),
+            User(user_id=3, city="Тамбов", is_active=False),
+            User(user_id=4, city="Казань"),
+        ])
+        await session.commit()
+
+    # LIMIT ограничивает только список городов, итоги считаются по всей таблице
+    total, active, cities = await BotStats.query_user_stats(limit=1)
+    assert (total, active) == (4, 3)
+    assert cities == [("Москва", 2)]
+
+    stats = BotStats()
+    await stats.load()
+    stats.on_register("Казань")
+    stats.on_city_change("Тамбов", "Москва")
+    stats.on_deactivate()
+
+    total, active, cities = await stats.get_user_stats(limit=10)
+    assert (total, active) == (5, 3)
+    assert dict(cities) == {"Москва": 3, "Казань": 2}
+
+    storage = await BotStats.get_storage_stats()
+    assert storage["observations"] == 0
+    assert storage["aggregates"] == 0
@@ -0,0 +1,63 @@
+import pytest
+from aiogram import Bot, Dispatcher, F
+from aiogram.client.session.base import BaseSession
+from aiogram.types import Update
+from bot.middlewares.throttling import Throttle, ThrottlingMiddleware
+
+
+class RecordingSession(BaseSession):
+    """Сессия без сети: запоминает отправленные запросы."""
+
+    def __init__(self):
+        super().__init__()
+        self.sent = []
+
+    async def make_request(self, bot, method, timeout=None):
+        self.sent.append(method)
+        return True
+
+    async def stream_content(self, *args, **kwargs):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+def make_update(update_id: int, text: str, user_id: int = 101) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1700000000,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Тест"},
+            "text": text,
+        },
+    })
+
+
+@pytest.mark.asyncio
+async def test_repeated_presses_get_cached_reply():
+    """Тест: сверх лимита хэндлер не вызывается, пользователь получает его последний ответ."""
+    throttling = ThrottlingMiddleware(default=Throttle(rate=100, period=60))
+    dp = Dispatcher()
+    dp.message.middleware(throttling)
+    calls = []
+
+    async def weather_now(message):
+        calls.append(message.from_user.id)
+        await message.answer(f"Погода #{len(calls)}")
+
+    dp.message.register(weather_now, F.text == "Погода сейчас", flags={"throttle": Throttle(rate=2, period=60)})
+    session = RecordingSession()
+    bot = Bot(token="42:TEST", session=session)
+
+    for update_id in range(1, 6):
+        await dp.feed_update(bot, make_update(update_id, "Погода сейчас"))
+    # у другого пользователя своё окно
+    await dp.feed_update(bot, make_update(6, "Погода сейчас", user_id=102))
+
+    assert calls == [101, 101, 102]
+    assert [method.text for method in session.sent] == ["Погода #1", "Погода #2"] + ["Погода #2"] * 3 + ["Погода #3"]
+    assert throttling.throttled["weather_now"] == 3
+    assert throttling.total() == (3, 3)
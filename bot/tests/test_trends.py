@@ -0,0 +1,34 @@
+import datetime
+import numpy as np
+import pytest
+from bot.services.trends import TrendAccumulator
+
+
+START = datetime.datetime(2025, 4, 1, 0, 0)
+
+
+def test_accumulator_linear_slope():
+    """Тест: на линейных данных наклон точный, R² = 1, тенденция значима."""
+    accumulator = TrendAccumulator()
+    for hours in range(0, 6 * 24, 6):
+        accumulator.add(START + datetime.timedelta(hours=hours), 5.0 + 2.0 * hours / 24)
+
+    estimate = accumulator.estimate()
+
+    assert estimate.slope == pytest.approx(2.0)
+    assert estimate.change == pytest.approx(2.0 * (6 * 24 - 6) / 24)
+    assert estimate.r_squared == pytest.approx(1.0)
+    assert estimate.significant
+
+
+def test_accumulator_noise_is_not_significant():
+    """Тест: случайный шум без тенденции не считается значимым изменением."""
+    rng = np.random.default_rng(3)
+    accumulator = TrendAccumulator()
+    for hours in range(0, 7 * 24, 3):
+        accumulator.add(START + datetime.timedelta(hours=hours), float(rng.normal(10, 4)))
+
+    estimate = accumulator.estimate()
+
+    assert not estimate.significant
+    assert estimate.r_squared < 0.1
@@ -0,0 +1,63 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+from bot.database.models import User
+from bot.database.database import async_session
+from bot.middlewares.user import UserMiddleware
+from bot.services import users
+from bot.utils.cache import LRUCache
+
+
+def test_lru_cache_eviction():
+    """Тест вытеснения давно не использованных записей из LRU-кэша."""
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # "a" становится самой свежей записью
+    cache.set("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+@pytest.mark.asyncio
+async def test_unregistered_user_is_not_cached():
+    """Тест: отсутствие пользователя не кэшируется - регистрация в другом процессе видна сразу."""
+    users.user_cache.clear()
+    assert await users.get_user(888888) is None
+
+    # регистрация мимо кэша этого процесса (например, другим процессом вебхука)
+    async with async_session() as session:
+        session.add(User(user_id=888888, city="Самара"))
+        await session.commit()
+
+    user = await users.get_user(888888)
+    assert user is not None and user.city == "Самара"
+
+
+@pytest.mark.asyncio
+async def test_user_middleware_uses_cache():
+    """Тест: пользователь читается из БД один раз, затем из кэша до инвалидации."""
+    users.user_cache.clear()
+    async with async_session() as session:
+        session.add(User(user_id=777777, username="cached_user", city="Казань"))
+        await session.commit()
+
+    middleware = UserMiddleware()
+    handler = AsyncMock(return_value="ok")
+    data = {"event_from_user": AsyncMock(id=777777)}
+
+    await middleware(handler, AsyncMock(), data)
+    assert data["user"].city == "Казань"
+
+    # повторный апдейт не должен обращаться к БД
+    with patch("bot.services.users.async_session") as mock_session:
+        await middleware(handler, AsyncMock(), data)
+        mock_session.assert_not_called()
+    assert data["user"].city == "Казань"
+
+    # деактивация сбрасывает кэш, следующий апдейт видит актуальные данные
+    await users.deactivate_user(777777)
+    await middleware(handler, AsyncMock(), data)
+    assert data["user"].is_active is False
+    assert handler.await_count == 3
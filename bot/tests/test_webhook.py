@@ -0,0 +1,73 @@
+import asyncio
+import pytest
+from aiogram import Bot, Dispatcher
+from aiohttp.test_utils import TestClient, TestServer
+from bot.webhook import create_app
+
+
+def make_update(update_id: int, text: str) -> dict:
+    """Обновление с текстовым сообщением в формате Bot API."""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1700000000,
+            "chat": {"id": 101, "type": "private"},
+            "from": {"id": 101, "is_bot": False, "first_name": "Тест"},
+            "text": text,
+        },
+    }
+
+
+@pytest.mark.asyncio
+async def test_webhook_feeds_updates_to_dispatcher():
+    """Тест: обновления вебхука с верным секретом попадают в диспетчер, без секрета - отклоняются."""
+    dp = Dispatcher()
+    received = []
+
+    @dp.message()
+    async def remember(message):
+        received.append(message.text)
+
+    app = create_app(Bot(token="42:TEST"), dp, secret="s3cret", path="/webhook")
+    async with TestClient(TestServer(app)) as client:
+        response = await client.post("/webhook", json=make_update(1, "Погода сейчас"),
+                                     headers={"X-Telegram-Bot-Api-Secret-Token": "s3cret"})
+        assert response.status == 200
+
+        response = await client.post("/webhook", json=make_update(2, "чужой запрос"),
+                                     headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"})
+        assert response.status == 401
+
+        # обновление обрабатывается в фоне после ответа Telegram
+        for _ in range(50):
+            if received:
+                break
+            await asyncio.sleep(0.01)
+
+    assert received == ["Погода сейчас"]
+
+
+@pytest.mark.asyncio
+async def test_worker_state_for_several_processes():
+    """Тест: при нескольких процессах кэши пользователей короткие, нормы перечитываются,
+    а лимит частоты делится между процессами."""
+    from bot.config.config import config
+    from bot.middlewares.throttling import throttling
+    from bot.services.climate import climate_baselines
+    from bot.services.locations import locations_cache
+    from bot.services.users import user_cache
+    from bot.webhook import WORKER_CLIMATE_RELOAD, WORKER_USER_CACHE_TTL, configure_worker_state
+
+    saved = (user_cache.ttl, locations_cache.ttl, climate_baselines.reload_after,
+             config.STATS_CACHE_ENABLED, throttling.workers)
+    try:
+        configure_worker_state(4)
+        assert user_cache.ttl == WORKER_USER_CACHE_TTL
+        assert locations_cache.ttl == WORKER_USER_CACHE_TTL
+        assert climate_baselines.reload_after == WORKER_CLIMATE_RELOAD
+        assert config.STATS_CACHE_ENABLED is False
+        assert throttling.workers == 4
+    finally:
+        (user_cache.ttl, locations_cache.ttl, climate_baselines.reload_after,
+         config.STATS_CACHE_ENABLED, throttling.workers) = saved
@@ -0,0 +1,52 @@
+"""
+Выбор реализации цикла событий.
+
+uvloop (цикл на libuv) обрабатывает сетевой ввод-вывод быстрее стандартного цикла asyncio:
+опрос Telegram, запросы к апи погоды и рассылки почти целиком состоят из него.
+Включается через EVENT_LOOP=uvloop; если пакет не установлен (например, на Windows),
+бот работает на стандартном цикле. Сравнение: `python -m benchmarks.event_loop`.
+
+aiogram при импорте сам включает uvloop, если пакет установлен, поэтому EVENT_LOOP=asyncio
+создаёт стандартный цикл явно, а не через текущую политику asyncio.
+"""
+
+import asyncio
+import logging
+from typing import Any, Callable, Coroutine, TypeVar
+from bot.config.config import config
+
+logger = logging.getLogger(__name__)
+
+EVENT_LOOPS = ("asyncio", "uvloop")
+
+T = TypeVar("T")
+
+
+def loop_factory(kind: str | None = None) -> Callable[[], asyncio.AbstractEventLoop]:
+    """
+    Фабрика цикла событий для asyncio.Runner.
+    :param kind: asyncio или uvloop (по умолчанию EVENT_LOOP)
+    :return: фабрика цикла uvloop или стандартного цикла asyncio
+    """
+    kind = kind or config.EVENT_LOOP
+    if kind not in EVENT_LOOPS:
+        raise ValueError(f"Неизвестная реализация цикла событий: {kind}")
+    if kind == "uvloop":
+        try:
+            import uvloop
+        except ImportError:
+            logger.warning("uvloop не установлен, используется стандартный цикл asyncio")
+        else:
+            return uvloop.new_event_loop
+    return asyncio.DefaultEventLoopPolicy().new_event_loop
+
+
+def loop_name() -> str:
+    """Реализация текущего цикла событий (для логов): asyncio или uvloop."""
+    return type(asyncio.get_running_loop()).__module__.split(".")[0]
+
+
+def run_loop(main: Coroutine[Any, Any, T], kind: str | None = None) -> T:
+    """asyncio.run на выбранной реализации цикла событий."""
+    with asyncio.Runner(loop_factory=loop_factory(kind)) as runner:
+        return runner.run(main)
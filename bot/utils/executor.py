@@ -0,0 +1,71 @@
+"""
+Выполнение CPU-ёмкой аналитики вне цикла событий.
+
+Цикл событий обслуживает и опрос Telegram, и рассылки, поэтому долгий расчёт
+(пакетный анализ всех пользователей) задерживает ответы на нажатия кнопок.
+AnalyticsRunner отправляет такие функции в пул процессов или потоков.
+Функции должны быть объявлены на уровне модуля (или статическими методами класса),
+а аргументы - компактными (массивы NumPy, словари), а не ORM-объектами,
+чтобы их можно было передать в другой процесс.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable
+from bot.config.config import config
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_KINDS = ("process", "thread", "inline")
+
+
+class AnalyticsRunner:
+    """
+    Пул для CPU-ёмких функций аналитики.
+    Атрибуты:
+        kind (str): process - пул процессов, thread - пул потоков, inline - выполнение в цикле событий
+        workers (int): Количество процессов или потоков
+    """
+
+    def __init__(self, kind: str | None = None, workers: int | None = None):
+        self.kind = kind or config.ANALYTICS_EXECUTOR
+        if self.kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Неизвестный тип пула аналитики: {self.kind}")
+        self.workers = workers or config.ANALYTICS_WORKERS
+        self._executor: Executor | None = None
+
+    def _get_executor(self) -> Executor:
+        """Создаёт пул при первом использовании."""
+        if self._executor is None:
+            if self.kind == "process":
+                # spawn: дочерние процессы не наследуют потоки драйвера БД и цикл событий
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="analytics")
+        return self._executor
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Выполняет func(*args) в пуле и возвращает результат."""
+        if self.kind == "inline":
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        except BrokenProcessPool:
+            # процесс пула упал (например, из-за нехватки памяти) - пересоздаём пул при следующем вызове
+            logger.error("Пул процессов аналитики завершился аварийно, расчёт выполняется в основном процессе")
+            self._executor = None
+            return func(*args)
+
+    def shutdown(self) -> None:
+        """Останавливает пул, не дожидаясь незапущенных задач."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+analytics_runner = AnalyticsRunner()
@@ -0,0 +1,52 @@
+"""
+Геохеш: координаты -> строка ячейки сетки. Чем длиннее строка, тем мельче ячейка
+(5 символов - около 4.9 x 4.9 км), и точки одной ячейки получают одну строку.
+"""
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {char: i for i, char in enumerate(BASE32)}
+
+
+def encode(latitude: float, longitude: float, precision: int = 5) -> str:
+    """Геохеш ячейки, в которую попадает точка."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        # чётные биты делят долготу, нечётные - широту
+        rng, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (rng[0] + rng[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            rng[0] = middle
+        else:
+            rng[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def bounds(geohash: str) -> tuple[float, float, float, float]:
+    """Границы ячейки: (мин. широта, мин. долгота, макс. широта, макс. долгота)."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _DECODE[char]
+        for shift in range(4, -1, -1):
+            rng = lon_range if even else lat_range
+            middle = (rng[0] + rng[1]) / 2
+            if value >> shift & 1:
+                rng[0] = middle
+            else:
+                rng[1] = middle
+            even = not even
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+def center(geohash: str) -> tuple[float, float]:
+    """Центр ячейки (широта, долгота)."""
+    min_lat, min_lon, max_lat, max_lon = bounds(geohash)
+    return (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
@@ -1,36 +1,129 @@
+"""
+Логирование бота без блокировки цикла событий.
+
+Код (в том числе хэндлеры и рассылки в цикле событий) только кладёт запись в очередь
+(QueueHandler), а в файл и консоль её пишет отдельный поток (QueueListener): медленный диск
+не задерживает ответы пользователям. Сообщения передаются %-шаблоном с аргументами, поэтому
+отброшенные записи (ниже уровня или прореженные) не форматируются вовсе.
+
+Формат - текст или JSON (LOG_FORMAT=json, одна запись на строку для сборщиков логов).
+Однотипные записи об успехе для каждого пользователя в массовых заданиях помечаются extra=SAMPLED
+и прореживаются SamplingFilter: итоги рассылки всё равно пишутся одной записью. Предупреждения
+и ошибки не прореживаются никогда - при массовом сбое в логе остаются все причины.
+
+Каждый процесс пишет в свой файл: ротация RotatingFileHandler одного файла из нескольких
+процессов теряет и перемешивает записи, поэтому процессы вебхука пишут в logs/bot-<номер>.log.
+"""
+
+import atexit
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from bot.config.config import config
 
+# extra для записей, которые можно прореживать (по одной на пользователя в рассылке и т.п.)
+SAMPLED = {"sampled": True}
 
-def setup_logger():
-    """Логирование для бота"""
-    os.makedirs("logs", exist_ok=True)  # создает папку для логов, если она не существует
+_listener: QueueListener | None = None
 
-    # настройка логгера
-    logger = logging.getLogger()
-    logger.setLevel(logging.INFO)
+
+class JsonFormatter(logging.Formatter):
+    """Запись лога одной строкой JSON: время, уровень, логгер, сообщение (с трассировкой ошибки)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Прореживание записей, помеченных extra=SAMPLED: за period секунд проходят первые burst записей
+    каждого шаблона (логгер и строка формата), остальные отбрасываются до форматирования.
+    Записи уровня WARNING и выше проходят всегда.
+    Первая запись шаблона в следующем окне сообщает, сколько записей было пропущено.
+    Атрибуты:
+        burst (int): Сколько записей шаблона пропускать за окно (0 - без прореживания)
+        period (float): Длина окна, секунды
+    """
+
+    def __init__(self, burst: int, period: float):
+        super().__init__()
+        self.burst = burst
+        self.period = period
+        # (логгер, шаблон) -> [начало окна, пропущено в лог, отброшено]
+        self._windows: dict[tuple[str, str], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not self.burst or not getattr(record, "sampled", False) or record.levelno >= logging.WARNING:
+            return True
+
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.period:
+                if window is not None and window[2]:
+                    record.msg = f"{record.msg} (пропущено похожих записей: {window[2]})"
+                window = self._windows[key] = [now, 0, 0]
+            if window[1] >= self.burst:
+                window[2] += 1
+                return False
+            window[1] += 1
+        return True
+
+
+def setup_logger(name: str = "bot") -> QueueListener:
+    """Логирование для бота: очередь в корневом логгере, запись в файл и консоль в фоновом потоке
+    :param name: имя файла лога в папке logs (у каждого процесса своё)
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+    os.makedirs("logs", exist_ok=True)  # создает папку для логов, если она не существует
 
     # форматирование логов
-    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    if config.LOG_FORMAT == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
 
     # обработчик для файла логов
-    file_handler = RotatingFileHandler("logs/bot.log",
+    file_handler = RotatingFileHandler(f"logs/{name}.log",
                                        maxBytes=10485760,
                                        backupCount=5)  # размер файла 10 МБ
-
-    file_handler.setLevel(logging.INFO)  # уровень логирования для файла логов
     file_handler.setFormatter(formatter)  # форматирование логов
 
     # обработчик для консоли
     console_handler = logging.StreamHandler()  # вывод логов в консоль
-    console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(formatter)
 
-    # добавление обработчиков в логгер
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    # в корневом логгере только очередь: запись в файл и консоль выполняет поток QueueListener
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(config.LOG_SAMPLE_BURST, config.LOG_SAMPLE_PERIOD))
+
+    logger = logging.getLogger()
+    logger.setLevel(config.LOG_LEVEL)
+    logger.addHandler(queue_handler)
+
+    _listener = QueueListener(log_queue, file_handler, console_handler)
+    _listener.start()
+    # при выходе поток дописывает оставшиеся в очереди записи
+    atexit.register(_listener.stop)
 
     # добавление уровня логирования для некоторых модулей
     logging.getLogger("aiogram").setLevel(logging.WARNING)
     logging.getLogger("sqlalchemy").setLevel(logging.WARNING)
+    return _listener
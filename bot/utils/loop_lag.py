@@ -0,0 +1,69 @@
+"""
+Измерение задержки цикла событий.
+
+Фоновая задача засыпает на фиксированный интервал и замеряет, насколько позже
+она проснулась. Эта задержка - время, на которое любое сообщение пользователя
+ждёт своей очереди в цикле событий (например, пока идёт тяжёлый расчёт).
+"""
+
+import asyncio
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    """
+    Монитор задержки цикла событий.
+    Атрибуты:
+        interval (float): Период замеров в секундах
+        samples (deque[float]): Последние замеры задержки в секундах
+        peak (float): Максимальная задержка с последнего сброса
+    """
+
+    def __init__(self, interval: float = 0.1, history: int = 600):
+        self.interval = interval
+        self.samples: deque[float] = deque(maxlen=history)
+        self.peak = 0.0
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """Запускает замеры в текущем цикле событий."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает замеры."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - started - self.interval, 0.0)
+            self.samples.append(lag)
+            self.peak = max(self.peak, lag)
+
+    def reset_peak(self) -> float:
+        """Сбрасывает максимум (например, перед рассылкой) и возвращает прежнее значение."""
+        peak, self.peak = self.peak, 0.0
+        return peak
+
+    def percentile(self, percent: float) -> float:
+        """Процентиль задержки по последним замерам, в секундах."""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(int(len(ordered) * percent / 100), len(ordered) - 1)
+        return ordered[index]
+
+
+loop_lag = LoopLagMonitor()
@@ -1,21 +1,51 @@
 import logging
 import asyncio
+import time
+from collections import defaultdict
+from datetime import date
 from sqlalchemy.future import select
 from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError
 from typing import Any
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from bot.config.config import config
 from bot.database.models import User
 from bot.database.database import async_session
-from bot.services.weather_api import WeatherAPI
+from bot.database.storage import delete_expired_states
+from bot.container import app
+from bot.services.alerts import AlertEvent, collect_weather_alerts
+from bot.services.checkpoints import save_checkpoint, take_checkpoint
 from bot.services.analytics import WeatherAnalytics
+from bot.services.climate import climate_baselines, rebuild_climate_baselines
+from bot.services.locations import Place, places_by_city
+from bot.services.retention import downsample_weather_history
+from bot.services.trends import refresh_trend_days
+from bot.services.users import deactivate_user
+from bot.services.stats import BroadcastStats, bot_stats
+from bot.utils.loop_lag import loop_lag
+from bot.utils.logger import SAMPLED
+from bot.utils.shutdown import shutdown
 
 
 logger = logging.getLogger(__name__)
-weather_api = WeatherAPI()
+weather_api = app.weather_api
 
-async def send_daily_weather(bot: Bot):
-    """Отправляет ежедневный прогноз погоды всем пользователям"""
+# строки тенденций в еженедельной рассылке: метрика, подпись, единица измерения
+TREND_LINES = (
+    ("temperature", "🌡️ Температура", "°C"),
+    ("humidity", "💧 Влажность", "%"),
+    ("wind", "🌬️ Ветер", " м/с"),
+)
+
+@shutdown.job
+async def send_daily_weather(bot: Bot, delivered: set[str] | None = None):
+    """Отправляет ежедневный прогноз погоды всем пользователям для каждого их места.
+    Погода каждого места (города и ячейки координат) запрашивается один раз для всех получателей.
+    При остановке бота рассылка прерывается между сообщениями и сохраняет контрольную точку.
+    :param delivered: ключи уже обработанных получателей (продолжение прерванной рассылки)
+    """
     logger.info("Запуск рассылки ежедневного прогноза погоды")
 
     async with async_session() as session:
@@ -23,21 +53,59 @@ async def send_daily_weather(bot: Bot):
         result = await session.execute(stmt)
         users = result.scalars().all()
 
-    for user in users:
-        try:
-            # получение прогноза погоды для города пользователя
-            weather_data: dict[str, Any] | None = await weather_api.get_current_weather(user.city)
+    broadcast = BroadcastStats(job="daily_weather")
+    started = time.perf_counter()
+    deliveries = await places_by_city(users)
+    delivered = set() if delivered is None else delivered
+
+    for city, city_recipients in deliveries.items():
+        # места города группируются по ячейке координат: погода каждой ячейки запрашивается один раз
+        cells: dict[str | None, list[tuple[User, Place]]] = defaultdict(list)
+        for user, place in city_recipients:
+            cells[place.cell].append((user, place))
+
+        for recipients in cells.values():
+            await send_daily_weather_to(bot, city, recipients, broadcast, delivered)
 
-            if not weather_data:
-                logger.warning(f"Не удалось получить погоду для пользователя {user.user_id}, город: {user.city}")
-                continue
+    if shutdown.stopping:
+        await save_checkpoint(broadcast.job, delivered)
+    broadcast.elapsed = time.perf_counter() - started
+    bot_stats.record_broadcast(broadcast)
 
-            # сохранение данных о погоде для еженедельного анализа
-            await WeatherAnalytics.save_weather_data_for_week_analysis(user.id, weather_data)
+
+def delivery_key(user: User, place: Place) -> str:
+    """Ключ сообщения рассылки для контрольной точки: пользователь и его место"""
+    return f"{user.id}:{place.location_id}"
+
+
+async def send_daily_weather_to(bot: Bot, city: str, recipients: list[tuple[User, Place]],
+                                broadcast: BroadcastStats, delivered: set[str] | None = None) -> None:
+    """Утренняя погода получателям одного места (город и ячейка координат).
+    Получатели из delivered пропускаются, обработанные добавляются в него.
+    """
+    delivered = set() if delivered is None else delivered
+    recipients = [(user, place) for user, place in recipients if delivery_key(user, place) not in delivered]
+    if not recipients or shutdown.stopping:
+        return
+
+    _, place = recipients[0]
+    weather_data: dict[str, Any] | None = await weather_api.get_current_weather(city, place.latitude, place.longitude)
+    if not weather_data:
+        logger.warning("Не удалось получить погоду для города %s, получателей: %s", city, len(recipients))
+        return
+
+    for user, place in recipients:
+        if shutdown.stopping:
+            return
+        try:
+            if place.primary:
+                # сохранение данных о погоде для еженедельного анализа
+                await WeatherAnalytics.save_weather_data_for_week_analysis(user.id, weather_data, user.city)
 
             # формирование сообщения с прогнозом погоды
+            title = f"📍 {place.label}\n" if not place.primary else ""
             message = (
-                f"☀️ Доброе утро! Вот прогноз погоды на утро для города {weather_data['city']}:\n\n"
+                f"{title}☀️ Доброе утро! Вот прогноз погоды на утро для города {place.city}:\n\n"
                 f"🌡️ Температура: {weather_data['temperature']:.1f}°C (ощущается как {weather_data['feels_like']:.1f}°C)\n"
                 f"💧 Влажность: {weather_data['humidity']}%\n"
                 f"🌬️ Ветер: {weather_data['wind_speed']} м/с\n"
@@ -46,16 +114,78 @@ async def send_daily_weather(bot: Bot):
             )
             # отправка сообщения пользователю
             await bot.send_message(user.user_id, message)
-            logger.info(f"Отправлен прогноз погоды для пользователя {user.user_id}")
+            broadcast.sent += 1
+            # записи о каждом получателе прореживаются, итоги рассылки пишет record_broadcast
+            logger.info("Отправлен прогноз погоды для пользователя %s (%s)", user.user_id, place.city, extra=SAMPLED)
 
-            # небольшая задержка, чтобы избежать слишком частых запросов к API
-            await asyncio.sleep(0.5)
+            # небольшая задержка, чтобы не упереться в лимиты Telegram
+            await asyncio.sleep(config.BROADCAST_DELAY)
 
+        except TelegramForbiddenError:
+            # пользователь заблокировал бота - больше не отправляем ему рассылки
+            broadcast.failed += 1
+            await deactivate_user(user.user_id)
         except Exception as e:
-            logger.error(f"Ошибка при отправке прогноза погоды пользователю {user.user_id}: {e}")
+            broadcast.failed += 1
+            logger.error("Ошибка при отправке прогноза погоды пользователю %s: %s", user.user_id, e)
+        delivered.add(delivery_key(user, place))
+
+
+def format_weekly_message(analysis_data: dict[str, Any]) -> str:
+    """Текст еженедельного анализа погоды для города"""
+    message = f"📊 Еженедельный анализ погоды для города {analysis_data['city']}:\n\n"
+
+    # Добавляем информацию о тенденциях
+    if analysis_data["past_week"]:
+        past = analysis_data["past_week"]
+        start_date = past["period"]["start"].strftime("%d.%m")
+        end_date = past["period"]["end"].strftime("%d.%m")
+        message += f"Прошедшая неделя ({start_date} - {end_date}):\n\n"
+
+        if past["trends"]:
+            message += "📈 Тенденции за неделю:\n"
+            for metric, label, unit in TREND_LINES:
+                trend = past["trends"].get(metric)
+                if trend:
+                    message += f"{label}: {trend['description']} ({trend['value']:.1f}{unit})\n"
+            message += "\n"
+    else:
+        message += f"Прошедшая неделя: недостаточно данных для анализа.\n\n"
+
+    # Добавляем прогноз на следующую неделю
+    if analysis_data["next_week_forecast"]:
+        forecast = analysis_data["next_week_forecast"]
+        message += f"Прогноз на следующую неделю:\n\n"
 
-async def send_weekly_analysis(bot: Bot):
-    """Отправляет еженедельный анализ погоды всем пользователям"""
+        for day_forecast in forecast["daily_forecasts"]:
+            date_str = day_forecast["date"].strftime("%d.%m") if hasattr(day_forecast["date"], 'strftime') else str(day_forecast["date"])
+            # отклонение от климатической нормы города (нормы загружаются до рассылки)
+            anomaly = None
+            if isinstance(day_forecast["date"], date):
+                anomaly = climate_baselines.anomaly(analysis_data["city"], day_forecast["date"], day_forecast["avg_temp"])
+            message += (
+                f"📅 {date_str}: {day_forecast['avg_temp']:+.1f}°C "
+                f"(от {day_forecast['min_temp']:+.1f}°C до {day_forecast['max_temp']:+.1f}°C)"
+                + (f", {anomaly.describe()}" if anomaly else "") + "\n"
+                f"   💧 {day_forecast['avg_humidity']:.0f}% | "
+                f"🌬️ {day_forecast['avg_wind']:.1f} м/с | "
+                f"{day_forecast['description'].capitalize()}\n\n"
+            )
+        summary = forecast["summary"]
+        message += "🔮 Прогноз на следующую неделю (если тенденция сохранится):\n"
+        message += f"🌡️ Температура: {summary['avg_temp']:+.1f}°C (от {summary['min_temp']:+.1f}°C до {summary['max_temp']:+.1f}°C)\n"
+        message += f"💧 Влажность: {summary['avg_humidity']:.0f}%\n"
+        message += f"🌬️ Ветер: {summary['avg_wind']:.1f} м/с\n"
+    return message
+
+
+@shutdown.job
+async def send_weekly_analysis(bot: Bot, delivered: set[str] | None = None):
+    """Отправляет еженедельный анализ погоды всем пользователям для каждого их места.
+    Отчёт и текст сообщения готовятся один раз на город и рассылаются всем его получателям.
+    При остановке бота рассылка прерывается между сообщениями и сохраняет контрольную точку.
+    :param delivered: ключи уже обработанных получателей (продолжение прерванной рассылки)
+    """
     logger.info("Запуск рассылки еженедельного анализа погоды")
 
     async with async_session() as session:
@@ -63,69 +193,155 @@ async def send_weekly_analysis(bot: Bot):
         result = await session.execute(stmt)
         users = result.scalars().all()
 
-    for user in users:
+    broadcast = BroadcastStats(job="weekly_analysis")
+    started = time.perf_counter()
+    # максимум задержки цикла событий за время рассылки: насколько она мешала ответам пользователям
+    loop_lag.reset_peak()
+
+    # получатели по городам всех их мест (основной город и дополнительные места)
+    delivered = set() if delivered is None else delivered
+    users_by_city = {}
+    for city, recipients in (await places_by_city(users)).items():
+        city_users = [user for user, _ in recipients if f"{user.id}:{city}" not in delivered]
+        if city_users:
+            users_by_city[city] = city_users
+
+    # анализ прошлой недели (один запрос на все города) и прогнозы городов
+    reports = await WeatherAnalytics.get_city_weekly_reports(list(users_by_city), weather_api)
+    await climate_baselines.ensure_loaded()
+
+    for city, city_users in users_by_city.items():
+        if shutdown.stopping:
+            break
+        analysis_data = reports.get(city)
+        if not analysis_data:
+            logger.warning("Не удалось получить еженедельный анализ погоды для города %s", city)
+            continue
         try:
-            # получение анализа погоды за неделю (прошлая неделя и прогноз на следующие 5 дней)
-            analysis_data = await WeatherAnalytics.get_weekly_analysis_with_forecast(user.id, weather_api)
-
-            if not analysis_data:
-                logger.warning(f"Не удалось получить еженедельный анализ погоды для пользователя {user.user_id}")
-                continue
-
-            message = f"📊 Еженедельный анализ погоды для города {analysis_data['city']}:\n\n"
-
-            # Добавляем информацию о тенденциях
-            if analysis_data["past_week"]:
-                past = analysis_data["past_week"]
-                start_date = past["period"]["start"].strftime("%d.%m")
-                end_date = past["period"]["end"].strftime("%d.%m")
-                message += f"Прошедшая неделя ({start_date} - {end_date}):\n\n"
-
-                if past["trends"]:
-                    message += "📈 Тенденции за неделю:\n"
-                    message += f"🌡️ Температура: {past['trends']['temperature']['description']} "
-                    message += f"({past['trends']['temperature']['value']:.1f}°C)\n"
-                    message += f"💧 Влажность: {past['trends']['humidity']['description']} "
-                    message += f"({past['trends']['humidity']['value']:.1f}%)\n"
-                    message += f"🌬️ Ветер: {past['trends']['wind']['description']} "
-                    message += f"({past['trends']['wind']['value']:.1f} м/с)\n\n"
-            else:
-                message += f"Прошедшая неделя: недостаточно данных для анализа.\n\n"
-
-            # Добавляем прогноз на следующую неделю
-            if analysis_data["next_week_forecast"]:
-                forecast = analysis_data["next_week_forecast"]
-                message += f"Прогноз на следующую неделю:\n\n"
-
-                for day_forecast in forecast["daily_forecasts"]:
-                    date_str = day_forecast["date"].strftime("%d.%m") if hasattr(day_forecast["date"], 'strftime') else str(day_forecast["date"])
-                    message += (
-                        f"📅 {date_str}: {day_forecast['avg_temp']:+.1f}°C "
-                        f"(от {day_forecast['min_temp']:+.1f}°C до {day_forecast['max_temp']:+.1f}°C)\n"
-                        f"   💧 {day_forecast['avg_humidity']:.0f}% | "
-                        f"🌬️ {day_forecast['avg_wind']:.1f} м/с | "
-                        f"{day_forecast['description'].capitalize()}\n\n"
-                    )
-                summary = forecast["summary"]
-                message += "🔮 Прогноз на следующую неделю (если тенденция сохранится):\n"
-                message += f"🌡️ Температура: {summary['avg_temp']:+.1f}°C (от {summary['min_temp']:+.1f}°C до {summary['max_temp']:+.1f}°C)\n"
-                message += f"💧 Влажность: {summary['avg_humidity']:.0f}%\n"
-                message += f"🌬️ Ветер: {summary['avg_wind']:.1f} м/с\n"
-
-            # Отправляем сообщение пользователю
-            await bot.send_message(user.user_id, message)
-            logger.info(f"Отправлен еженедельный анализ погоды пользователю {user.user_id}")
+            message = format_weekly_message(analysis_data)
+        except Exception as e:
+            broadcast.failed += len(city_users)
+            logger.error("Ошибка при подготовке еженедельного анализа для города %s: %s", city, e)
+            continue
+
+        for user in city_users:
+            if shutdown.stopping:
+                break
+            try:
+                # Отправляем сообщение пользователю
+                await bot.send_message(user.user_id, message)
+                broadcast.sent += 1
+                logger.info("Отправлен еженедельный анализ погоды пользователю %s", user.user_id, extra=SAMPLED)
+
+                # Небольшую задержка, чтобы не упереться в лимиты Telegram
+                await asyncio.sleep(config.BROADCAST_DELAY)
+
+            except TelegramForbiddenError:
+                broadcast.failed += 1
+                await deactivate_user(user.user_id)
+            except Exception as e:
+                broadcast.failed += 1
+                logger.error("Ошибка при отправке еженедельного анализа пользователю %s: %s", user.user_id, e)
+            delivered.add(f"{user.id}:{city}")
+
+    if shutdown.stopping:
+        await save_checkpoint(broadcast.job, delivered)
+    broadcast.elapsed = time.perf_counter() - started
+    broadcast.loop_lag_max = loop_lag.peak
+    bot_stats.record_broadcast(broadcast)
+
+
+def format_alert_message(events: list[AlertEvent]) -> str:
+    """Текст погодного предупреждения для пользователя"""
+    message = f"⚠️ Погодное предупреждение для города {events[0].city}:\n\n"
+    for event in sorted(events, key=lambda item: item.starts_at):
+        message += f"{event.describe()}\n"
+    return message
+
+
+@shutdown.job
+async def send_weather_alerts(bot: Bot):
+    """Проверяет прогнозы городов по подпискам на предупреждения и рассылает новые предупреждения"""
+    logger.info("Запуск проверки погодных предупреждений")
+    broadcast = BroadcastStats(job="weather_alerts")
+    started = time.perf_counter()
 
-            # Небольшую задержка, чтобы не перегружать API
-            await asyncio.sleep(0.5)
+    try:
+        notifications = await collect_weather_alerts(weather_api)
+    except Exception as e:
+        logger.error("Ошибка при проверке погодных предупреждений: %s", e)
+        return
 
+    for telegram_id, events in notifications.items():
+        try:
+            await bot.send_message(telegram_id, text=format_alert_message(events))
+            broadcast.sent += 1
+            await asyncio.sleep(0.05)
+        except TelegramForbiddenError:
+            broadcast.failed += 1
+            await deactivate_user(telegram_id)
         except Exception as e:
-            logger.error(f"Ошибка при отправке еженедельного анализа пользователю {user.user_id}: {e}")
+            broadcast.failed += 1
+            logger.error("Ошибка при отправке предупреждения пользователю %s: %s", telegram_id, e)
+
+    broadcast.elapsed = time.perf_counter() - started
+    bot_stats.record_broadcast(broadcast)
+
+
+@shutdown.job
+async def cleanup_weather_history():
+    """Сворачивает старые наблюдения в дневные агрегаты и удаляет сырые записи,
+    удаляет суммы тенденций вышедших из недели суток и сверяет остальные со строками"""
+    logger.info("Запуск очистки истории погоды")
+    try:
+        await downsample_weather_history()
+    except Exception as e:
+        logger.error("Ошибка при очистке истории погоды: %s", e)
+    try:
+        await refresh_trend_days()
+    except Exception as e:
+        logger.error("Ошибка при пересчёте сумм тенденций погоды: %s", e)
+
+
+@shutdown.job
+async def update_climate_baselines():
+    """Добавляет в климатические нормы городов историю за прошедшие дни"""
+    logger.info("Запуск пересчёта климатических норм")
+    try:
+        await rebuild_climate_baselines()
+    except Exception as e:
+        logger.error("Ошибка при пересчёте климатических норм: %s", e)
+
+
+@shutdown.job
+async def cleanup_fsm_states():
+    """Удаляет брошенные состояния FSM (недописанная регистрация и т.п.)"""
+    try:
+        await delete_expired_states()
+    except Exception as e:
+        logger.error("Ошибка при очистке состояний FSM: %s", e)
+
+
+@shutdown.job
+async def resume_broadcasts(bot: Bot):
+    """Продолжает рассылки, прерванные остановкой бота сегодня, с оставшимися получателями"""
+    for job, send in (("daily_weather", send_daily_weather), ("weekly_analysis", send_weekly_analysis)):
+        try:
+            delivered = await take_checkpoint(job)
+        except Exception as e:
+            logger.error("Ошибка при чтении контрольной точки рассылки %s: %s", job, e)
+            continue
+        if delivered is not None:
+            logger.info("Продолжение рассылки %s, уже обработано %s", job, len(delivered))
+            await send(bot, delivered=delivered)
 
 
 def schedule_jobs(scheduler: AsyncIOScheduler, bot: Bot):
     """Настройка и запуск планировщика заданий.
-    Отправка ежедневного прогноза погоды в 8 утра и отправка еженедельного анализа погоды в воскресенье в 12:00
+    Отправка ежедневного прогноза погоды в 8 утра, отправка еженедельного анализа погоды в воскресенье в 12:00,
+    проверка погодных предупреждений каждые ALERT_CHECK_MINUTES минут,
+    ночная очистка истории погоды в 3:30, пересчёт климатических норм в 3:45 и очистка состояний FSM в 4:00,
+    при запуске - продолжение рассылок, прерванных остановкой бота
     """
     # Отправка ежедневного прогноза погоды в 8 утра
     scheduler.add_job(
@@ -147,3 +363,48 @@ def schedule_jobs(scheduler: AsyncIOScheduler, bot: Bot):
     )
 
     logger.info("Настроена задача на отправку еженедельного анализа погоды в 12:00 на воскресенье")
+
+    # Проверка прогнозов по подпискам на предупреждения
+    scheduler.add_job(
+        send_weather_alerts,
+        trigger=IntervalTrigger(minutes=config.ALERT_CHECK_MINUTES),
+        kwargs={"bot": bot},
+        id="weather_alerts",
+        replace_existing=True
+    )
+    logger.info("Настроена задача на проверку погодных предупреждений каждые %s мин.", config.ALERT_CHECK_MINUTES)
+
+    # Очистка истории погоды ночью, когда нагрузка минимальна
+    scheduler.add_job(
+        cleanup_weather_history,
+        trigger=CronTrigger(hour=3, minute=30),
+        id="weather_retention",
+        replace_existing=True
+    )
+    logger.info("Настроена задача на очистку истории погоды в 3:30")
+
+    # Пересчёт климатических норм после очистки: свёрнутые дни уже лежат в дневных агрегатах
+    scheduler.add_job(
+        update_climate_baselines,
+        trigger=CronTrigger(hour=3, minute=45),
+        id="climate_baselines",
+        replace_existing=True
+    )
+    logger.info("Настроена задача на пересчёт климатических норм в 3:45")
+
+    # Удаление брошенных состояний FSM из БД
+    scheduler.add_job(
+        cleanup_fsm_states,
+        trigger=CronTrigger(hour=4, minute=0),
+        id="fsm_cleanup",
+        replace_existing=True
+    )
+    logger.info("Настроена задача на очистку состояний FSM в 4:00")
+
+    # Продолжение рассылок, прерванных предыдущей остановкой (однократно при запуске)
+    scheduler.add_job(
+        resume_broadcasts,
+        kwargs={"bot": bot},
+        id="broadcast_resume",
+        replace_existing=True
+    )
@@ -0,0 +1,90 @@
+"""
+Корректная остановка бота.
+
+При остановке (SIGTERM от Docker, Ctrl+C) бот перестаёт принимать обновления, а работа,
+которая уже выполняется, не обрывается: обработка полученных апдейтов и задания планировщика
+регистрируются здесь, и остановка ждёт их завершения не дольше SHUTDOWN_TIMEOUT.
+Рассылки проверяют флаг stopping между сообщениями и сохраняют контрольную точку,
+чтобы оставшиеся получатели получили сообщения после перезапуска.
+"""
+
+import asyncio
+import functools
+import logging
+from typing import Any, Awaitable, Callable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+logger = logging.getLogger(__name__)
+
+
+class GracefulShutdown(BaseMiddleware):
+    """
+    Учёт выполняющейся работы и ожидание её завершения при остановке.
+    Регистрируется внешним middleware апдейтов (обработка каждого апдейта учитывается),
+    задания планировщика оборачиваются декоратором job.
+    Атрибуты:
+        stopping (bool): Остановка началась - длинные задания должны завершиться как можно раньше
+    """
+
+    def __init__(self):
+        self.stopping = False
+        self._tasks: set[asyncio.Task] = set()
+
+    async def _track(self, awaitable: Awaitable[Any]) -> Any:
+        """Выполняет awaitable, учитывая текущую задачу как выполняющуюся работу."""
+        task = asyncio.current_task()
+        if task in self._tasks:
+            # вложенный вызов (задание вызывает другое задание) - задача уже учтена
+            return await awaitable
+        self._tasks.add(task)
+        try:
+            return await awaitable
+        finally:
+            self._tasks.discard(task)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any]
+    ) -> Any:
+        return await self._track(handler(event, data))
+
+    def job(self, func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        """Декоратор задания планировщика: остановка дождётся его завершения."""
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            return await self._track(func(*args, **kwargs))
+        return wrapper
+
+    @property
+    def in_flight(self) -> int:
+        """Количество выполняющихся апдейтов и заданий."""
+        return len(self._tasks)
+
+    async def drain(self, timeout: float) -> bool:
+        """
+        Начинает остановку и ждёт завершения выполняющейся работы.
+        Задачи, не успевшие за timeout секунд, отменяются.
+        :return: True, если вся работа завершилась сама
+        """
+        self.stopping = True
+        pending = self._tasks - {asyncio.current_task()}
+        if pending:
+            logger.info("Остановка: ожидание %s задач (не дольше %.0f с)", len(pending), timeout)
+            _, pending = await asyncio.wait(pending, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning("Остановка: %s задач не завершились за %.0f с и отменены", len(pending), timeout)
+            await asyncio.gather(*pending, return_exceptions=True)
+        return not pending
+
+    def reset(self) -> None:
+        """Сбрасывает флаг остановки (для повторного запуска в том же процессе, например в тестах)."""
+        self.stopping = False
+        self._tasks.clear()
+
+
+shutdown = GracefulShutdown()
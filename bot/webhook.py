@@ -0,0 +1,175 @@
+"""
+Получение обновлений через вебхук.
+
+aiohttp-приложение принимает POST-запросы Telegram на WEBHOOK_PATH, проверяет секрет
+в заголовке X-Telegram-Bot-Api-Secret-Token и передаёт обновление диспетчеру.
+
+При WEBHOOK_WORKERS > 1 запускается несколько процессов, которые слушают один порт
+(SO_REUSEPORT): ядро распределяет входящие соединения между ними, и обработка обновлений
+масштабируется по ядрам. Вебхук регистрирует и рассылки по расписанию выполняет только
+первый процесс. Состояния FSM хранятся в БД (DatabaseStorage), поэтому диалог может
+продолжаться в любом процессе. Кэши и счётчики в памяти у каждого процесса свои, поэтому
+процессы настраиваются configure_worker_state: данные и места пользователя читаются из БД
+заново через несколько секунд, климатические нормы - через несколько минут (ночной пересчёт
+выполняет первый процесс), счётчики /stats не держатся в памяти, а лимит частоты делится
+между процессами. Недельные отчёты сверяются с БД при каждом запросе.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import secrets
+import signal
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from bot.config.config import config
+from bot.container import app
+from bot.database.database import engine, setup_db
+from bot.utils.event_loop import loop_name, run_loop
+from bot.utils.logger import setup_logger
+from bot.utils.loop_lag import loop_lag
+
+logger = logging.getLogger(__name__)
+
+# время жизни записи кэша пользователей, когда процессов несколько:
+# изменения, сделанные другим процессом (смена города, деактивация), видны не позже чем через него
+WORKER_USER_CACHE_TTL = 5
+# через сколько секунд процесс перечитывает климатические нормы, пересчитанные ночью первым процессом
+WORKER_CLIMATE_RELOAD = 600
+
+
+def create_app(bot: Bot, dp: Dispatcher, secret: str | None = None, path: str | None = None,
+               handle_in_background: bool = True) -> web.Application:
+    """
+    aiohttp-приложение с обработчиком вебхука.
+    :param secret: ожидаемое значение заголовка X-Telegram-Bot-Api-Secret-Token (None - без проверки)
+    :param path: путь обработчика (по умолчанию WEBHOOK_PATH)
+    :param handle_in_background: отвечать Telegram сразу, обрабатывая обновление в фоне
+    """
+    app = web.Application()
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=secret,
+                         handle_in_background=handle_in_background).register(app, path=path or config.WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def _prepare() -> None:
+    """Создаёт таблицы один раз до запуска процессов, чтобы они не делали это одновременно."""
+    await setup_db()
+    await engine.dispose()
+
+
+async def serve(worker: int, workers: int, secret: str) -> None:
+    """
+    Процесс, обслуживающий вебхук.
+    :param worker: номер процесса; нулевой регистрирует вебхук и выполняет рассылки
+    :param workers: всего процессов (при нескольких порт открывается с SO_REUSEPORT)
+    :param secret: секрет вебхука, общий для всех процессов
+    """
+    # импорт здесь: каждый процесс собирает свой диспетчер и подключение к БД
+    from bot.bot import create_dispatcher, start_scheduler, stop_bot
+
+    # SIGTERM (остановка контейнера, завершение процессов родителем) и Ctrl+C запускают корректную остановку
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stopped.set)
+
+    bot = app.create_bot()
+    dp = create_dispatcher()
+    scheduler = None
+    if worker == 0:
+        scheduler = start_scheduler(bot)
+        await bot.set_webhook(f"{config.WEBHOOK_URL.rstrip('/')}{config.WEBHOOK_PATH}", secret_token=secret,
+                              allowed_updates=dp.resolve_used_update_types())
+    loop_lag.start()
+
+    runner = web.AppRunner(create_app(bot, dp, secret))
+    await runner.setup()
+    site = web.TCPSite(runner, config.WEBHOOK_HOST, config.WEBHOOK_PORT, reuse_port=workers > 1)
+    await site.start()
+    logger.info("Процесс вебхука %s (цикл событий %s) слушает %s:%s%s",
+                worker, loop_name(), config.WEBHOOK_HOST, config.WEBHOOK_PORT, config.WEBHOOK_PATH)
+    try:
+        await stopped.wait()
+    finally:
+        # сначала закрывается порт (новые обновления не принимаются), затем дожидаемся принятых
+        await site.stop()
+        await stop_bot(bot, dp, scheduler)
+        await runner.cleanup()
+
+
+def configure_worker_state(workers: int) -> None:
+    """
+    Настраивает состояние в памяти процесса, когда обновления обрабатывают несколько процессов:
+    другие процессы меняют данные в БД, не сбрасывая кэши этого.
+    :param workers: всего процессов вебхука
+    """
+    from bot.middlewares.throttling import throttling
+    from bot.services.climate import climate_baselines
+    from bot.services.locations import locations_cache
+    from bot.services.users import user_cache
+
+    # места пользователя, как и его данные, меняются обработчиком в любом из процессов
+    for cache in (user_cache, locations_cache):
+        cache.ttl = min(cache.ttl or WORKER_USER_CACHE_TTL, WORKER_USER_CACHE_TTL)
+    climate_baselines.reload_after = WORKER_CLIMATE_RELOAD
+    # счётчики /stats обновляются только регистрациями этого процесса - итоги берутся из БД
+    config.STATS_CACHE_ENABLED = False
+    # у каждого процесса свои счётчики вызовов, общий лимит пользователя делится между процессами
+    throttling.workers = workers
+
+
+def _worker_main(worker: int, workers: int, secret: str) -> None:
+    # у процесса свой файл лога: ротацию общего файла несколько процессов выполняют вперемешку
+    setup_logger(f"bot-{worker}")
+    configure_worker_state(workers)
+    try:
+        run_loop(serve(worker, workers, secret))
+    except KeyboardInterrupt:
+        pass
+
+
+def run_webhook() -> None:
+    """Запуск бота в режиме вебхука с WEBHOOK_WORKERS процессами"""
+    setup_logger()
+    if not config.WEBHOOK_URL:
+        raise ValueError("Для режима webhook нужно указать WEBHOOK_URL")
+    workers = max(config.WEBHOOK_WORKERS, 1)
+    # секрет генерируется один раз, чтобы все процессы проверяли одно значение
+    secret = config.WEBHOOK_SECRET or secrets.token_urlsafe(32)
+
+    run_loop(_prepare())
+    logger.info("Запуск бота в режиме webhook, процессов: %s", workers)
+    if workers == 1:
+        try:
+            run_loop(serve(0, workers, secret))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=_worker_main, args=(worker, workers, secret), name=f"webhook-{worker}")
+        for worker in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    def stop_workers(signum, frame):
+        # docker stop отправляет SIGTERM только первому процессу контейнера - передаём его процессам вебхука
+        logger.info("Остановка процессов вебхука")
+        for worker_process in processes:
+            worker_process.terminate()
+
+    signal.signal(signal.SIGTERM, stop_workers)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        logger.info("Остановка процессов вебхука")
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
@@ -1,5 +1,4 @@
-import asyncio
-from bot.bot import main
+from bot.bot import run
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run()